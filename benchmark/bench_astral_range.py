@@ -0,0 +1,75 @@
+"""
+Compares the per-day astral calculation (as `AstralTimesManager.get_astral_times` does) with the bulk calculation of
+`AstralTimesManager.get_astral_times_range` for a year ahead.
+
+Run from the project directory: `python -m benchmark.bench_astral_range` (NumPy has to be installed)
+"""
+import datetime
+import logging
+import math
+import time
+
+from worker_bunch.astral_times.astral_calculator import AstralCalculator
+from worker_bunch.astral_times.astral_times_config import AstralTime, AstralTimesConfKey
+from worker_bunch.astral_times.astral_times_manager import AstralTimesManager, AstralParsed
+
+
+DAYS = 365
+ROUNDS = 5
+
+CONFIG = {
+    AstralTimesConfKey.LATITUDE: 51.051873,
+    AstralTimesConfKey.LONGITUDE: 13.741522,
+    AstralTimesConfKey.ELEVATION: 125,
+}
+
+
+def calc_per_day(manager: AstralTimesManager, first_date: datetime.date):
+    """The former way: one `astral.sun` call per day and event."""
+    results = {}
+    tz = datetime.timezone.utc
+    for astral_time in AstralTime:
+        parsed = AstralParsed(predefined=astral_time)
+        values = []
+        for day in range(DAYS):
+            date = first_date + datetime.timedelta(days=day)
+            value = manager.calc_astral_time(parsed, datetime.datetime.combine(date, datetime.time(), tz), manager._observer)
+            values.append(math.nan if value is None else value.timestamp())
+        results[astral_time.value] = values
+    return results
+
+
+def measure(func) -> (float, dict):
+    result = None
+    time_start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = func()
+    return (time.perf_counter() - time_start) / ROUNDS, result
+
+
+def main():
+    if not AstralCalculator.is_vectorized():
+        print("NumPy is not installed!")
+        return
+
+    logging.basicConfig(level=logging.ERROR)  # the per-day loop warns about each missing astral time
+
+    manager = AstralTimesManager(CONFIG)
+    first_date = datetime.date(2023, 1, 1)
+    events = len(AstralTime)
+
+    duration_loop, per_day = measure(lambda: calc_per_day(manager, first_date))
+    duration_bulk, bulk = measure(lambda: manager.get_astral_times_range(first_date, DAYS))
+
+    mismatches = sum(
+        1 for key in per_day for a, b in zip(per_day[key], bulk[key]) if not (a == b or (math.isnan(a) and math.isnan(b)))
+    )
+
+    print(f"{DAYS} days x {events} events")
+    print(f"per-day loop: {duration_loop * 1000:8.2f}ms")
+    print(f"vectorized  : {duration_bulk * 1000:8.2f}ms")
+    print(f"speedup: {duration_loop / duration_bulk:.1f}x  (mismatches: {mismatches})")
+
+
+if __name__ == '__main__':
+    main()
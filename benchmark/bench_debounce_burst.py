@@ -0,0 +1,116 @@
+"""
+Message burst against debounced listeners: the former RxPY pipelines (one `debounce` per listener, which starts a
+`threading.Timer` per message) vs. the dispatcher's `DebounceEngine` (one heap, flushed by the caller's loop).
+
+Run from the project directory: `python -m benchmark.bench_debounce_burst` (RxPY has to be installed)
+"""
+import threading
+import time
+from typing import Callable, Dict
+
+from worker_bunch.utils.debounce_engine import DebounceEngine
+
+try:
+    import rx
+    from rx import operators as rx_ops
+except ImportError:
+    rx = None
+
+
+LISTENERS = 50
+MESSAGES = 20000
+BATCH_SIZE = 200  # messages per loop cycle
+BATCH_INTERVAL = 0.005
+DEBOUNCE_TIME = 0.1
+
+
+class ThreadCounter:
+    """Counts started threads and the maximum number of parallel threads."""
+
+    def __init__(self):
+        self.started = 0
+        self.max_active = 0
+        self._original_start = threading.Thread.start
+
+    def __enter__(self):
+        counter = self
+
+        def start(thread):
+            counter.started += 1
+            counter.max_active = max(counter.max_active, threading.active_count() + 1)
+            counter._original_start(thread)
+
+        threading.Thread.start = start
+        return self
+
+    def __exit__(self, *_):
+        threading.Thread.start = self._original_start
+
+
+def run_burst(push: Callable[[int], None], process: Callable[[], None]):
+    for index in range(0, MESSAGES, BATCH_SIZE):
+        for message in range(index, index + BATCH_SIZE):
+            push(message % LISTENERS)
+        process()
+        time.sleep(BATCH_INTERVAL)
+
+
+def bench_rx(deliveries: Dict[int, int]):
+    observers = {}
+
+    def deliver(listener_id):
+        deliveries[listener_id] = deliveries.get(listener_id, 0) + 1
+
+    disposables = []
+    for listener_id in range(LISTENERS):
+        def creating_observer_callback(observer, _, key=listener_id):
+            observers[key] = observer
+        disposables.append(rx.create(creating_observer_callback).pipe(rx_ops.debounce(DEBOUNCE_TIME)).subscribe(deliver))
+
+    run_burst(lambda listener_id: observers[listener_id].on_next(listener_id), lambda: None)
+    while sum(deliveries.values()) < LISTENERS:
+        time.sleep(0.01)
+
+    for disposable in disposables:
+        disposable.dispose()
+
+
+def bench_engine(deliveries: Dict[int, int]):
+    engine = DebounceEngine()
+    for listener_id in range(LISTENERS):
+        engine.register(listener_id, DEBOUNCE_TIME)
+
+    def process():
+        for listener_id in engine.pop_due():
+            deliveries[listener_id] = deliveries.get(listener_id, 0) + 1
+
+    run_burst(engine.trigger, process)
+    while len(engine):
+        time.sleep(engine.get_seconds_to_next_deadline())
+        process()
+
+
+def measure(name: str, func):
+    deliveries = {}
+    with ThreadCounter() as counter:
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        func(deliveries)
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+
+    print(f"{name:16s}: threads started: {counter.started:6d}, max. parallel threads: {counter.max_active:5d}, "
+          f"cpu: {cpu:6.3f}s, wall: {wall:6.3f}s, deliveries: {sum(deliveries.values())}")
+
+
+def main():
+    print(f"{MESSAGES} messages to {LISTENERS} listeners (debounce: {DEBOUNCE_TIME}s)")
+    if rx is None:
+        print("RxPY is not installed, skip the RxPY pipelines!")
+    else:
+        measure("RxPY pipelines", bench_rx)
+    measure("debounce engine", bench_engine)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Ingest path of incoming MQTT messages: `Notification.create_from_mqtt` plus the insertion into the dispatcher buckets and
+the worker buffer, compared with the former attrs based notification (eagerly decoded, tuple hash on each insertion).
+Then the whole `Dispatcher.push_mqtt_messages` path, as share of a second needed for 10k msgs/s. And the JSON parsing
+of a message delivered to several listeners: each parses on its own vs. the shared `Notification.payload_json`.
+
+Run from the project directory: `python -m benchmark.bench_dispatcher_ingest`
+"""
+import sys
+import time
+import tracemalloc
+from typing import Callable, List
+from unittest import mock
+
+from attr import frozen
+from paho.mqtt.client import MQTTMessage
+
+from worker_bunch.dispatcher import Dispatcher, DispatcherListener
+from worker_bunch.dispatcher_config import DeliveryPolicy
+from worker_bunch.notification import Notification, NotificationType
+from worker_bunch.utils.json_utils import JsonUtils
+
+
+MESSAGES_PER_SECOND = 10000
+TOPICS = 500
+LISTENERS = 50
+PARSING_LISTENERS = 20
+
+
+@frozen
+class LegacyNotification:
+    """The former implementation."""
+
+    type: NotificationType
+    topic: str
+    payload: str = None
+
+    def __key(self):
+        return self.type, self.topic
+
+    def __hash__(self):
+        return hash(self.__key())
+
+    def __eq__(self, other):
+        if isinstance(other, self.__class__):
+            return self.__key() == other.__key()
+        return NotImplemented
+
+    @classmethod
+    def ensure_string(cls, value_in) -> str:
+        if isinstance(value_in, bytes):
+            return value_in.decode("utf-8")
+        return value_in
+
+    @classmethod
+    def create_from_mqtt(cls, mqtt_message: MQTTMessage):
+        return LegacyNotification(
+            type=NotificationType.MQTT_MESSAGE,
+            topic=cls.ensure_string(mqtt_message.topic),
+            payload=cls.ensure_string(mqtt_message.payload),
+        )
+
+
+class NullListener(DispatcherListener):
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def add_notifications(self, notifications):
+        pass
+
+    def name(self) -> str:
+        return self._name
+
+
+def create_messages(count: int) -> List[MQTTMessage]:
+    messages = []
+    for i in range(count):
+        message = MQTTMessage(topic=f"home/room{i % TOPICS}/sensor/temperature".encode())
+        message.payload = f'{{"value": {20 + i % 10}.5, "unit": "C"}}'.encode()
+        messages.append(message)
+    return messages
+
+
+def measure_create(create: Callable, messages: List[MQTTMessage]) -> float:
+    """seconds per 10k messages; ingest = create + 2 insertions (like dispatcher bucket and worker buffer)"""
+    bucket = {}
+    buffer = {}
+    time_start = time.perf_counter()
+    for message in messages:
+        notification = create(message)
+        bucket[notification] = notification
+        buffer[notification] = notification
+    return (time.perf_counter() - time_start) * MESSAGES_PER_SECOND / len(messages)
+
+
+def measure_memory(create: Callable, messages: List[MQTTMessage]) -> float:
+    """allocated bytes per kept notification"""
+    tracemalloc.start()
+    notifications = [create(m) for m in messages]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (size - sys.getsizeof(notifications)) / len(notifications)
+
+
+def measure_dispatcher(messages: List[MQTTMessage], batch_size: int = 100) -> float:
+    """seconds per 10k messages"""
+    dispatcher = Dispatcher(mock.MagicMock())
+    for i in range(LISTENERS):
+        topic_filter = "home/#" if i % 5 == 0 else f"home/room{i}/+/temperature"
+        policies = {topic_filter: DeliveryPolicy.immediate()} if i % 2 == 0 else None
+        dispatcher.subscribe_mqtt_topics(NullListener(f"listener-{i}"), [topic_filter], topic_policies=policies)
+
+    time_start = time.perf_counter()
+    for index in range(0, len(messages), batch_size):
+        dispatcher.push_mqtt_messages(messages[index:index + batch_size])
+    return (time.perf_counter() - time_start) * MESSAGES_PER_SECOND / len(messages)
+
+
+def measure_parse(parse: Callable, messages: List[MQTTMessage]) -> float:
+    """seconds per 10k messages, each parsed by PARSING_LISTENERS listeners"""
+    notifications = [Notification.create_from_mqtt(m) for m in messages]
+    time_start = time.perf_counter()
+    for notification in notifications:
+        for _ in range(PARSING_LISTENERS):
+            parse(notification)
+    return (time.perf_counter() - time_start) * MESSAGES_PER_SECOND / len(messages)
+
+
+def main():
+    messages = create_messages(10 * MESSAGES_PER_SECOND)
+
+    print(f"{len(messages)} messages, {TOPICS} topics")
+    for name, create in [("attrs (former)", LegacyNotification.create_from_mqtt), ("slots", Notification.create_from_mqtt)]:
+        seconds = min(measure_create(create, messages) for _ in range(5))
+        memory = measure_memory(create, messages)
+        print(f"{name:15s}: {seconds * 1000:7.2f}ms per 10k msgs, {memory:6.1f} bytes per notification")
+
+    seconds = min(measure_dispatcher(messages) for _ in range(3))
+    print(f"dispatcher ingest ({LISTENERS} listeners): {seconds * 1000:7.2f}ms per 10k msgs "
+          f"({seconds * 100:.1f}% of a CPU at {MESSAGES_PER_SECOND} msgs/s)")
+
+    for name, parse in [("JsonUtils.loads_dict", lambda n: JsonUtils.loads_dict(n.payload)),
+                        ("payload_json", lambda n: n.payload_json)]:
+        seconds = min(measure_parse(parse, messages) for _ in range(3))
+        print(f"{name:20s} ({PARSING_LISTENERS} listeners): {seconds * 1000:7.2f}ms per 10k msgs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Ingest throughput ceiling of received MQTT messages: the paho network thread (producer, `MqttClient._on_message`) hands
+the messages over to the runner loop (consumer, `MqttProxy.get_messages`), which fetches when woken up and polls the
+connection state as the main loop does.
+
+Compared with the former hand-off: a list guarded by the client lock (also taken by `is_connected`) plus the proxy lock
+around `get_messages`. Measured is the CPU time per message and the throughput with producer and consumer in separate
+threads (bound by the GIL switching, so it varies more).
+
+Run from the project directory: `python -m benchmark.bench_mqtt_ingest`
+"""
+import threading
+import time
+from typing import Callable, List, Optional
+
+from paho.mqtt.client import MQTTMessage
+
+from worker_bunch.mqtt.mqtt_client import MqttClient
+from worker_bunch.mqtt.mqtt_config import InboundOverflowPolicy, MqttConfKey
+from worker_bunch.mqtt.mqtt_proxy import MqttProxy
+
+
+MESSAGES = 500000
+TOPICS = 500
+
+
+class LegacyClient:
+    """The former locking hand-off."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._messages = []
+        self._is_connected = True
+        self._wakeup_callback: Optional[Callable[[], None]] = None
+
+    def set_wakeup_callback(self, callback: Optional[Callable[[], None]]):
+        self._wakeup_callback = callback
+
+    def is_connected(self):
+        with self._lock:
+            return self._is_connected
+
+    def ensure_connection(self):
+        with self._lock:
+            _ = self._is_connected
+
+    def _on_message(self, _mqtt_client, _userdata, mqtt_message: MQTTMessage):
+        with self._lock:
+            was_empty = not self._messages
+            self._messages.append(mqtt_message)
+
+        if was_empty:
+            self._wakeup_callback()
+
+    def get_messages(self) -> List[MQTTMessage]:
+        with self._lock:
+            messages = self._messages
+            self._messages = []
+            return messages
+
+
+class LegacyProxy:
+
+    def __init__(self, client: LegacyClient):
+        self._client = client
+        self._lock = threading.Lock()
+
+    def get_messages(self) -> List[MQTTMessage]:
+        with self._lock:
+            return self._client.get_messages()
+
+
+def create_messages(count: int) -> List[MQTTMessage]:
+    messages = []
+    for i in range(count):
+        message = MQTTMessage(topic=f"home/room{i % TOPICS}/sensor/temperature".encode())
+        message.payload = b"21.5"
+        messages.append(message)
+    return messages
+
+
+def measure(client, proxy, messages: List[MQTTMessage]) -> float:
+    """messages per second"""
+    wakeups = threading.Semaphore(0)
+    client.set_wakeup_callback(wakeups.release)
+
+    def produce():
+        on_message = client._on_message
+        for message in messages:
+            on_message(None, None, message)
+
+    producer = threading.Thread(target=produce)
+    received = 0
+    time_start = time.perf_counter()
+    producer.start()
+    while received < len(messages):
+        wakeups.acquire(timeout=1)
+        client.ensure_connection()
+        client.is_connected()
+        received += len(proxy.get_messages())
+    seconds = time.perf_counter() - time_start
+    producer.join()
+    return len(messages) / seconds
+
+
+def measure_cost(client, proxy, messages: List[MQTTMessage]) -> float:
+    """CPU time per message (without thread switches): seconds"""
+    client.set_wakeup_callback(lambda: None)
+    on_message = client._on_message
+    time_start = time.perf_counter()
+    for index in range(0, len(messages), 100):
+        for message in messages[index:index + 100]:
+            on_message(None, None, message)
+        client.is_connected()
+        proxy.get_messages()
+    return (time.perf_counter() - time_start) / len(messages)
+
+
+def main():
+    messages = create_messages(MESSAGES)
+
+    def create_legacy():
+        client = LegacyClient()
+        return client, LegacyProxy(client)
+
+    def create_current():
+        client = MqttClient({
+            MqttConfKey.HOST: "localhost",
+            MqttConfKey.INBOUND_MAX_SIZE: MESSAGES,
+            MqttConfKey.INBOUND_OVERFLOW: InboundOverflowPolicy.DROP_OLDEST.value,
+        })
+        client._is_connected = True  # not connected for real
+        return client, MqttProxy(client)
+
+    print(f"{MESSAGES} messages")
+    for name, create in [("lock (former)", create_legacy), ("lock-free", create_current)]:
+        cost = min(measure_cost(*create(), messages) for _ in range(5))
+        rate = max(measure(*create(), messages) for _ in range(5))
+        print(f"{name:15s}: {cost * 1e9:5.0f}ns CPU per message, threaded {rate / 1000:8.1f}k msgs/s")
+
+
+if __name__ == '__main__':
+    main()
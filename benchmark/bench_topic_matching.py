@@ -0,0 +1,89 @@
+"""
+Compares the former linear wildcard scan of the dispatcher with the topic trie.
+
+Run from the project directory: `python -m benchmark.bench_topic_matching`
+"""
+import random
+import time
+from typing import Dict, List
+
+from worker_bunch.mqtt.topic_trie import TopicTrie
+
+
+WILDCARD_SUBSCRIPTIONS = 400
+EXACT_SUBSCRIPTIONS = 400
+MESSAGES = 50000
+
+
+class LinearTopicMatcher:
+    """The matching strategy the dispatcher used before: exact dict lookup + `startswith` over all wildcard filters."""
+
+    def __init__(self):
+        self._exact: Dict[str, str] = {}
+        self._wildcards: List[tuple] = []
+
+    def insert(self, topic_filter: str, value: str):
+        if topic_filter.endswith("#"):
+            self._wildcards.append((topic_filter.strip("#"), value))
+        else:
+            self._exact[topic_filter] = value
+
+    def match(self, topic: str) -> List[str]:
+        found = []
+        value = self._exact.get(topic)
+        if value is not None:
+            found.append(value)
+        for search_pattern, value in self._wildcards:
+            if topic.startswith(search_pattern):
+                found.append(value)
+        return found
+
+
+def create_topic_filters() -> List[str]:
+    topic_filters = [f"zigbee/device{i}/#" for i in range(WILDCARD_SUBSCRIPTIONS)]
+    topic_filters.extend(f"tasmota/plug{i}/state" for i in range(EXACT_SUBSCRIPTIONS))
+    return topic_filters
+
+
+def create_topics() -> List[str]:
+    rand = random.Random(4711)
+    topics = []
+    for _ in range(MESSAGES):
+        if rand.random() < 0.5:
+            topics.append(f"zigbee/device{rand.randrange(WILDCARD_SUBSCRIPTIONS * 2)}/sensor/temperature")
+        else:
+            topics.append(f"tasmota/plug{rand.randrange(EXACT_SUBSCRIPTIONS * 2)}/state")
+    return topics
+
+
+def measure(matcher, topics: List[str]) -> (float, int):
+    hits = 0
+    time_start = time.perf_counter()
+    for topic in topics:
+        hits += len(matcher.match(topic))
+    return time.perf_counter() - time_start, hits
+
+
+def main():
+    topic_filters = create_topic_filters()
+    topics = create_topics()
+
+    linear = LinearTopicMatcher()
+    trie = TopicTrie()
+    for topic_filter in topic_filters:
+        linear.insert(topic_filter, topic_filter)
+        trie.insert(topic_filter, topic_filter)
+
+    print(f"{len(topic_filters)} subscriptions ({WILDCARD_SUBSCRIPTIONS} wildcards), {len(topics)} messages")
+
+    results = {}
+    for name, matcher in [("linear scan", linear), ("topic trie", trie)]:
+        duration, hits = measure(matcher, topics)
+        results[name] = duration
+        print(f"{name:12s}: {duration:7.3f}s  {len(topics) / duration:12.0f} msg/s  (hits: {hits})")
+
+    print(f"speedup: {results['linear scan'] / results['topic trie']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
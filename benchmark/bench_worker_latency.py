@@ -0,0 +1,66 @@
+"""
+Measures the latency from `Worker.add_notifications` to the `_work` call.
+
+Compares the event-driven wakeup with the former 0.5s polling loop.
+Run from the project directory: `python -m benchmark.bench_worker_latency`
+"""
+import statistics
+import threading
+import time
+from typing import List
+
+from worker_bunch.dispatcher import Dispatcher
+from worker_bunch.notification import Notification
+from worker_bunch.worker.worker import Worker
+
+
+ROUNDS = 20
+
+
+class LatencyWorker(Worker):
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.time_sent = 0.0
+        self.latencies: List[float] = []
+        self.worked = threading.Event()
+
+    def subscribe_notifications(self, dispatcher: Dispatcher):
+        pass
+
+    def _work(self, notifications: List[Notification]):
+        self.latencies.append(time.perf_counter() - self.time_sent)
+        self.worked.set()
+
+
+class PollingLatencyWorker(LatencyWorker):
+    """Emulates the former `Worker.run` loop, which slept a fixed 0.5s between the checks for notifications."""
+
+    def _wait_for_notifications(self):
+        time.sleep(0.5)
+
+
+def measure(worker: LatencyWorker) -> List[float]:
+    worker.start()
+    try:
+        for i in range(ROUNDS):
+            time.sleep(0.013 * (i % 7))  # send at different points of a possible poll interval
+            worker.worked.clear()
+            worker.time_sent = time.perf_counter()
+            worker.add_notifications({Notification.create_timer("latency")})
+            worker.worked.wait(2)
+    finally:
+        worker.stop()
+        worker.join()
+    return worker.latencies
+
+
+def main():
+    print(f"{ROUNDS} notifications per worker")
+    for name, worker in [("polling (0.5s)", PollingLatencyWorker("polling")), ("event-driven", LatencyWorker("event"))]:
+        latencies = [latency * 1000 for latency in measure(worker)]
+        print(f"{name:15s}: mean {statistics.mean(latencies):8.3f}ms  max {max(latencies):8.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
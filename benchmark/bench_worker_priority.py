@@ -0,0 +1,90 @@
+"""
+Tail latency of a high priority worker (e.g. a siren) while low priority workers (e.g. logging) saturate the worker pool.
+
+A pool of few threads serves many busy low priority workers; each round the high priority worker gets a notification
+too. Measured is the latency from `add_notifications` to `_work`, once with all workers on the same priority and once
+with the high priority worker prioritized.
+
+Run from the project directory: `python -m benchmark.bench_worker_priority`
+"""
+import statistics
+import time
+from typing import List, Optional
+
+from worker_bunch.dispatcher import Dispatcher
+from worker_bunch.dispatcher_config import Priority
+from worker_bunch.notification import Notification
+from worker_bunch.worker.worker import Worker, WorkerSetup
+from worker_bunch.worker.worker_pool import WorkerPool
+
+
+POOL_SIZE = 4
+LOW_WORKERS = 200
+LOW_WORK_TIME = 0.002  # seconds, blocks a pool thread
+ROUNDS = 50
+ROUND_INTERVAL = 0.02
+
+
+class LoadWorker(Worker):
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.time_sent: Optional[float] = None  # first pending notification (they get coalesced)
+        self.latencies: List[float] = []
+
+    def subscribe_notifications(self, dispatcher: Dispatcher):
+        pass
+
+    def send(self, topic: str):
+        with self._lock:
+            if self.time_sent is None:
+                self.time_sent = time.perf_counter()
+        self.add_notifications({Notification.create_timer(topic)})
+
+    def _work(self, notifications: List[Notification]):
+        with self._lock:
+            self.latencies.append(time.perf_counter() - self.time_sent)
+            self.time_sent = None
+        time.sleep(LOW_WORK_TIME)
+
+
+def measure(high_priority: Optional[Priority]) -> List[float]:
+    pool = WorkerPool(POOL_SIZE)
+
+    high_worker = LoadWorker("siren")
+    high_worker.setup({WorkerSetup.WORKER_POOL: pool, WorkerSetup.WORKER_PRIORITY: high_priority})
+    low_workers = [LoadWorker(f"log-{i}") for i in range(LOW_WORKERS)]
+    for worker in low_workers:
+        worker.setup({WorkerSetup.WORKER_POOL: pool, WorkerSetup.WORKER_PRIORITY: Priority.LOW if high_priority else None})
+
+    workers = low_workers + [high_worker]
+    for worker in workers:
+        worker.start()
+
+    try:
+        for i in range(ROUNDS):
+            for worker in low_workers:  # saturates the pool: LOW_WORKERS * LOW_WORK_TIME / POOL_SIZE > ROUND_INTERVAL
+                worker.send(f"log-{i}")
+            high_worker.send(f"alarm-{i}")
+            time.sleep(ROUND_INTERVAL)
+    finally:
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            worker.join()
+        pool.shutdown()
+
+    return high_worker.latencies
+
+
+def main():
+    print(f"pool size {POOL_SIZE}, {LOW_WORKERS} busy low priority workers, {ROUNDS} rounds")
+    for name, high_priority in [("same priority", None), ("prioritized", Priority.HIGH)]:
+        latencies = sorted(latency * 1000 for latency in measure(high_priority))
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{name:15s}: {len(latencies):3d} turns, median {statistics.median(latencies):8.3f}ms  p99 {p99:8.3f}ms  "
+              f"max {max(latencies):8.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
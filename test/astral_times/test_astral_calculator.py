@@ -0,0 +1,72 @@
+import datetime
+import math
+import unittest
+from unittest import mock
+
+from worker_bunch.astral_times.astral_calculator import AstralCalculator
+from worker_bunch.astral_times.astral_times_config import AstralTime, AstralTimesConfKey
+from worker_bunch.astral_times.astral_times_manager import AstralTimesManager
+
+
+class TestAstralCalculator(unittest.TestCase):
+
+    LOCATIONS = [
+        (51.051873, 13.741522, 125),  # Dresden
+        (69.65, 18.96, 0),  # Tromsø: polar days/nights
+        (-33.87, 151.21, 10),  # Sydney
+        (40.71, -74.01, 0),  # New York
+    ]
+
+    FIRST_DATE = datetime.date(2022, 1, 1)
+
+    @classmethod
+    def create_manager(cls, location) -> AstralTimesManager:
+        latitude, longitude, elevation = location
+        return AstralTimesManager({
+            AstralTimesConfKey.LATITUDE: latitude,
+            AstralTimesConfKey.LONGITUDE: longitude,
+            AstralTimesConfKey.ELEVATION: elevation,
+        })
+
+    def assert_same_times(self, expected, got, msg):
+        self.assertEqual(len(expected), len(got), msg)
+        for index, (e, g) in enumerate(zip(expected, got)):
+            if math.isnan(e):
+                self.assertTrue(math.isnan(g), f"{msg}; index: {index}")
+            else:
+                self.assertEqual(e, g, f"{msg}; index: {index}")
+
+    def test_same_as_single_days(self):
+        tz = datetime.timezone(datetime.timedelta(hours=1))
+        for location in self.LOCATIONS:
+            m = self.create_manager(location)
+            times = m.get_astral_times_range(self.FIRST_DATE, 366)
+
+            self.assertEqual(sorted(times.keys()), sorted(AstralTime.values()))
+            for day in range(0, 366, 5):
+                pivot_time = datetime.datetime.combine(self.FIRST_DATE + datetime.timedelta(days=day), datetime.time(12), tz)
+                for key, astral_time in m.get_astral_times(pivot_time).items():
+                    if key != "timestamp":
+                        expected = math.nan if astral_time is None else astral_time.timestamp()
+                        self.assert_same_times([expected], [times[key][day]], f"{location}; {key}; day {day}")
+
+    @unittest.skipUnless(AstralCalculator.is_vectorized(), "NumPy is not installed")
+    def test_vectorized_vs_per_day(self):
+        keys = AstralTime.extended_values()
+        for location in self.LOCATIONS:
+            m = self.create_manager(location)
+            vectorized = m.get_astral_times_range(self.FIRST_DATE, 366, keys)
+            with mock.patch("worker_bunch.astral_times.astral_calculator.numpy", None):
+                per_day = m.get_astral_times_range(self.FIRST_DATE, 366, keys)
+
+            for key in keys:
+                self.assert_same_times(per_day[key], vectorized[key], f"{location}; {key}")
+
+    def test_invalid(self):
+        m = self.create_manager(self.LOCATIONS[0])
+        self.assertEqual(len(m.get_astral_times_range(self.FIRST_DATE, 0, ["sunrise"])["sunrise"]), 0)
+
+        with self.assertRaises(ValueError):
+            m.get_astral_times_range(self.FIRST_DATE, 10, ["dusk99"])
+        with self.assertRaises(ValueError):
+            m.get_astral_times_range(self.FIRST_DATE, -1)
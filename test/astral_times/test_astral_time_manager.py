@@ -1,5 +1,7 @@
 import unittest
 from datetime import timezone, timedelta, datetime
+from unittest import mock
+from zoneinfo import ZoneInfo
 
 from tzlocal import get_localzone
 
@@ -208,21 +210,95 @@ class TestAstralTimeManager(unittest.TestCase):
         t_no_hit = datetime(2022, 3, 19, 9, 55, 15, tzinfo=timezone(timedelta(seconds=3600)))
         t_sunrise = datetime(2022, 3, 19, 6, 8, tzinfo=timezone(timedelta(seconds=3600)))
 
-        self.assertEqual(len(m._cached_values), 0)
+        self.assertEqual(len(m._calendar), 0)
         hit = m.hits(" Sunrise ", t_no_hit)
         self.assertEqual(hit, False)
-        self.assertEqual(len(m._cached_values), 1)
+        self.assertEqual(len(m._calendar), AstralTimesManager.DEFAULT_CALENDAR_DAYS)
 
         hit = m.hits(" Sunrise ", t_sunrise)
         self.assertEqual(hit, True)
-        self.assertEqual(len(m._cached_values), 1)
 
         # noinspection SpellCheckingInspection
         hit = m.hits(" sunrisE ", t_sunrise)
         self.assertEqual(hit, True)
-        self.assertEqual(len(m._cached_values), 2)
+        self.assertEqual(list(m._calendar_keys.keys()), ["sunrise"])  # same normalized key
 
-        # another hour => cache ist reset
-        hit = m.hits("       Sunrise ", t_no_hit)
+        # next days are precalculated, outdated days are dropped
+        hit = m.hits("Sunrise", t_sunrise + timedelta(days=1))
         self.assertEqual(hit, False)
-        self.assertEqual(len(m._cached_values), 1)  # cache was reset
+        self.assertEqual(sorted(d for d, _ in m._calendar.keys()),
+                         [t_sunrise.date() + timedelta(days=d) for d in range(AstralTimesManager.DEFAULT_CALENDAR_DAYS + 1)])
+        m.hits("Sunrise", t_sunrise + timedelta(days=5))
+        self.assertEqual(len(m._calendar), AstralTimesManager.DEFAULT_CALENDAR_DAYS)
+
+    def test_calendar_calculates_once(self):
+        m = AstralTimesManager({**self.DUMMY_CONFIG, AstralTimesConfKey.CALENDAR_DAYS: 3})
+        m.register_astral_key("sunrise")
+        m.register_astral_key("dusk06")
+        now = datetime(2022, 3, 19, 9, 55, tzinfo=timezone(timedelta(seconds=3600)))
+
+        with mock.patch.object(AstralTimesManager, "_calc_astral_time", wraps=AstralTimesManager._calc_astral_time) as calc:
+            for minute in range(120):
+                m.hits("sunrise", now + timedelta(minutes=minute))
+                m.hits("dusk6", now + timedelta(minutes=minute))
+            self.assertEqual(calc.call_count, 2 * 3)  # 2 keys x 3 days
+
+            self.assertEqual(m.get_astral_time("dusk6", now), m.get_astral_time("duskCivil", now))
+            self.assertEqual(calc.call_count, 2 * 3 + 3)  # new key, all calendar days
+
+    def test_calendar_not_rebased(self):
+        m = AstralTimesManager(self.DUMMY_CONFIG)
+        now = datetime(2022, 3, 19, 9, 55, tzinfo=timezone(timedelta(seconds=3600)))
+        m.hits("sunrise", now)
+        calendar = dict(m._calendar)
+
+        past = now - timedelta(days=10)
+        self.assertEqual(m.get_astral_time("sunrise", past), AstralTimesManager(self.DUMMY_CONFIG).get_astral_time("sunrise", past))
+        with mock.patch("worker_bunch.utils.time_utils.TimeUtils.now", return_value=now):
+            m.get_astral_time("sunrise", now + timedelta(days=30))  # far ahead
+        self.assertEqual(m._calendar, calendar)
+        self.assertEqual(m._calendar_date, now.date())
+
+        m.hits("sunrise", now + timedelta(days=1))  # new day
+        self.assertEqual(m._calendar_date, now.date() + timedelta(days=1))
+
+    def test_calendar_polar_day(self):
+        m = AstralTimesManager({AstralTimesConfKey.LATITUDE: 69.65, AstralTimesConfKey.LONGITUDE: 18.96,
+                                AstralTimesConfKey.ELEVATION: 0})  # Tromsø
+        now = datetime(2022, 6, 21, 12, 0, tzinfo=timezone(timedelta(seconds=7200)))
+
+        with mock.patch.object(AstralTimesManager, "_calc_astral_time", wraps=AstralTimesManager._calc_astral_time) as calc:
+            self.assertEqual(m.get_astral_time("sunrise", now), None)
+            self.assertEqual(m.hits("sunrise", now), False)
+            self.assertEqual(calc.call_count, AstralTimesManager.DEFAULT_CALENDAR_DAYS)  # None is cached too
+
+    def test_calendar_dst(self):
+        tz = ZoneInfo("Europe/Berlin")
+        m = AstralTimesManager(self.DUMMY_CONFIG)
+
+        before = m.get_astral_time("sunrise", datetime(2022, 3, 26, 12, 0, tzinfo=tz))  # CET
+        after = m.get_astral_time("sunrise", datetime(2022, 3, 27, 12, 0, tzinfo=tz))  # CEST since 2:00
+
+        self.assertEqual(before.utcoffset(), timedelta(hours=1))
+        self.assertEqual(after.utcoffset(), timedelta(hours=2))
+        self.assertEqual(after.date(), datetime(2022, 3, 27).date())
+        self.assertEqual(after.hour, before.hour + 1)  # sun rises ~2 minutes earlier, but the clock jumps
+        self.assertTrue(m.hits("sunrise", after))
+
+    def test_get_next_astral_time(self):
+        tz = timezone(timedelta(seconds=3600))
+        m = AstralTimesManager(self.DUMMY_CONFIG)
+        sunrise = datetime(2022, 3, 19, 6, 8, tzinfo=tz)
+
+        self.assertEqual(m.get_next_astral_time("sunrise", sunrise - timedelta(hours=3)), sunrise)
+        self.assertEqual(m.get_next_astral_time("sunrise", sunrise), datetime(2022, 3, 20, 6, 6, tzinfo=tz))
+
+        # polar night: next sunrise in Tromsø is in late January
+        m = AstralTimesManager({AstralTimesConfKey.LATITUDE: 69.65, AstralTimesConfKey.LONGITUDE: 18.96,
+                                AstralTimesConfKey.ELEVATION: 0})
+        after = datetime(2022, 12, 1, 12, 0, tzinfo=tz)
+        m.get_astral_time("sunrise", after)  # calendar days (warnings when calculated)
+        with self.assertLogs("worker_bunch.astral_times.astral_times_manager", level="WARNING") as logs:
+            sunrise = m.get_next_astral_time("sunrise", after)
+        self.assertEqual(sunrise.date(), datetime(2023, 1, 21).date())
+        self.assertEqual(len(logs.records), 1)  # once per search, not per polar night
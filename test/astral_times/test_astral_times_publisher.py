@@ -60,5 +60,6 @@ class TestAstralTimesPublisher(unittest.TestCase):
         self.mqtt_proxy.queue.assert_called_once_with(
             topic=AstralTimesPublisherConfKey.MQTT_TOPIC_OUT,
             payload=expected_payload,
-            retain=True
+            retain=True,
+            qos=None
         )
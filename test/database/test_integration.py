@@ -124,12 +124,12 @@ class TestIntegrationScalar(BaseTestIntegration):
         self.run_service_single_mode(self._config_file)
 
         mocked_mqtt_client.set_last_will.assert_called_once_with(
-            topic=DatabaseConfKey.MQTT_TOPIC, last_will=DatabaseConfKey.MQTT_LAST_WILL, retain=False
+            topic=DatabaseConfKey.MQTT_TOPIC, last_will=DatabaseConfKey.MQTT_LAST_WILL, retain=False, qos=None
         )
 
         calls = [
-            call(topic=DatabaseConfKey.MQTT_TOPIC, payload="1", retain=False),
-            call(topic=DatabaseConfKey.MQTT_TOPIC, payload=DatabaseConfKey.MQTT_LAST_WILL, retain=False),
+            call(topic=DatabaseConfKey.MQTT_TOPIC, payload="1", retain=False, qos=None),
+            call(topic=DatabaseConfKey.MQTT_TOPIC, payload=DatabaseConfKey.MQTT_LAST_WILL, retain=False, qos=None),
         ]
         mocked_mqtt_client.publish.assert_has_calls(calls)
 
@@ -170,12 +170,12 @@ class TestIntegrationJson(BaseTestIntegration):
         self.run_service_single_mode(self._config_file)
 
         mocked_mqtt_client.set_last_will.assert_called_once_with(
-            topic=DatabaseConfKey.MQTT_TOPIC, last_will=DatabaseConfKey.MQTT_LAST_WILL, retain=False
+            topic=DatabaseConfKey.MQTT_TOPIC, last_will=DatabaseConfKey.MQTT_LAST_WILL, retain=False, qos=None
         )
 
         calls = [
-            call(topic=DatabaseConfKey.MQTT_TOPIC, payload='{"a": "a_step", "b": "b_worker"}', retain=False),
-            call(topic=DatabaseConfKey.MQTT_TOPIC, payload=DatabaseConfKey.MQTT_LAST_WILL, retain=False),
+            call(topic=DatabaseConfKey.MQTT_TOPIC, payload='{"a": "a_step", "b": "b_worker"}', retain=False, qos=None),
+            call(topic=DatabaseConfKey.MQTT_TOPIC, payload=DatabaseConfKey.MQTT_LAST_WILL, retain=False, qos=None),
         ]
         mocked_mqtt_client.publish.assert_has_calls(calls)
 
@@ -0,0 +1,184 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import paho.mqtt.client as mqtt
+
+from worker_bunch.mqtt.mqtt_client import InboundStats, InflightStats, MqttClient
+from worker_bunch.mqtt.mqtt_config import InboundOverflowPolicy, MqttConfKey
+
+
+class TestMqttClientInflight(unittest.TestCase):
+
+    def setUp(self):
+        self.client = MqttClient({MqttConfKey.HOST: "localhost", MqttConfKey.MAX_INFLIGHT: 2})
+        self.paho = mock.MagicMock()
+        self.client._client = self.paho
+        self.mid = 0
+
+        def publish(**_kwargs):
+            self.mid += 1
+            info = mqtt.MQTTMessageInfo(self.mid)
+            info.rc = mqtt.MQTT_ERR_SUCCESS
+            return info
+
+        self.paho.publish.side_effect = publish
+
+    def test_acknowledge(self):
+        self.client.publish("t", "1", qos=1)
+        self.client.publish("t", "2", qos=2)
+        self.assertEqual(self.client.get_inflight_stats(), InflightStats(inflight=2, acknowledged=0))
+
+        self.client._on_publish(None, None, 2)
+        self.client._on_publish(None, None, 1)
+        self.assertEqual(self.client.get_inflight_stats(), InflightStats(inflight=0, acknowledged=2))
+
+    def test_acknowledged_before_publish_returns(self):
+        def publish(**_kwargs):
+            self.client._on_publish(None, None, 7)  # QoS 0: paho calls back within `publish`
+            return mqtt.MQTTMessageInfo(7)
+
+        self.paho.publish.side_effect = publish
+        self.client.publish("t", "1", qos=0)
+        self.client.publish("t", "2", qos=1)
+        self.assertEqual(self.client.get_inflight_stats(), InflightStats(inflight=0, acknowledged=2))
+        self.assertFalse(self.client._acknowledged_early)
+
+    def test_qos0_acknowledged_immediately(self):
+        self.client.publish("t", "1", qos=0)
+        self.assertEqual(self.client.get_inflight_stats(), InflightStats(inflight=0, acknowledged=1))
+
+        self.client._on_publish(None, None, 1)  # written to the socket later on
+        self.assertEqual(self.client.get_inflight_stats(), InflightStats(inflight=0, acknowledged=1))
+        self.assertFalse(self.client._acknowledged_early)
+        self.assertFalse(self.client._pending_qos0)
+
+    def test_dropped_qos0_not_tracked(self):
+        info = mqtt.MQTTMessageInfo(1)
+        info.rc = mqtt.MQTT_ERR_NO_CONN
+        self.paho.publish.side_effect = None
+        self.paho.publish.return_value = info
+
+        self.client.publish("t", "1", qos=0)
+        self.assertEqual(self.client.get_inflight_stats().inflight, 0)
+
+    def test_inflight_window(self):
+        self.client.publish("t", "1", qos=1)
+        self.client.publish("t", "2", qos=1)
+
+        sender = threading.Thread(target=self.client.publish, args=("t", "3"), kwargs={"qos": 1})
+        sender.start()
+        time.sleep(0.05)
+        self.assertEqual(self.paho.publish.call_count, 2)  # blocked, window full
+
+        self.client._on_publish(None, None, 1)
+        sender.join(1)
+        self.assertFalse(sender.is_alive())
+        self.assertEqual(self.paho.publish.call_count, 3)
+
+    def test_qos0_not_blocked_by_full_window(self):
+        self.client.TIME_LIMIT_INFLIGHT_WAIT = 5
+        self.client.publish("t", "1", qos=1)
+        self.client.publish("t", "2", qos=1)
+
+        time_start = time.perf_counter()
+        for i in range(10):
+            self.client.publish("t", str(i), qos=0)
+        self.assertLess(time.perf_counter() - time_start, 1)
+        self.assertEqual(self.client.get_inflight_stats(), InflightStats(inflight=2, acknowledged=10))
+
+    def test_inflight_window_timeout(self):
+        self.client.TIME_LIMIT_INFLIGHT_WAIT = 0.05
+        for i in range(3):
+            self.client.publish("t", str(i), qos=1)
+        self.assertEqual(self.client.get_inflight_stats().inflight, 3)
+
+
+class TestMqttClientInbound(unittest.TestCase):
+
+    @classmethod
+    def create_client(cls, max_size, overflow: InboundOverflowPolicy):
+        return MqttClient({
+            MqttConfKey.HOST: "localhost",
+            MqttConfKey.INBOUND_MAX_SIZE: max_size,
+            MqttConfKey.INBOUND_OVERFLOW: overflow.value
+        })
+
+    @classmethod
+    def receive(cls, client: MqttClient, topic: str, payload: str):
+        message = mqtt.MQTTMessage(topic=topic.encode())
+        message.payload = payload.encode()
+        client._on_message(None, None, message)
+
+    @classmethod
+    def fetch(cls, client: MqttClient):
+        return [(m.topic, m.payload.decode()) for m in client.get_messages()]
+
+    def test_drop_oldest(self):
+        client = self.create_client(3, InboundOverflowPolicy.DROP_OLDEST)
+        for i in range(5):
+            self.receive(client, "t", str(i))
+
+        self.assertEqual(client.get_inbound_stats(), InboundStats(received=5, dropped=2, depth=3, max_depth=3))
+        self.assertEqual(self.fetch(client), [("t", "2"), ("t", "3"), ("t", "4")])
+        self.assertEqual(client.get_inbound_stats().depth, 0)
+
+    def test_drop_newest(self):
+        client = self.create_client(3, InboundOverflowPolicy.DROP_NEWEST)
+        for i in range(5):
+            self.receive(client, "t", str(i))
+
+        self.assertEqual(self.fetch(client), [("t", "0"), ("t", "1"), ("t", "2")])
+        self.assertEqual(client.get_inbound_stats().dropped, 2)
+
+    def test_keep_latest_per_topic(self):
+        client = self.create_client(4, InboundOverflowPolicy.KEEP_LATEST_PER_TOPIC)
+        for topic, payload in [("a", "a1"), ("b", "b1"), ("a", "a2"), ("c", "c1"), ("b", "b2"), ("d", "d1")]:
+            self.receive(client, topic, payload)
+
+        # compacted on overflow ("b2" and "d1" arrived), a1 and b1 dropped
+        self.assertEqual(self.fetch(client), [("a", "a2"), ("c", "c1"), ("b", "b2"), ("d", "d1")])
+        self.assertEqual(client.get_inbound_stats(), InboundStats(received=6, dropped=2, depth=0, max_depth=4))
+
+    def test_keep_latest_per_topic_too_many_topics(self):
+        client = self.create_client(10, InboundOverflowPolicy.KEEP_LATEST_PER_TOPIC)
+        for i in range(11):
+            self.receive(client, f"t{i}", str(i))
+
+        messages = self.fetch(client)
+        self.assertEqual(messages[0], ("t1", "1"))  # oldest dropped
+        self.assertEqual(messages[-1], ("t10", "10"))
+        self.assertEqual(client.get_inbound_stats().dropped, 1)
+
+    def test_wakeup(self):
+        client = self.create_client(10, InboundOverflowPolicy.DROP_OLDEST)
+        callback = mock.MagicMock()
+        client.set_wakeup_callback(callback)
+
+        self.receive(client, "t", "1")
+        self.receive(client, "t", "2")
+        callback.assert_called_once()
+
+    def test_concurrent_hand_off(self):
+        client = self.create_client(1000000, InboundOverflowPolicy.DROP_OLDEST)
+        wakeups = threading.Semaphore(0)
+        client.set_wakeup_callback(wakeups.release)
+        count = 20000
+
+        def produce():
+            for i in range(count):
+                self.receive(client, "t", str(i))
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+
+        received = []
+        time_limit = time.perf_counter() + 10
+        while len(received) < count and time.perf_counter() < time_limit:
+            wakeups.acquire(timeout=1)  # as the runner: fetches only when woken up
+            received.extend(int(m.payload) for m in client.get_messages())
+        producer.join()
+
+        self.assertEqual(received, list(range(count)))  # nothing lost, in order
+        self.assertEqual(client.get_inbound_stats().received, count)
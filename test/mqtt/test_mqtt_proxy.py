@@ -1,10 +1,16 @@
+import threading
+import time
 import unittest
 import uuid
 from datetime import timedelta, timezone, datetime
 from unittest.mock import MagicMock, call
 
-from worker_bunch.mqtt.mqtt_client import MqttClient
-from worker_bunch.mqtt.mqtt_proxy import MqttProxy
+from paho.mqtt.client import MQTT_ERR_NO_CONN, MQTTMessageInfo
+
+from worker_bunch.mqtt.mqtt_client import InflightStats, MqttClient
+from worker_bunch.mqtt.mqtt_config import PublishMode
+from worker_bunch.mqtt.mqtt_proxy import MqttProxy, PublishStats
+from worker_bunch.mqtt.retained_cache import RetainedValueCache
 
 
 class TestMqttProxy(unittest.TestCase):
@@ -21,7 +27,7 @@ class TestMqttProxy(unittest.TestCase):
             retain = True if i % 2 == 0 else False
 
             proxy.queue(topic=topic, payload=payload, retain=retain)
-            calls.append(call(topic=topic, payload=payload, retain=retain))
+            calls.append(call(topic=topic, payload=payload, retain=retain, qos=None))
 
         proxy.publish()
         client.publish.assert_has_calls(calls)
@@ -44,4 +50,284 @@ class TestMqttProxy(unittest.TestCase):
         proxy.queue(topic=topic, payload=payload_to_convert, retain=retain)
         proxy.publish()
 
-        client.publish.assert_called_once_with(topic=topic, payload=payload, retain=retain)
+        client.publish.assert_called_once_with(topic=topic, payload=payload, retain=retain, qos=None)
+
+    def test_wakeup_callback(self):
+        client = MagicMock(MqttClient, autospec=True)
+        proxy = MqttProxy(client)
+
+        callback = MagicMock()
+        proxy.set_wakeup_callback(callback)
+        client.set_wakeup_callback.assert_called_once_with(callback)
+
+        proxy.queue(topic="t1", payload="p1")
+        callback.assert_not_called()  # queued messages are sent by the publisher thread or `publish`, not by the runner
+
+    def test_failed_publish_requeued(self):
+        client = MagicMock(MqttClient, autospec=True)
+        client.publish.side_effect = [None, RuntimeError("send failed"), None, None, None]
+        proxy = MqttProxy(client, publish_modes={"c/": PublishMode.COALESCE})
+        proxy.queue(topic="t1", payload="p1")
+        proxy.queue(topic="t2", payload="p2")
+        proxy.queue(topic="c/x", payload="p3")
+
+        with self.assertRaises(RuntimeError):
+            proxy.publish()
+        self.assertEqual(proxy.get_publish_stats().queue_depth, 2)
+
+        proxy.queue(topic="c/x", payload="p4")  # coalesces with nothing sent before
+        proxy.publish()
+        sent = [(c.kwargs["topic"], c.kwargs["payload"]) for c in client.publish.call_args_list]
+        self.assertEqual(sent, [("t1", "p1"), ("t2", "p2"), ("t2", "p2"), ("c/x", "p3"), ("c/x", "p4")])
+
+
+class TestMqttProxyPublisher(unittest.TestCase):
+
+    def setUp(self):
+        self.client = MagicMock(MqttClient, autospec=True)
+        self.proxy = MqttProxy(self.client)
+
+    def tearDown(self):
+        self.proxy.close()
+
+    def _wait_for(self, condition, timeout=2.0):
+        time_limit = time.perf_counter() + timeout
+        while not condition() and time.perf_counter() < time_limit:
+            time.sleep(0.005)
+        return condition()
+
+    def test_publisher_thread(self):
+        callback = MagicMock()
+        self.proxy.set_wakeup_callback(callback)
+        self.proxy.start_publisher()
+
+        calls = []
+        for i in range(100):
+            self.proxy.queue(topic=f"t{i % 7}", payload=str(i), retain=False)
+            calls.append(call(topic=f"t{i % 7}", payload=str(i), retain=False, qos=None))
+
+        self.assertTrue(self._wait_for(lambda: self.client.publish.call_count == 100))
+        self.assertEqual(self.client.publish.call_args_list, calls)
+        callback.assert_not_called()  # no need to wake up the runner loop
+
+    def test_queue_not_blocked_by_sending(self):
+        gate = threading.Event()
+        self.client.publish.side_effect = lambda **_kwargs: gate.wait()
+        self.proxy.start_publisher()
+
+        self.proxy.queue(topic="t", payload="blocked")
+        self.assertTrue(self._wait_for(lambda: self.client.publish.called))
+
+        time_start = time.perf_counter()
+        for i in range(10):
+            self.proxy.queue(topic="t", payload=str(i))
+        self.assertLess(time.perf_counter() - time_start, 0.5)
+
+        self.assertEqual(self.proxy.get_publish_stats().queue_depth, 10)
+        gate.set()
+
+    def test_stop_sends_pending(self):
+        gate = threading.Event()
+        self.client.publish.side_effect = lambda **_kwargs: gate.wait()
+        self.proxy.start_publisher()
+        for i in range(5):
+            self.proxy.queue(topic="t", payload=str(i))
+
+        gate.set()
+        self.proxy.stop_publisher()
+        self.assertEqual(self.client.publish.call_count, 5)
+
+    def test_publisher_failure(self):
+        callback = MagicMock()
+        self.proxy.set_wakeup_callback(callback)
+        self.client.publish.side_effect = [None, RuntimeError("send failed"), None, None]
+        self.proxy.start_publisher()
+        self.proxy.ensure_connection()
+
+        self.proxy.queue(topic="t1", payload="p1")
+        self.assertTrue(self._wait_for(lambda: self.client.publish.call_count == 1))
+        self.proxy.queue(topic="t2", payload="p2")
+        self.proxy.queue(topic="t3", payload="p3")
+        self.assertTrue(self._wait_for(lambda: callback.called))
+
+        with self.assertRaises(RuntimeError):
+            self.proxy.ensure_connection()  # ends the runner loop
+
+        self.proxy.close()  # retries the unsent messages
+        sent = [c.kwargs["payload"] for c in self.client.publish.call_args_list]
+        self.assertEqual(sent, ["p1", "p2", "p2", "p3"])
+
+    def test_publish_stats(self):
+        now = [100.0]
+        self.client.get_inflight_stats.return_value = InflightStats(inflight=0, acknowledged=0)
+        proxy = MqttProxy(self.client, clock=lambda: now[0])
+        for i in range(4):
+            proxy.queue(topic="t", payload=str(i))
+        proxy.publish()
+        proxy.queue(topic="t", payload="pending")
+        now[0] += 2.0
+
+        stats = proxy.get_publish_stats()
+        self.assertEqual(stats, PublishStats(published=4, publish_rate=2.0, queue_depth=1, max_queue_depth=4))
+
+        now[0] += 1.0
+        self.assertEqual(proxy.get_publish_stats(), PublishStats(published=0, publish_rate=0.0, queue_depth=1,
+                                                                 max_queue_depth=1))
+
+
+class TestMqttProxyRetainedCache(unittest.TestCase):
+
+    def test_skip_unchanged_retained(self):
+        client = MagicMock(MqttClient, autospec=True)
+        client.default_retain = True
+        client.publish.return_value = MQTTMessageInfo(1)
+        cache = RetainedValueCache()
+        proxy = MqttProxy(client, cache)
+
+        for _ in range(3):
+            proxy.queue(topic="state", payload="on")  # default retain
+            proxy.queue(topic="event", payload="pressed", retain=False)  # not retained => always sent
+            proxy.queue(topic="explicit", payload={"value": 1}, retain=True)
+        proxy.queue(topic="state", payload="off")
+        proxy.publish()
+
+        self.assertEqual(client.publish.call_args_list, [
+            call(topic="state", payload="on", retain=None, qos=None),
+            call(topic="event", payload="pressed", retain=False, qos=None),
+            call(topic="explicit", payload='{"value": 1}', retain=True, qos=None),
+            call(topic="event", payload="pressed", retain=False, qos=None),
+            call(topic="event", payload="pressed", retain=False, qos=None),
+            call(topic="state", payload="off", retain=None, qos=None),
+        ])
+        self.assertEqual((cache.hits, cache.misses), (4, 3))
+        self.assertEqual(proxy.get_publish_stats().published, 6)
+
+    def test_failed_send_not_cached(self):
+        client = MagicMock(MqttClient, autospec=True)
+        client.default_retain = True
+        client.publish.side_effect = [RuntimeError("failed"), MQTTMessageInfo(1)]
+        proxy = MqttProxy(client, RetainedValueCache())
+
+        proxy.queue(topic="state", payload="on")
+        with self.assertRaises(RuntimeError):
+            proxy.publish()
+
+        proxy.queue(topic="state", payload="on")
+        proxy.publish()
+        self.assertEqual(client.publish.call_count, 2)
+
+    def test_dropped_send_not_cached(self):
+        client = MagicMock(MqttClient, autospec=True)
+        client.default_retain = True
+        client.default_qos = 1
+        proxy = MqttProxy(client, RetainedValueCache())
+
+        def publish(**_kwargs):
+            result = MQTTMessageInfo(1)
+            result.rc = MQTT_ERR_NO_CONN
+            return result
+
+        client.publish.side_effect = publish
+        for _ in range(2):
+            proxy.queue(topic="dropped", payload="on", qos=0)  # dropped by paho while disconnected
+            proxy.queue(topic="queued", payload="on")  # default QoS 1, queued by paho
+            proxy.publish()
+
+        sent = [c.kwargs["topic"] for c in client.publish.call_args_list]
+        self.assertEqual(sent, ["dropped", "queued", "dropped"])
+
+
+class TestMqttProxyCoalescing(unittest.TestCase):
+
+    def setUp(self):
+        self.client = MagicMock(MqttClient, autospec=True)
+
+    def _sent(self):
+        return [(c.kwargs["topic"], c.kwargs["payload"]) for c in self.client.publish.call_args_list]
+
+    def test_coalesce(self):
+        proxy = MqttProxy(self.client, publish_modes={"sensor/": PublishMode.COALESCE})
+        proxy.queue(topic="sensor/a", payload="a1")
+        proxy.queue(topic="sensor/b", payload="b1")
+        proxy.queue(topic="other", payload="o1")
+        proxy.queue(topic="sensor/a", payload="a2")
+        proxy.queue(topic="other", payload="o2")
+
+        stats = proxy.get_publish_stats()
+        self.assertEqual((stats.queue_depth, stats.coalesced), (4, 1))
+
+        proxy.publish()
+        self.assertEqual(self._sent(), [("sensor/a", "a2"), ("sensor/b", "b1"), ("other", "o1"), ("other", "o2")])
+
+    def test_coalesce_ordered(self):
+        proxy = MqttProxy(self.client, publish_modes={"sensor/": PublishMode.COALESCE_ORDERED})
+        for i in range(50):
+            proxy.queue(topic="sensor/a", payload=f"a{i}")
+            proxy.queue(topic="sensor/b", payload=f"b{i}")
+        proxy.queue(topic="sensor/a", payload="a-last")
+        self.assertEqual(proxy.get_publish_stats().queue_depth, 2)
+
+        proxy.publish()
+        self.assertEqual(self._sent(), [("sensor/b", "b49"), ("sensor/a", "a-last")])
+
+    def test_per_call_and_longest_prefix(self):
+        proxy = MqttProxy(self.client, publish_modes={
+            "sensor/": PublishMode.COALESCE, "sensor/raw/": PublishMode.QUEUE
+        })
+        for i in range(3):
+            proxy.queue(topic="sensor/raw/x", payload=f"r{i}")
+            proxy.queue(topic="event", payload=f"e{i}", mode=PublishMode.COALESCE)
+        proxy.publish()
+
+        self.assertEqual(self._sent(), [("sensor/raw/x", "r0"), ("event", "e2"), ("sensor/raw/x", "r1"),
+                                        ("sensor/raw/x", "r2")])
+
+    def test_queued_message_not_overtaken(self):
+        proxy = MqttProxy(self.client)
+        proxy.queue(topic="t", payload="1", mode=PublishMode.COALESCE)
+        proxy.queue(topic="t", payload="2")  # must be sent after "1"
+        proxy.queue(topic="t", payload="3", mode=PublishMode.COALESCE)
+        proxy.queue(topic="t", payload="4", mode=PublishMode.COALESCE)
+        proxy.publish()
+
+        self.assertEqual(self._sent(), [("t", "1"), ("t", "2"), ("t", "4")])
+
+    def test_new_batch_after_publish(self):
+        proxy = MqttProxy(self.client, publish_modes={"": PublishMode.COALESCE_ORDERED})
+        proxy.queue(topic="t", payload="1")
+        proxy.publish()
+        proxy.queue(topic="t", payload="2")
+        proxy.queue(topic="t", payload="3")
+        proxy.publish()
+
+        self.assertEqual(self._sent(), [("t", "1"), ("t", "3")])
+
+
+class TestMqttProxyQos(unittest.TestCase):
+
+    def test_qos(self):
+        client = MagicMock(MqttClient, autospec=True)
+        proxy = MqttProxy(client)
+        proxy.queue(topic="telemetry", payload="1", qos=0)
+        proxy.queue(topic="state", payload="on", retain=True)
+        proxy.publish()
+
+        self.assertEqual(client.publish.call_args_list, [
+            call(topic="telemetry", payload="1", retain=None, qos=0),
+            call(topic="state", payload="on", retain=True, qos=None),
+        ])
+
+    def test_acknowledge_stats(self):
+        now = [100.0]
+        client = MagicMock(MqttClient, autospec=True)
+        client.get_inflight_stats.return_value = InflightStats(inflight=3, acknowledged=10)
+        proxy = MqttProxy(client, clock=lambda: now[0])
+
+        now[0] += 2.0
+        stats = proxy.get_publish_stats()
+        self.assertEqual((stats.acknowledged, stats.acknowledge_rate, stats.inflight), (10, 5.0, 3))
+
+        client.get_inflight_stats.return_value = InflightStats(inflight=0, acknowledged=14)
+        now[0] += 1.0
+        stats = proxy.get_publish_stats()
+        self.assertEqual((stats.acknowledged, stats.acknowledge_rate, stats.inflight), (4, 4.0, 0))
@@ -0,0 +1,46 @@
+import unittest
+
+from worker_bunch.mqtt.retained_cache import RetainedValueCache
+
+
+class TestRetainedValueCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.cache = RetainedValueCache(refresh_interval=60, clock=lambda: self.now)
+
+    def test_unchanged(self):
+        self.assertTrue(self.cache.check("t1", "on"))
+        self.assertFalse(self.cache.check("t1", "on"))
+        self.assertTrue(self.cache.check("t2", "on"))  # other topic
+        self.assertTrue(self.cache.check("t1", "off"))
+        self.assertTrue(self.cache.check("t1", "on"))
+
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 4)
+
+    def test_refresh(self):
+        self.assertTrue(self.cache.check("t", b"1"))
+        self.now += 59
+        self.assertFalse(self.cache.check("t", b"1"))
+        self.now += 1
+        self.assertTrue(self.cache.check("t", b"1"))  # forced refresh
+        self.assertFalse(self.cache.check("t", b"1"))
+
+    def test_no_refresh(self):
+        cache = RetainedValueCache(refresh_interval=None, clock=lambda: self.now)
+        self.assertTrue(cache.check("t", "1"))
+        self.now += 1000000
+        self.assertFalse(cache.check("t", "1"))
+
+    def test_discard_and_clear(self):
+        self.cache.check("t1", "1")
+        self.cache.check("t2", "2")
+
+        self.cache.discard("t1")
+        self.assertTrue(self.cache.check("t1", "1"))
+        self.assertFalse(self.cache.check("t2", "2"))
+
+        self.cache.clear()
+        self.assertTrue(self.cache.check("t1", "1"))
+        self.assertTrue(self.cache.check("t2", "2"))
@@ -0,0 +1,59 @@
+import unittest
+
+from worker_bunch.mqtt.topic_trie import TopicTrie
+
+
+class TestTopicTrie(unittest.TestCase):
+
+    def setUp(self):
+        self.trie = TopicTrie()
+        for topic_filter in ["test/a", "test/#", "test/a/b", "other/#", "#", "home/+/temperature", "+/+/c", "$SYS/#"]:
+            self.trie.insert(topic_filter, topic_filter)
+
+    def test_insert_and_get(self):
+        self.assertEqual(len(self.trie), 8)
+        self.assertIn("test/#", self.trie)
+        self.assertEqual(self.trie.get("test/a"), "test/a")
+        self.assertEqual(self.trie.get("test/b"), None)
+
+        self.trie.insert("test/a", "replaced")
+        self.assertEqual(len(self.trie), 8)
+        self.assertEqual(self.trie.get("test/a"), "replaced")
+
+        with self.assertRaises(ValueError):
+            self.trie.insert("test/c", None)
+
+    def test_match(self):
+        def match(topic):
+            return sorted(self.trie.match(topic))
+
+        self.assertEqual(match("test/a"), ["#", "test/#", "test/a"])
+        self.assertEqual(match("test/b"), ["#", "test/#"])
+        self.assertEqual(match("test/a/b"), ["#", "test/#", "test/a/b"])
+        self.assertEqual(match("test/a/b/c"), ["#", "test/#"])
+        self.assertEqual(match("other/x/y"), ["#", "other/#"])
+        self.assertEqual(match("unknown"), ["#"])
+
+    def test_match_parent_level(self):
+        self.assertEqual(sorted(self.trie.match("test")), ["#", "test/#"])
+
+    def test_match_single_level(self):
+        def match(topic):
+            return sorted(self.trie.match(topic))
+
+        self.assertEqual(match("home/kitchen/temperature"), ["#", "home/+/temperature"])
+        self.assertEqual(match("home/kitchen/humidity"), ["#"])
+        self.assertEqual(match("home/kitchen/temperature/raw"), ["#"])
+        self.assertEqual(match("test/b/c"), ["#", "+/+/c", "test/#"])
+
+    def test_match_system_topics(self):
+        self.assertEqual(self.trie.match("$SYS/broker/uptime"), ["$SYS/#"])
+        self.assertEqual(self.trie.match("$SYS/b/c"), ["$SYS/#"])
+
+    def test_validate_filter(self):
+        for topic_filter in ["a", "a/b", "#", "+", "a/#", "+/b/#", "/a", "a//b"]:
+            TopicTrie.validate_filter(topic_filter)
+
+        for topic_filter in ["", "a/#/b", "a#", "a/b+", "+a/b", "#/a"]:
+            with self.assertRaises(ValueError):
+                TopicTrie.validate_filter(topic_filter)
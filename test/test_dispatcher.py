@@ -1,4 +1,6 @@
 import datetime
+import functools
+import threading
 import time
 import unittest
 from unittest import mock
@@ -8,25 +10,27 @@ from paho.mqtt.client import MQTTMessage
 from tzlocal import get_localzone
 
 from worker_bunch.astral_times.astral_times_manager import AstralTimesManager
-from worker_bunch.dispatcher import Dispatcher, DispatcherListener, TopicMatch
+from worker_bunch.dispatcher import Dispatcher, DispatcherListener, ListenerLag, TopicMatch
+from worker_bunch.dispatcher_config import CatchUpPolicy, DeliveryPolicy, DeliveryMode, Priority
+from worker_bunch.utils.debounce_engine import DebounceMode
 from worker_bunch.notification import Notification
+from worker_bunch.service_config import ConfigException
+from worker_bunch.worker.worker import Worker
 
 
 class TestTopicMatch(unittest.TestCase):
 
     def test_instance_vs_class_properties(self):
-        t1 = TopicMatch(topic="t1", search_pattern="s1")
+        t1 = TopicMatch(topic="t1")
         listener = mock.MagicMock(DispatcherListener)
         t1.listeners.add(listener)
 
         t2 = TopicMatch(topic="t2")
 
         self.assertEqual(t1.topic, "t1")
-        self.assertEqual(t1.search_pattern, "s1")
         self.assertEqual(t1.listeners, {listener})
 
         self.assertEqual(t2.topic, "t2")
-        self.assertEqual(t2.search_pattern, None)
         self.assertEqual(t2.listeners, set())
 
 
@@ -68,11 +72,137 @@ class TestDispatcher(unittest.TestCase):
 
         messages = [c_msg(b"test/a", b"test/a.3"), m_a4, m_b2]
         self.dispatcher.push_mqtt_messages(messages)
+        self.dispatcher.trigger_timers()
+        listener.add_notifications.assert_not_called()  # debounced
+
         time.sleep(0.2)
+        self.assertEqual(self.dispatcher.get_seconds_to_next_timer(), 0)
+        self.dispatcher.trigger_timers()
 
         expected = {Notification.create_from_mqtt(m_a4), Notification.create_from_mqtt(m_b2)}
         listener.add_notifications.assert_called_once_with(expected)
 
+    # noinspection PyTypeChecker
+    def test_mqtt_messages_single_level_wildcard(self):
+        listener = mock.MagicMock(DispatcherListener)
+        listener.add_notifications = mock.MagicMock("add_notifications")
+
+        self.dispatcher.subscribe_mqtt_topics(listener, ["home/+/temperature"], 0.05)
+
+        def c_msg(topic, payload):
+            m = MQTTMessage(topic=topic)
+            m.payload = payload
+            return m
+
+        m_kitchen = c_msg(b"home/kitchen/temperature", b"21.5")
+        messages = [m_kitchen, c_msg(b"home/kitchen/humidity", b"45"), c_msg(b"home/kitchen/temperature/raw", b"2150")]
+        self.dispatcher.push_mqtt_messages(messages)
+        time.sleep(0.15)
+        self.dispatcher.trigger_timers()
+
+        listener.add_notifications.assert_called_once_with({Notification.create_from_mqtt(m_kitchen)})
+
+    # noinspection PyTypeChecker
+    def test_close_flushes_notifications(self):
+        listener = mock.MagicMock(DispatcherListener)
+        self.dispatcher.subscribe_mqtt_topics(listener, ["test/a"], 10)
+
+        with self.assertRaises(RuntimeError):
+            self.dispatcher.subscribe_mqtt_topics(listener, ["test/b"], 10)
+
+        message = MQTTMessage(topic=b"test/a")
+        self.dispatcher.push_mqtt_messages([message])
+        self.dispatcher.trigger_timers()
+        listener.add_notifications.assert_not_called()
+
+        self.dispatcher.close()
+        listener.add_notifications.assert_called_once_with({Notification.create_from_mqtt(message)})
+
+    def test_delivery_order_by_priority(self):
+        delivered = []
+        listeners = []
+        for name, priority in [("low", Priority.LOW), ("normal", Priority.NORMAL), ("high", Priority.HIGH)]:
+            listener = mock.MagicMock(DispatcherListener)
+            listener.get_priority.return_value = priority
+            listener.add_notifications.side_effect = functools.partial(lambda n, _: delivered.append(n), name)
+            self.dispatcher.subscribe_mqtt_topics(listener, ["test/#"], topic_policies={"test/#": DeliveryPolicy.immediate()})
+            listeners.append(listener)
+
+        self.dispatcher.push_mqtt_messages([MQTTMessage(topic=b"test/a")])
+        self.assertEqual(delivered, ["high", "normal", "low"])
+
+        delivered.clear()
+        self.dispatcher.trigger_start_notification(listeners)
+        self.assertEqual(delivered, ["high", "normal", "low"])
+
+    def test_get_lags(self):
+        lag = ListenerLag(pending=3, pending_age=1.5, busy_time=30.0, dropped=0)
+        listener = mock.MagicMock(DispatcherListener)
+        listener.get_lag.return_value = lag
+        duck_typed_listener = mock.MagicMock("listener")
+        duck_typed_listener.add_notifications = mock.MagicMock("add_notifications")
+        self.dispatcher.trigger_start_notification([listener, duck_typed_listener])
+
+        self.assertEqual(self.dispatcher.get_lags(), {listener: lag})
+
+    # noinspection PyTypeChecker
+    def test_mqtt_messages_throttle_leading(self):
+        listener = mock.MagicMock(DispatcherListener)
+        self.dispatcher.subscribe_mqtt_topics(listener, ["test/#"], 10, debounce_mode=DebounceMode.THROTTLE_LEADING)
+
+        m1 = MQTTMessage(topic=b"test/a")
+        m2 = MQTTMessage(topic=b"test/b")
+        self.dispatcher.push_mqtt_messages([m1, m2])  # whole batch is sent immediately
+        listener.add_notifications.assert_called_once_with({Notification.create_from_mqtt(m1), Notification.create_from_mqtt(m2)})
+
+        listener.add_notifications.reset_mock()
+        self.dispatcher.push_mqtt_messages([m1])
+        listener.add_notifications.assert_not_called()  # throttled
+
+        with self.assertRaises(ConfigException):
+            self.dispatcher.subscribe_mqtt_topics(mock.MagicMock(DispatcherListener), ["test/#"], 0.1, max_wait=-1)
+
+    # noinspection PyTypeChecker
+    def test_mqtt_messages_topic_policies(self):
+        listener = mock.MagicMock(DispatcherListener)
+        self.dispatcher.subscribe_mqtt_topics(listener, ["power/#"], 5, topic_policies={
+            "door/+": DeliveryPolicy.immediate(),
+            "weather/#": DeliveryPolicy.keep_latest(),
+            "window/+": DeliveryPolicy(DeliveryMode.DEBOUNCE, 0.05),
+        })
+        self.assertEqual(sorted(self.dispatcher.get_mqtt_topics()), ["door/+", "power/#", "weather/#", "window/+"])
+
+        m_power = MQTTMessage(topic=b"power/meter")
+        m_weather = MQTTMessage(topic=b"weather/temperature")
+        self.dispatcher.push_mqtt_messages([m_power, m_weather])
+        self.dispatcher.trigger_timers()
+        listener.add_notifications.assert_not_called()
+        self.assertEqual(len(self.dispatcher._debounce_engine), 1)  # power; keep latest isn't timed
+
+        # urgent topic: everything pending is sent immediately
+        m_door = MQTTMessage(topic=b"door/front")
+        self.dispatcher.push_mqtt_messages([m_door])
+        listener.add_notifications.assert_called_once_with({
+            Notification.create_from_mqtt(m_power), Notification.create_from_mqtt(m_weather), Notification.create_from_mqtt(m_door)
+        })
+        self.assertEqual(len(self.dispatcher._debounce_engine), 0)
+
+        # a short debounce isn't delayed by the high rate power meter
+        listener.add_notifications.reset_mock()
+        m_window = MQTTMessage(topic=b"window/kitchen")
+        self.dispatcher.push_mqtt_messages([m_power, m_window])
+        time.sleep(0.1)
+        self.dispatcher.push_mqtt_messages([m_power])
+        self.dispatcher.trigger_timers()
+        listener.add_notifications.assert_called_once_with({
+            Notification.create_from_mqtt(m_power), Notification.create_from_mqtt(m_window)
+        })
+
+    # noinspection PyTypeChecker
+    def test_invalid_mqtt_topic(self):
+        with self.assertRaises(ConfigException):
+            self.dispatcher.subscribe_mqtt_topics(mock.MagicMock(DispatcherListener), ["home/#/temperature"], 0.1)
+
     def test_timer(self):
         listener = mock.MagicMock(DispatcherListener)
         listener.add_notifications = mock.MagicMock("add_notifications")
@@ -88,6 +218,24 @@ class TestDispatcher(unittest.TestCase):
         expected = {Notification.create_timer("5-minutes")}
         listener.add_notifications.assert_called_once_with(expected)
 
+    @mock.patch("schedule.idle_seconds", mock.MagicMock(return_value=None))
+    @mock.patch("worker_bunch.utils.time_utils.TimeUtils.now")
+    def test_seconds_to_next_timer(self, mocked_now):
+        time_start = datetime.datetime(2022, 1, 30, 10, 0, 0, tzinfo=get_localzone())
+        self.dispatcher._last_timer_execution = time_start
+
+        mocked_now.return_value = time_start + datetime.timedelta(seconds=15)
+        self.assertEqual(self.dispatcher.get_seconds_to_next_timer(), float("inf"))
+
+        self.dispatcher.subscribe_cron(mock.MagicMock(DispatcherListener), "5 10 * * *", "cron-trigger")
+        self.assertEqual(self.dispatcher.get_seconds_to_next_timer(), 4 * 60 + 45)
+
+        self.dispatcher.subscribe_cron(mock.MagicMock(DispatcherListener), "* * * * *", "cron-trigger")
+        self.assertEqual(self.dispatcher.get_seconds_to_next_timer(), 45)
+
+        mocked_now.return_value = time_start + datetime.timedelta(seconds=65)
+        self.assertEqual(self.dispatcher.get_seconds_to_next_timer(), 0)
+
     # noinspection PyTypeChecker
     @mock.patch("worker_bunch.utils.time_utils.TimeUtils.now")
     def test_cron(self, mocked_now):
@@ -114,12 +262,118 @@ class TestDispatcher(unittest.TestCase):
         mocked_now.return_value = time_start + datetime.timedelta(seconds=65)
         self.dispatcher.trigger_timers()
 
+        tick = time_start + datetime.timedelta(minutes=1)
         expected = {
-            Notification.create_cron("cron-trigger-1"),
-            Notification.create_cron("cron-trigger-2")
+            Notification.create_cron("cron-trigger-1", tick),
+            Notification.create_cron("cron-trigger-2", tick)
         }
         listener.add_notifications.assert_called_once_with(expected)
 
+    # noinspection PyTypeChecker
+    @mock.patch("worker_bunch.utils.time_utils.TimeUtils.now")
+    def test_cron_heap(self, mocked_now):
+        time_start = datetime.datetime(2022, 1, 30, 10, 0, 0, tzinfo=get_localzone())
+        self.dispatcher._last_timer_execution = time_start
+
+        listener = mock.MagicMock(DispatcherListener)
+        self.dispatcher.subscribe_cron(listener, "*/2 * * * *", "every-2-minutes")
+        self.dispatcher.subscribe_cron(listener, "3 10 * * *", "at-10-03")
+
+        with self.assertRaises(ConfigException):
+            self.dispatcher.subscribe_cron(listener, "61 * * * *", "invalid")
+
+        hits = []
+        for minute in range(1, 7):
+            listener.add_notifications.reset_mock()
+            mocked_now.return_value = time_start + datetime.timedelta(minutes=minute, seconds=1)
+            self.dispatcher.trigger_timers()
+            if listener.add_notifications.called:
+                notifications = listener.add_notifications.call_args[0][0]
+                hits.extend((minute, n.topic) for n in sorted(notifications, key=lambda n: n.topic))
+
+        self.assertEqual(hits, [(2, "every-2-minutes"), (3, "at-10-03"), (4, "every-2-minutes"), (6, "every-2-minutes")])
+        self.assertEqual(len(self.dispatcher._timer_deadlines), 2)  # one entry per cron
+
+    def _stall(self, mocked_now, catch_up_policy, cron="*/2 * * * *", stall=datetime.timedelta(minutes=7, seconds=1)):
+        """Runs the timers once after a stall; returns the topics of each delivered notification batch."""
+        dispatcher = Dispatcher(mock.MagicMock("AstralTimeManager"))
+        time_start = datetime.datetime(2022, 1, 30, 10, 0, 0, tzinfo=get_localzone())
+        dispatcher._last_timer_execution = time_start
+
+        listener = mock.MagicMock(DispatcherListener)
+        dispatcher.subscribe_cron(listener, cron, "cron-trigger", catch_up_policy)
+
+        mocked_now.return_value = time_start + stall
+        dispatcher.trigger_timers()
+        dispatcher.close()
+        return [[n.topic for n in c[0][0]] for c in listener.add_notifications.call_args_list]
+
+    @mock.patch("worker_bunch.utils.time_utils.TimeUtils.now")
+    def test_catch_up_fire_all(self, mocked_now):
+        self.assertEqual(self._stall(mocked_now, CatchUpPolicy.FIRE_ALL), [["cron-trigger"]] * 3)  # 10:02, 10:04, 10:06
+
+    @mock.patch("worker_bunch.utils.time_utils.TimeUtils.now")
+    def test_catch_up_fire_all_worker(self, mocked_now):
+        class TickWorker(Worker):
+            def __init__(self):
+                super().__init__("ticks")
+                self.ticks = []
+                self.worked = threading.Event()
+
+            def subscribe_notifications(self, dispatcher: Dispatcher):
+                pass
+
+            def _work(self, notifications):
+                self.ticks.extend(n.tick for n in notifications)
+                self.worked.set()
+
+        dispatcher = Dispatcher(mock.MagicMock("AstralTimeManager"))
+        time_start = datetime.datetime(2022, 1, 30, 10, 0, 0, tzinfo=get_localzone())
+        dispatcher._last_timer_execution = time_start
+        worker = TickWorker()
+        dispatcher.subscribe_cron(worker, "*/2 * * * *", "cron-trigger", CatchUpPolicy.FIRE_ALL)
+
+        mocked_now.return_value = time_start + datetime.timedelta(minutes=7, seconds=1)
+        dispatcher.trigger_timers()  # all ticks are pending in the worker buffer at once
+        dispatcher.close()
+
+        worker.start()
+        self.assertTrue(worker.worked.wait(1))
+        worker.stop()
+        worker.join(1)
+        self.assertEqual(worker.ticks, [time_start + datetime.timedelta(minutes=m) for m in (2, 4, 6)])
+
+    @mock.patch("worker_bunch.utils.time_utils.TimeUtils.now")
+    def test_catch_up_fire_once(self, mocked_now):
+        self.assertEqual(self._stall(mocked_now, CatchUpPolicy.FIRE_ONCE), [["cron-trigger"]])
+        self.assertEqual(self._stall(mocked_now, None), [["cron-trigger"]])  # dispatcher default
+
+    @mock.patch("worker_bunch.utils.time_utils.TimeUtils.now")
+    def test_catch_up_skip(self, mocked_now):
+        self.assertEqual(self._stall(mocked_now, CatchUpPolicy.SKIP), [])
+        # in time: 10:02 is reached within its minute
+        self.assertEqual(self._stall(mocked_now, CatchUpPolicy.SKIP, stall=datetime.timedelta(minutes=2, seconds=5)),
+                         [["cron-trigger"]])
+
+    @mock.patch("worker_bunch.utils.time_utils.TimeUtils.now")
+    def test_cron_seconds(self, mocked_now):
+        time_start = datetime.datetime(2022, 1, 30, 10, 0, 0, tzinfo=get_localzone())
+        self.dispatcher._last_timer_execution = time_start
+
+        listener = mock.MagicMock(DispatcherListener)
+        self.dispatcher.subscribe_cron(listener, "*/10 * * * * *", "every-10-seconds")
+
+        hits = []
+        for second in range(1, 31):
+            listener.add_notifications.reset_mock()
+            mocked_now.return_value = time_start + datetime.timedelta(seconds=second, microseconds=500)
+            self.assertLessEqual(self.dispatcher.get_seconds_to_next_timer(), 10)
+            self.dispatcher.trigger_timers()
+            if listener.add_notifications.called:
+                hits.append(second)
+
+        self.assertEqual(hits, [10, 20, 30])
+
 
 class TestDispatcherWithRealAstralTimeManager(unittest.TestCase):
 
@@ -155,6 +409,31 @@ class TestDispatcherWithRealAstralTimeManager(unittest.TestCase):
         self.dispatcher.trigger_timers()
 
         expected = {
-            Notification.create_astral("astral-trigger"),
+            Notification.create_astral("astral-trigger", datetime.datetime(2022, 12, 13, 16, 13, tzinfo=tz)),
         }
         listener.add_notifications.assert_called_once_with(expected)
+
+    # noinspection PyTypeChecker
+    @mock.patch("schedule.idle_seconds", mock.MagicMock(return_value=None))
+    @mock.patch("worker_bunch.utils.time_utils.TimeUtils.now")
+    def test_astral_deadlines(self, mocked_now):
+        tz = datetime.timezone(datetime.timedelta(seconds=3600))
+        time_start = datetime.datetime(2022, 12, 13, 16, 0, tzinfo=tz)
+        self.dispatcher._last_timer_execution = time_start
+        mocked_now.return_value = time_start
+
+        listener = mock.MagicMock(DispatcherListener)
+        self.dispatcher.subscribe_astral_time(listener, "dusk3", "astral-trigger")
+        self.assertEqual(self.dispatcher.get_seconds_to_next_timer(), 13 * 60)  # dusk3: 16:13
+
+        with mock.patch.object(self.astral_times_manager, "hits") as mocked_hits:
+            for minute in range(1, 20):
+                mocked_now.return_value = time_start + datetime.timedelta(minutes=minute)
+                self.dispatcher.trigger_timers()
+            mocked_hits.assert_not_called()  # no polling
+
+        listener.add_notifications.assert_called_once_with(
+            {Notification.create_astral("astral-trigger", datetime.datetime(2022, 12, 13, 16, 13, tzinfo=tz))})
+
+        next_dusk = self.astral_times_manager.get_astral_time("dusk3", time_start + datetime.timedelta(days=1))
+        self.assertEqual(self.dispatcher._timer_deadlines, [(next_dusk.replace(tzinfo=None), "ASTRAL", "dusk3")])
@@ -1,5 +1,10 @@
 import copy
+import datetime
+import json
+import pickle
+import threading
 import unittest
+from unittest import mock
 
 from paho.mqtt.client import MQTTMessage
 
@@ -18,6 +23,16 @@ class TestNotification(unittest.TestCase):
         self.assertTrue(n21 == n22)
         self.assertTrue(n1 != n3)
 
+    def test_tick_key(self):
+        tick = datetime.datetime(2022, 1, 30, 10, 2, tzinfo=datetime.timezone.utc)
+        n1 = Notification.create_cron("c", tick)
+        n2 = Notification.create_cron("c", tick + datetime.timedelta(minutes=2))
+
+        self.assertEqual(n1, Notification.create_cron("c", tick))
+        self.assertNotEqual(n1, n2)  # caught up ticks don't replace each other
+        self.assertEqual(len({n1, n2, Notification.create_cron("c", tick)}), 2)
+        self.assertEqual(pickle.loads(pickle.dumps(n1)).tick, tick)
+
     def test_create_from_mqtt(self):
         def create_msg(topic, payload):
             m = MQTTMessage(topic=topic)  # topic must be "bytes"
@@ -34,6 +49,82 @@ class TestNotification(unittest.TestCase):
             Notification(type=NotificationType.MQTT_MESSAGE, topic="1", payload="1")
         )
 
+    def test_immutable(self):
+        n = Notification.create_mqtt("1", "1")
+        with self.assertRaises(AttributeError):
+            n.topic = "2"
+        with self.assertRaises(AttributeError):
+            n.payload = "2"
+        with self.assertRaises(AttributeError):
+            n.other = "2"
+
+    def test_copy_and_pickle(self):
+        n = Notification.create_mqtt("1", b"1")
+        for copied in [copy.copy(n), copy.deepcopy(n), pickle.loads(pickle.dumps(n))]:
+            self.assertEqual(copied, n)
+            self.assertEqual(hash(copied), hash(n))
+            self.assertEqual(copied.payload, "1")
+
+    def test_lazy_payload(self):
+        m = MQTTMessage(topic=b"a/b")
+        m.payload = "äöü".encode("utf-8")
+        n = Notification.create_from_mqtt(m)
+
+        self.assertEqual(n.topic, "a/b")
+        self.assertEqual(n.payload, "äöü")
+        self.assertIs(n.payload, n.payload)  # decoded once
+        self.assertEqual(repr(n), "Notification(type=<NotificationType.MQTT_MESSAGE: 'MQTT_MESSAGE'>, topic='a/b', "
+                                  "payload='äöü')")
+
+    def test_payload_json(self):
+        n = Notification.create_mqtt("t", b'{"value": 1.5}')
+        data = n.payload_json
+        self.assertEqual(data, {"value": 1.5})
+        self.assertIs(n.payload_json, data)  # parsed once, shared
+        self.assertEqual(n.payload, '{"value": 1.5}')
+
+        self.assertIsNone(Notification.create_timer("t").payload_json)
+
+        n = Notification.create_mqtt("t", "{invalid")
+        with self.assertRaises(ValueError):
+            _ = n.payload_json
+        with self.assertRaises(ValueError):  # cached failure
+            _ = n.payload_json
+
+    def test_payload_float(self):
+        self.assertEqual(Notification.create_mqtt("t", b" 21.5").payload_float, 21.5)
+        self.assertEqual(Notification.create_mqtt("t", "-3").payload_float, -3.0)
+        with self.assertRaises(ValueError):
+            _ = Notification.create_mqtt("t", "ON").payload_float
+
+    def test_parse_once(self):
+        n = Notification.create_mqtt("t", b'{"value": 1}')
+        with mock.patch("worker_bunch.notification.json.loads", wraps=json.loads) as loads:
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(n.payload_json)) for _ in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(loads.call_count, 1)
+        self.assertTrue(all(r is results[0] for r in results))
+
+    def test_interned_topics(self):
+        n1 = Notification.create_from_mqtt(MQTTMessage(topic=b"a/b"))
+        n2 = Notification.create_from_mqtt(MQTTMessage(topic=b"a/b"))
+        n3 = Notification.create_mqtt("".join(["a", "/", "b"]), "")
+        self.assertIs(n1.topic, n2.topic)
+        self.assertIs(n1.topic, n3.topic)
+
+    def test_topic_cache_limit(self):
+        Notification._topic_cache.clear()
+        for i in range(Notification.TOPIC_CACHE_SIZE + 10):
+            Notification.decode_topic(f"topic/{i}".encode())
+        self.assertLessEqual(len(Notification._topic_cache), Notification.TOPIC_CACHE_SIZE)
+        self.assertEqual(Notification.decode_topic(b"topic/1"), "topic/1")
+        Notification._topic_cache.clear()
+
 
 class TestNotificationBucket(unittest.TestCase):
 
@@ -0,0 +1,116 @@
+import asyncio
+import signal
+import threading
+import time
+import unittest
+from unittest import mock
+
+from paho.mqtt.client import MQTTMessage
+
+from worker_bunch.dispatcher import Dispatcher
+from worker_bunch.mqtt.mqtt_proxy import MqttProxy, PublishStats
+from worker_bunch.runner import Runner
+from worker_bunch.worker.worker import Worker
+
+
+class TestRunner(unittest.TestCase):
+    """The main loop sleeps until it gets woken up; any lost wakeup shows up as a (test) timeout."""
+
+    def setUp(self):
+        self.dispatcher = mock.MagicMock(Dispatcher)
+        self.dispatcher.get_seconds_to_next_timer.return_value = float("inf")
+        self.dispatcher.get_lags.return_value = {}
+
+        self.mqtt_proxy = mock.MagicMock(MqttProxy)
+        self.mqtt_proxy.is_connected.return_value = True
+        self.mqtt_proxy.get_messages.return_value = []
+        self.mqtt_proxy.get_inbound_stats.return_value = None
+        self.mqtt_proxy.get_publish_stats.return_value = PublishStats(published=0, publish_rate=0.0, queue_depth=0,
+                                                                      max_queue_depth=0)
+        self.mqtt_proxy.retained_cache = None
+
+        self.worker = mock.MagicMock(Worker)
+        self.worker.name = "worker"
+        self.worker.is_alive.return_value = True
+
+        self.runner = None
+        self.thread = None
+        self.error = None
+
+    def tearDown(self):
+        if self.thread is not None and self.thread.is_alive():
+            self.runner._shutdown_signaled(signal.SIGTERM, None)
+            self.thread.join(1)
+
+    def _start(self):
+        """Runs the service loop in a thread (no signal handlers), like the integration tests do."""
+        started = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            self.runner = Runner(self.dispatcher, self.mqtt_proxy, [self.worker])
+            started.set()
+            try:
+                self.runner.run()
+            except Exception as ex:
+                self.error = ex
+            finally:
+                loop.close()
+
+        self.thread = threading.Thread(target=run)
+        self.thread.start()
+        self.assertTrue(started.wait(1))
+        self.assertTrue(self._wait_for(lambda: self.dispatcher.trigger_timers.called))  # first loop pass
+
+    @classmethod
+    def _wait_for(cls, condition, timeout=1.0):
+        time_limit = time.perf_counter() + timeout
+        while not condition() and time.perf_counter() < time_limit:
+            time.sleep(0.005)
+        return condition()
+
+    def test_wakeup_by_mqtt_message(self):
+        self._start()
+        wakeup = self.mqtt_proxy.set_wakeup_callback.call_args[0][0]
+
+        message = MQTTMessage(topic=b"t")
+        self.mqtt_proxy.get_messages.return_value = [message]
+        wakeup()  # MQTT network thread
+
+        self.assertTrue(self._wait_for(lambda: mock.call([message]) in self.dispatcher.push_mqtt_messages.call_args_list))
+
+    def test_wakeup_by_deadline(self):
+        deadlines = iter([0.1])  # next timer or debounce deadline, afterwards nothing is due
+        self.dispatcher.get_seconds_to_next_timer.side_effect = lambda: next(deadlines, float("inf"))
+        self._start()
+
+        self.assertTrue(self._wait_for(lambda: self.dispatcher.trigger_timers.call_count >= 2))
+        time.sleep(0.1)
+        self.assertEqual(self.dispatcher.trigger_timers.call_count, 2)  # sleeps again
+
+    @mock.patch.object(Runner, "TIME_WORKER_CHECK", 0.1)
+    def test_wakeup_by_worker_check(self):
+        self._start()
+        self.assertTrue(self._wait_for(lambda: self.dispatcher.get_lags.call_count >= 2))
+
+    @mock.patch.object(Runner, "TIME_WORKER_CHECK", 0.1)
+    def test_dead_worker(self):
+        self._start()
+        self.worker.is_alive.return_value = False
+
+        self.thread.join(1)
+        self.assertFalse(self.thread.is_alive())
+        self.assertIsInstance(self.error, RuntimeError)
+        self.assertIn("worker", str(self.error))
+
+    def test_shutdown(self):
+        self._start()
+        time_start = time.perf_counter()
+        self.runner._shutdown_signaled(signal.SIGTERM, None)  # signal handler, the loop sleeps until the next check
+
+        self.thread.join(1)
+        self.assertFalse(self.thread.is_alive())
+        self.assertLess(time.perf_counter() - time_start, 0.5)
+        self.assertIsNone(self.error)
+        self.mqtt_proxy.set_wakeup_callback.assert_called_with(None)
@@ -0,0 +1,75 @@
+import datetime
+import unittest
+
+from tzlocal import get_localzone
+
+from worker_bunch.utils.cron_expression import CronExpression
+
+
+class TestCronExpression(unittest.TestCase):
+
+    def test_invalid(self):
+        for cron in ["", "* * * *", "* * * * * * *", "60 * * * *", "* 24 * * *", "* * 0 * *", "* * * 13 *", "x * * * *",
+                     "*/0 * * * *", "5-1 * * * *", "* * * * funday"]:
+            with self.assertRaises(ValueError, msg=cron):
+                CronExpression(cron)
+
+    def test_matches(self):
+        t = datetime.datetime(2022, 1, 30, 10, 2, 30, tzinfo=get_localzone())  # sunday
+
+        self.assertTrue(CronExpression("2 * * * *").matches(t))
+        self.assertFalse(CronExpression("3 * * * *").matches(t))
+        self.assertTrue(CronExpression("*/2 10-12 * * *").matches(t))
+        self.assertTrue(CronExpression("0-5/2 10,14 30 1 sun").matches(t))
+        self.assertTrue(CronExpression("2 10 * * 7").matches(t))
+        self.assertTrue(CronExpression("2 10 * * fri-mon").matches(t))
+        self.assertFalse(CronExpression("2 10 * * mon-fri").matches(t))
+        self.assertFalse(CronExpression("2 10 1 * sun").matches(t))  # day of month AND day of week
+
+    def test_step_like_pycron(self):
+        months = [m for m in range(1, 13) if CronExpression("0 0 1 */3 *").matches(datetime.datetime(2022, m, 1))]
+        self.assertEqual(months, [3, 6, 9, 12])
+
+    def test_next_fire_time(self):
+        tz = get_localzone()
+        t = datetime.datetime(2022, 1, 30, 10, 2, 30, tzinfo=tz)
+
+        self.assertEqual(CronExpression("* * * * *").next_fire_time(t), datetime.datetime(2022, 1, 30, 10, 3, tzinfo=tz))
+        self.assertEqual(CronExpression("2 * * * *").next_fire_time(t), datetime.datetime(2022, 1, 30, 11, 2, tzinfo=tz))
+        self.assertEqual(CronExpression("0 0 * * *").next_fire_time(t), datetime.datetime(2022, 1, 31, 0, 0, tzinfo=tz))
+        self.assertEqual(CronExpression("30 6 * * mon-fri").next_fire_time(t), datetime.datetime(2022, 1, 31, 6, 30, tzinfo=tz))
+        self.assertEqual(CronExpression("0 12 29 2 *").next_fire_time(t), datetime.datetime(2024, 2, 29, 12, 0, tzinfo=tz))
+        self.assertEqual(CronExpression("0 12 30 2 *").next_fire_time(t), None)
+
+    def test_next_fire_time_brute_force(self):
+        t = datetime.datetime(2022, 12, 30, 22, 17)
+        for cron in ["*/7 * * * *", "15 8-18/3 * * *", "0 0 */10 * wed", "45 23 31 * *"]:
+            expression = CronExpression(cron)
+            fire_time = expression.next_fire_time(t)
+
+            expected = t.replace(second=0) + datetime.timedelta(minutes=1)
+            while not expression.matches(expected):
+                expected += datetime.timedelta(minutes=1)
+
+            self.assertEqual(fire_time, expected, cron)
+
+    def test_seconds(self):
+        tz = get_localzone()
+        t = datetime.datetime(2022, 1, 30, 10, 2, 30, tzinfo=tz)
+
+        expression = CronExpression("*/15 * * * * *")
+        self.assertTrue(expression.has_seconds)
+        self.assertEqual(expression.resolution, datetime.timedelta(seconds=1))
+        self.assertTrue(expression.matches(t))
+        self.assertFalse(expression.matches(t.replace(second=31)))
+        self.assertEqual(expression.next_fire_time(t), datetime.datetime(2022, 1, 30, 10, 2, 45, tzinfo=tz))
+        self.assertEqual(CronExpression("10 5 * * * *").next_fire_time(t), datetime.datetime(2022, 1, 30, 10, 5, 10, tzinfo=tz))
+
+        self.assertFalse(CronExpression("* * * * *").has_seconds)
+        self.assertTrue(CronExpression("2 * * * *").matches(t))  # 5 fields: seconds are ignored
+
+        with self.assertRaises(ValueError):
+            CronExpression("60 * * * * *")
+
+    def test_compile_is_cached(self):
+        self.assertIs(CronExpression.compile("*/5 * * * *"), CronExpression.compile("*/5 * * * *"))
@@ -0,0 +1,102 @@
+import unittest
+
+from worker_bunch.utils.debounce_engine import DebounceEngine, DebounceMode
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDebounceEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.engine = DebounceEngine(self.clock)
+        self.engine.register("a", 1.0)
+        self.engine.register("b", 0.5)
+
+    def test_debounce(self):
+        self.assertEqual(self.engine.get_seconds_to_next_deadline(), None)
+
+        self.engine.trigger("a")
+        self.clock.now += 0.8
+        self.engine.trigger("a")  # postponed
+        self.engine.trigger("b")
+        self.assertEqual(len(self.engine), 2)
+        self.assertAlmostEqual(self.engine.get_seconds_to_next_deadline(), 0.2)  # outdated entry of "a"
+
+        self.clock.now += 0.3
+        self.assertEqual(self.engine.pop_due(), [])
+        self.assertAlmostEqual(self.engine.get_seconds_to_next_deadline(), 0.2)  # "b"
+
+        self.clock.now += 0.2
+        self.assertEqual(self.engine.pop_due(), ["b"])
+
+        self.clock.now += 0.5
+        self.assertEqual(self.engine.pop_due(), ["a"])
+        self.assertEqual(len(self.engine), 0)
+        self.assertEqual(self.engine.get_seconds_to_next_deadline(), None)
+
+    def test_burst_keeps_heap_small(self):
+        for _ in range(1000):
+            self.engine.trigger("a")
+            self.engine.trigger("b")
+            self.clock.now += 0.01
+        self.assertEqual(len(self.engine._heap), 2)
+
+    def test_pop_all(self):
+        self.engine.trigger("a")
+        self.engine.trigger("b")
+        self.assertEqual(sorted(self.engine.pop_all()), ["a", "b"])
+        self.clock.now += 10
+        self.assertEqual(self.engine.pop_due(), [])
+
+    def test_register(self):
+        self.assertIn("a", self.engine)
+        self.assertNotIn("c", self.engine)
+        with self.assertRaises(KeyError):
+            self.engine.trigger("c")
+        with self.assertRaises(ValueError):
+            self.engine.register("c", -1)
+        with self.assertRaises(ValueError):
+            self.engine.register("c", 1, max_wait=0)
+
+    def run_continuous_events(self, key, interval: float, duration: float) -> list:
+        """Triggers every `interval` seconds; returns the (relative) times when the key got due."""
+        time_start = self.clock.now
+        due_times = []
+        while self.clock.now - time_start < duration:
+            if self.engine.trigger(key):
+                due_times.append(round(self.clock.now - time_start, 3))
+            self.clock.now += interval / 2
+            if self.engine.pop_due():
+                due_times.append(round(self.clock.now - time_start, 3))
+            self.clock.now += interval / 2
+        return due_times
+
+    def test_debounce_starves_without_max_wait(self):
+        self.engine.register("c", 0.1)
+        self.assertEqual(self.run_continuous_events("c", 0.08, 2.0), [])
+
+    def test_max_wait(self):
+        self.engine.register("c", 0.1, max_wait=0.5)
+        self.assertEqual(self.run_continuous_events("c", 0.08, 2.0), [0.52, 1.08, 1.64])
+
+    def test_throttle_trailing(self):
+        self.engine.register("c", 0.3, mode=DebounceMode.THROTTLE_TRAILING)
+        self.assertEqual(self.run_continuous_events("c", 0.08, 1.0), [0.36, 0.76])  # windows start with an event
+
+    def test_throttle_leading(self):
+        self.engine.register("c", 0.3, mode=DebounceMode.THROTTLE_LEADING)
+        self.assertEqual(self.run_continuous_events("c", 0.08, 1.0), [0.0, 0.36, 0.68, 1.0])
+
+        # quiet period => immediately again
+        self.clock.now += 1
+        self.assertTrue(self.engine.trigger("c"))
+        self.assertFalse(self.engine.trigger("c"))
+        self.assertEqual(len(self.engine), 1)
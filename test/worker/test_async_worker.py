@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import unittest
+from typing import List
+
+from worker_bunch.dispatcher import Dispatcher
+from worker_bunch.notification import Notification
+from worker_bunch.worker.async_worker import AsyncWorker
+from worker_bunch.worker.worker import WorkerSetup
+from worker_bunch.worker.worker_config import OverflowPolicy
+
+
+class RecordingAsyncWorker(AsyncWorker):
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.received: List[List[Notification]] = []
+        self.running = 0
+        self.max_running = 0
+        self.final_work_done = False
+
+    def subscribe_notifications(self, dispatcher: Dispatcher):
+        pass
+
+    async def _work(self, notifications: List[Notification]):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.received.append(sorted(n.topic for n in notifications))
+        self.running -= 1
+
+    def _final_work(self):
+        self.final_work_done = True
+
+
+class FailingAsyncWorker(RecordingAsyncWorker):
+
+    async def _work(self, notifications: List[Notification]):
+        raise ValueError("failed")
+
+
+class TestAsyncWorker(unittest.IsolatedAsyncioTestCase):
+
+    async def test_work(self):
+        worker = RecordingAsyncWorker("async")
+        worker.add_notifications({Notification.create_cron("before-start")})
+        worker.start()
+        self.assertTrue(worker.is_alive())
+
+        await asyncio.sleep(0.005)  # `_work` runs
+        worker.add_notifications({Notification.create_cron("a")})
+        worker.add_notifications({Notification.create_cron("b")})
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(worker.received, [["before-start"], ["a", "b"]])  # coalesced, never concurrent
+        self.assertEqual(worker.max_running, 1)
+
+        worker.stop()
+        await worker.wait_stopped()
+        self.assertFalse(worker.is_alive())
+        self.assertTrue(worker.final_work_done)
+
+    async def test_foreign_thread(self):
+        worker = RecordingAsyncWorker("async")
+        worker.start()
+
+        sender = threading.Thread(target=worker.add_notifications, args=({Notification.create_cron("thread")},))
+        sender.start()
+        sender.join()
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(worker.received, [["thread"]])
+        worker.stop()
+        await worker.wait_stopped()
+
+    async def test_exception_ends_worker(self):
+        worker = FailingAsyncWorker("failing")
+        worker.start()
+        worker.add_notifications({Notification.create_cron("cron")})
+
+        with self.assertLogs(level="ERROR"):
+            await worker.wait_stopped()
+        self.assertFalse(worker.is_alive())
+        self.assertTrue(worker.final_work_done)
+
+    async def test_run_single(self):
+        worker = RecordingAsyncWorker("async")
+        worker.add_notifications({Notification.create_cron("single")})
+        await worker.run_single_async()
+
+        self.assertEqual(worker.received, [["single"]])
+        self.assertTrue(worker.final_work_done)
+
+    def test_start_outside_loop(self):
+        with self.assertRaises(RuntimeError):
+            RecordingAsyncWorker("async").start()
+
+    async def test_overflow_and_lag(self):
+        worker = RecordingAsyncWorker("async")
+        worker.setup({WorkerSetup.MAX_PENDING: 3, WorkerSetup.OVERFLOW_POLICY: OverflowPolicy.DROP_OLDEST})
+        worker.start()
+
+        worker.add_notifications({Notification.create_cron("first")})
+        await asyncio.sleep(0.002)  # `_work` is busy now (sleeps)
+        for i in range(5):
+            worker.add_notifications({Notification.create_cron(f"cron-{i}")})
+
+        lag = worker.get_lag()
+        self.assertEqual((lag.pending, lag.dropped), (3, 2))
+        self.assertGreater(lag.busy_time, 0.0)
+
+        await asyncio.sleep(0.05)
+        self.assertEqual(worker.received, [["first"], ["cron-2", "cron-3", "cron-4"]])
+        lag = worker.get_lag()
+        self.assertEqual((lag.pending, lag.pending_age, lag.dropped), (0, 0.0, 2))
+
+        worker.stop()
+        await worker.wait_stopped()
@@ -0,0 +1,64 @@
+import unittest
+
+from worker_bunch.notification import Notification
+from worker_bunch.worker.notification_buffer import NotificationBuffer
+from worker_bunch.worker.worker_config import OverflowPolicy
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def mqtt(topic, payload="1"):
+    return Notification.create_mqtt(topic, payload)
+
+
+class TestNotificationBuffer(unittest.TestCase):
+
+    def test_latest_payload(self):
+        buffer = NotificationBuffer()
+        buffer.add([mqtt("a", "1"), mqtt("b", "1")])
+        buffer.add([mqtt("a", "2")])
+
+        self.assertEqual([(n.topic, n.payload) for n in buffer.take_all()], [("a", "2"), ("b", "1")])
+        self.assertFalse(buffer)
+
+    def test_keep_latest(self):
+        buffer = NotificationBuffer(2, OverflowPolicy.KEEP_LATEST)
+        buffer.add([mqtt("a"), mqtt("b")])
+        self.assertEqual(buffer.get_missing_space([mqtt("a"), mqtt("c")]), 1)
+
+        buffer.add([mqtt("c"), mqtt("a", "2")])
+        self.assertEqual(buffer.dropped, 1)
+        self.assertEqual([(n.topic, n.payload) for n in buffer.take_all()], [("a", "2"), ("b", "1")])
+
+    def test_drop_oldest(self):
+        buffer = NotificationBuffer(2, OverflowPolicy.DROP_OLDEST)
+        buffer.add([mqtt("a"), mqtt("b"), mqtt("c")])
+        buffer.add([mqtt("b", "2"), mqtt("d")])
+
+        self.assertEqual(buffer.dropped, 2)
+        self.assertEqual([(n.topic, n.payload) for n in buffer.take_all()], [("c", "1"), ("d", "1")])
+
+    def test_pending_age(self):
+        clock = FakeClock()
+        buffer = NotificationBuffer(clock=clock)
+        self.assertEqual(buffer.get_pending_age(), 0.0)
+
+        buffer.add([mqtt("a")])
+        clock.now += 5
+        buffer.add([mqtt("a", "2"), mqtt("b")])
+        clock.now += 1
+        self.assertEqual(buffer.get_pending_age(), 6.0)  # first arrival counts
+
+        buffer.take_all()
+        self.assertEqual(buffer.get_pending_age(), 0.0)
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            NotificationBuffer(0)
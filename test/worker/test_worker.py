@@ -0,0 +1,151 @@
+import threading
+import time
+import unittest
+from typing import List
+
+from worker_bunch.dispatcher import Dispatcher
+from worker_bunch.notification import Notification
+from worker_bunch.worker.worker import Worker, WorkerSetup
+from worker_bunch.worker.worker_config import OverflowPolicy
+
+
+class RecordingWorker(Worker):
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.received: List[Notification] = []
+        self.worked = threading.Event()
+        self.final_work_done = False
+
+    def subscribe_notifications(self, dispatcher: Dispatcher):
+        pass
+
+    def _work(self, notifications: List[Notification]):
+        self.received.extend(notifications)
+        self.worked.set()
+
+    def _final_work(self):
+        self.final_work_done = True
+
+
+class TestWorker(unittest.TestCase):
+
+    def setUp(self):
+        self.worker = RecordingWorker("test")
+        self.worker.start()
+
+    def tearDown(self):
+        self.worker.stop()
+        self.worker.join(1)
+
+    def test_wakeup_on_notifications(self):
+        time.sleep(0.05)  # the worker thread is blocked now
+
+        time_start = time.perf_counter()
+        self.worker.add_notifications({Notification.create_cron("cron")})
+        self.assertTrue(self.worker.worked.wait(1))
+
+        self.assertLess(time.perf_counter() - time_start, 0.1)  # the former polling took up to 0.5s
+        self.assertEqual(self.worker.received, [Notification.create_cron("cron")])
+
+    def test_deprecated_sleep_override(self):
+        class SleepingWorker(RecordingWorker):
+            def __init__(self):
+                super().__init__("sleeping")
+                self.sleeps = 0
+
+            def _sleep(self):
+                self.sleeps += 1
+                time.sleep(0.01)
+
+        worker = SleepingWorker()
+        with self.assertLogs(worker._logger, level="WARNING"):
+            worker.start()
+            time.sleep(0.05)
+        worker.add_notifications({Notification.create_cron("cron")})
+        self.assertTrue(worker.worked.wait(1))
+        worker.stop()
+        worker.join(1)
+        self.assertGreater(worker.sleeps, 1)  # still called (polling)
+
+    def test_wakeup_on_stop(self):
+        time.sleep(0.05)
+
+        self.worker.stop()
+        self.worker.join(0.1)
+
+        self.assertFalse(self.worker.is_alive())
+        self.assertTrue(self.worker.final_work_done)
+
+
+class TestWorkerSetup(unittest.TestCase):
+
+    def test_mqtt_qos(self):
+        self.assertIsNone(RecordingWorker("default").mqtt_qos)
+
+        worker = RecordingWorker("configured")
+        worker.setup({WorkerSetup.MQTT_QOS: 0})
+        self.assertEqual(worker.mqtt_qos, 0)
+
+        class TelemetryWorker(RecordingWorker):
+            MQTT_QOS = 0
+
+        worker = TelemetryWorker("class")
+        worker.setup({WorkerSetup.MQTT_QOS: None})
+        self.assertEqual(worker.mqtt_qos, 0)
+
+
+class BlockingWorker(RecordingWorker):
+
+    MAX_PENDING = 1
+    OVERFLOW_POLICY = OverflowPolicy.BLOCK
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.gate = threading.Event()
+
+    def _work(self, notifications: List[Notification]):
+        self.worked.set()
+        self.gate.wait(2)
+        self.received.extend(notifications)
+
+
+class TestWorkerBackpressure(unittest.TestCase):
+
+    def setUp(self):
+        self.worker = BlockingWorker("blocking")
+        self.worker.start()
+
+    def tearDown(self):
+        self.worker.gate.set()
+        self.worker.stop()
+        self.worker.join(1)
+
+    def test_block_and_lag(self):
+        self.worker.add_notifications({Notification.create_mqtt("a", "1")})
+        self.assertTrue(self.worker.worked.wait(1))  # busy now
+        self.worker.add_notifications({Notification.create_mqtt("b", "1")})
+        self.worker.add_notifications({Notification.create_mqtt("b", "2")})  # same topic: fits
+
+        sender = threading.Thread(target=self.worker.add_notifications, args=({Notification.create_mqtt("c", "1")},))
+        sender.start()
+        sender.join(0.1)
+        self.assertTrue(sender.is_alive())  # blocked
+
+        time.sleep(0.05)
+        lag = self.worker.get_lag()
+        self.assertEqual(lag.pending, 1)
+        self.assertGreater(lag.busy_time, 0.1)
+        self.assertGreater(lag.pending_age, 0.1)
+        self.assertEqual(lag.dropped, 0)
+
+        self.worker.worked.clear()
+        self.worker.gate.set()
+        sender.join(1)
+        self.assertFalse(sender.is_alive())
+
+        time_limit = time.perf_counter() + 1
+        while len(self.worker.received) < 3 and time.perf_counter() < time_limit:
+            time.sleep(0.01)
+        self.assertEqual([(n.topic, n.payload) for n in self.worker.received], [("a", "1"), ("b", "2"), ("c", "1")])
+        self.assertLess(self.worker.get_lag().busy_time, 0.5)
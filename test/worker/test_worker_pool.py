@@ -0,0 +1,180 @@
+import functools
+import threading
+import time
+import unittest
+from typing import List
+
+from worker_bunch.dispatcher import Dispatcher
+from worker_bunch.dispatcher_config import Priority
+from worker_bunch.notification import Notification
+from worker_bunch.worker.worker import Worker, WorkerSetup
+from worker_bunch.worker.worker_pool import WorkerPool
+
+
+class ConcurrencyWorker(Worker):
+
+    active_threads = 0
+    max_active_threads = 0
+    counter_lock = threading.Lock()
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.received: List[Notification] = []
+        self.running = 0
+        self.max_running = 0
+        self.final_work_done = False
+
+    def subscribe_notifications(self, dispatcher: Dispatcher):
+        pass
+
+    def _work(self, notifications: List[Notification]):
+        with self.counter_lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            ConcurrencyWorker.active_threads += 1
+            ConcurrencyWorker.max_active_threads = max(ConcurrencyWorker.max_active_threads, ConcurrencyWorker.active_threads)
+
+        time.sleep(0.005)
+        self.received.extend(notifications)
+
+        with self.counter_lock:
+            self.running -= 1
+            ConcurrencyWorker.active_threads -= 1
+
+    def _final_work(self):
+        self.final_work_done = True
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    POOL_SIZE = 3
+
+    def setUp(self):
+        ConcurrencyWorker.max_active_threads = 0
+        self.pool = WorkerPool(self.POOL_SIZE)
+        self.workers = [ConcurrencyWorker(f"worker-{i}") for i in range(10)]
+        for worker in self.workers:
+            worker.setup({WorkerSetup.WORKER_POOL: self.pool})
+            worker.start()
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.stop()
+        for worker in self.workers:
+            worker.join(1)
+        self.pool.shutdown()
+
+    def _wait_for(self, condition, timeout=2.0):
+        time_limit = time.perf_counter() + timeout
+        while not condition() and time.perf_counter() < time_limit:
+            time.sleep(0.005)
+        return condition()
+
+    def test_no_own_threads(self):
+        thread_count = threading.active_count()
+        for worker in self.workers:
+            worker.add_notifications({Notification.create_cron("cron")})
+
+        self.assertTrue(self._wait_for(lambda: all(w.received for w in self.workers)))
+        self.assertLessEqual(threading.active_count() - thread_count, self.POOL_SIZE)
+        self.assertLessEqual(ConcurrencyWorker.max_active_threads, self.POOL_SIZE)
+        self.assertTrue(all(w.is_alive() for w in self.workers))
+
+    def test_work_never_concurrent(self):
+        def send(index):
+            for i in range(50):
+                for worker in self.workers:
+                    worker.add_notifications({Notification.create_cron(f"cron-{index}-{i}")})
+
+        senders = [threading.Thread(target=send, args=(i,)) for i in range(4)]
+        for sender in senders:
+            sender.start()
+        for sender in senders:
+            sender.join()
+
+        self.assertTrue(self._wait_for(lambda: all(len(w.received) == 200 for w in self.workers), timeout=5))
+        for worker in self.workers:
+            self.assertEqual(worker.max_running, 1)
+
+    def test_stop(self):
+        worker = self.workers[0]
+        worker.add_notifications({Notification.create_cron("cron")})
+        worker.stop()
+        worker.join(1)
+
+        self.assertFalse(worker.is_alive())
+        self.assertTrue(worker.final_work_done)
+
+        worker.add_notifications({Notification.create_cron("late")})  # ignored
+        self.assertFalse(worker.is_alive())
+
+    def test_not_started(self):
+        worker = ConcurrencyWorker("not-started")
+        worker.setup({WorkerSetup.WORKER_POOL: self.pool})
+        worker.add_notifications({Notification.create_cron("cron")})
+        time.sleep(0.02)
+
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(worker.received, [])
+
+        worker.start()
+        self.assertTrue(self._wait_for(lambda: worker.received))
+        worker.stop()
+        worker.join(1)
+        self.assertFalse(worker.is_alive())
+
+
+class OrderWorker(Worker):
+
+    def __init__(self, name: str, executed: List[str]):
+        super().__init__(name)
+        self.executed = executed
+
+    def subscribe_notifications(self, dispatcher: Dispatcher):
+        pass
+
+    def _work(self, notifications: List[Notification]):
+        self.executed.append(self.name)
+
+
+class TestWorkerPoolPriority(unittest.TestCase):
+
+    def test_priority_order(self):
+        pool = WorkerPool(1)
+        gate = threading.Event()
+        executed = []
+
+        pool.submit(gate.wait)  # blocks the only thread
+        for name, priority in [("low", Priority.LOW), ("normal-1", Priority.NORMAL), ("high", Priority.HIGH),
+                               ("normal-2", Priority.NORMAL)]:
+            pool.submit(functools.partial(executed.append, name), priority)
+        gate.set()
+        pool.shutdown()
+
+        self.assertEqual(executed, ["high", "normal-1", "normal-2", "low"])
+
+    def test_worker_priority(self):
+        pool = WorkerPool(1)
+        gate = threading.Event()
+        pool.submit(gate.wait)
+
+        executed = []
+        workers = []
+        for name, priority in [("low", Priority.LOW), ("normal", None), ("high", Priority.HIGH)]:
+            worker = OrderWorker(name, executed)
+            worker.setup({WorkerSetup.WORKER_POOL: pool, WorkerSetup.WORKER_PRIORITY: priority})
+            worker.start()
+            worker.add_notifications({Notification.create_cron("cron")})
+            workers.append(worker)
+
+        gate.set()
+        time_limit = time.perf_counter() + 2
+        while len(executed) < len(workers) and time.perf_counter() < time_limit:
+            time.sleep(0.005)
+
+        for worker in workers:
+            worker.stop()
+            worker.join(1)
+        pool.shutdown()
+
+        self.assertEqual(executed, ["high", "normal", "low"])
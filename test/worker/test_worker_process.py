@@ -0,0 +1,73 @@
+import os
+import time
+import unittest
+from typing import List
+from unittest import mock
+
+from worker_bunch.dispatcher import Dispatcher
+from worker_bunch.mqtt.mqtt_proxy import MqttProxy
+from worker_bunch.notification import Notification
+from worker_bunch.worker.worker import Worker, WorkerSetup
+from worker_bunch.worker.worker_config import WorkerExecution
+
+
+class EchoWorker(Worker):
+    """Publishes the topics of its notifications (and its process id)."""
+
+    def subscribe_notifications(self, dispatcher: Dispatcher):
+        pass
+
+    def _work(self, notifications: List[Notification]):
+        if any(n.topic == "crash" for n in notifications):
+            os._exit(1)
+        for notification in notifications:
+            self._mqtt_proxy.queue("echo", {"topic": notification.topic, "pid": os.getpid()})
+
+    def _final_work(self):
+        self._mqtt_proxy.queue("echo", "last-will", retain=True)
+
+
+class TestWorkerProcess(unittest.TestCase):
+
+    def setUp(self):
+        self.mqtt_proxy = mock.Mock(spec=MqttProxy)
+        self.worker = EchoWorker("echo")
+        self.worker.setup({
+            WorkerSetup.MQTT_PROXY: self.mqtt_proxy,
+            WorkerSetup.WORKER_EXECUTION: WorkerExecution.PROCESS,
+            WorkerSetup.WORKER_SETTINGS: {"any": "setting"},
+        })
+
+    def tearDown(self):
+        self.worker.stop()
+        self.worker.join(5)
+
+    def _wait_for_calls(self, count, timeout=10.0):
+        time_limit = time.perf_counter() + timeout
+        while self.mqtt_proxy.queue.call_count < count and time.perf_counter() < time_limit:
+            time.sleep(0.01)
+        return self.mqtt_proxy.queue.call_args_list
+
+    def test_forwarding(self):
+        self.worker.start()
+        self.assertTrue(self.worker.is_alive())
+
+        self.worker.add_notifications({Notification.create_cron("cron")})
+        calls = self._wait_for_calls(1)
+        self.assertEqual(len(calls), 1)
+        topic, payload, retain = calls[0][0]
+        self.assertEqual(topic, "echo")
+        self.assertIn('"topic": "cron"', payload)
+        self.assertNotIn(f'"pid": {os.getpid()}', payload)
+
+        self.worker.stop()
+        self.worker.join(5)
+        self.assertFalse(self.worker.is_alive())
+        self.assertEqual(self.mqtt_proxy.queue.call_args_list[-1], mock.call("echo", "last-will", True, mode=None, qos=None))
+
+    def test_dead_worker(self):
+        self.worker.start()
+        self.worker.add_notifications({Notification.create_cron("crash")})
+        self.worker.join(5)
+
+        self.assertFalse(self.worker.is_alive())  # detected by the runner
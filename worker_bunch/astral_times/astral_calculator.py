@@ -0,0 +1,199 @@
+import array
+import datetime
+import math
+from typing import Dict, Optional, Sequence, Tuple
+
+import astral
+import astral.sun
+
+try:
+    import numpy
+except ImportError:  # optional, only needed for fast bulk calculations
+    numpy = None
+
+
+SUN_APPARENT_RADIUS = 32.0 / (60.0 * 2.0)  # as in astral.sun
+
+EPOCH_DATE = datetime.date(1970, 1, 1)
+
+
+class AstralEvent:
+    """Basic astral events; dawn/dusk need an additional depression."""
+
+    SUNRISE = "sunrise"
+    NOON = "noon"
+    SUNSET = "sunset"
+    MIDNIGHT = "midnight"
+    DAWN = "dawn"
+    DUSK = "dusk"
+
+
+class AstralCalculator:
+    """
+    Bulk calculation of astral times for a range of dates.
+
+    Uses the same NOAA formulas as `astral.sun`, but evaluated with NumPy for all dates at once. Without NumPy, `astral.sun`
+    is called for each single day. Results are epoch seconds (truncated to minutes, like all astral times in this
+    service) per date; NaN marks days without the event (polar days/nights).
+    """
+
+    EVENT_FUNCTIONS = {
+        AstralEvent.SUNRISE: astral.sun.sunrise,
+        AstralEvent.NOON: astral.sun.noon,
+        AstralEvent.SUNSET: astral.sun.sunset,
+        AstralEvent.MIDNIGHT: astral.sun.midnight,
+    }
+
+    @classmethod
+    def is_vectorized(cls) -> bool:
+        return numpy is not None
+
+    @classmethod
+    def calc_range(cls, observer: astral.Observer, first_date: datetime.date, days: int,
+                   events: Dict[str, Tuple[str, Optional[float]]]) -> Dict[str, Sequence[float]]:
+        """
+        :param events: result key => (AstralEvent, depression)
+        :return: result key => `numpy.ndarray` or `array.array` (with NumPy missing) of epoch seconds
+        """
+        if days < 0:
+            raise ValueError(f"invalid number of days ({days})!")
+
+        if numpy is None:
+            return {key: cls._calc_range_per_day(observer, first_date, days, *event) for key, event in events.items()}
+
+        jd = cls._julian_days(first_date, days)
+        day_seconds = (numpy.arange(days, dtype=numpy.float64) + (first_date - EPOCH_DATE).days) * 86400.0
+
+        results = {}
+        for key, (event, depression) in events.items():
+            # astral truncates (towards zero) to seconds (noon, midnight) or microseconds (transits) before
+            seconds_resolution = 1.0
+            if event == AstralEvent.NOON:
+                minutes = cls._noon_minutes(observer, jd)
+            elif event == AstralEvent.MIDNIGHT:
+                minutes = cls._midnight_minutes(observer, jd)
+            elif event in (AstralEvent.SUNRISE, AstralEvent.SUNSET):
+                minutes = cls._transit_minutes(observer, jd, 90.0 + SUN_APPARENT_RADIUS, event == AstralEvent.SUNRISE)
+                seconds_resolution = 1e-6
+            elif event in (AstralEvent.DAWN, AstralEvent.DUSK):
+                minutes = cls._transit_minutes(observer, jd, 90.0 + depression, event == AstralEvent.DAWN)
+                seconds_resolution = 1e-6
+            else:
+                raise ValueError(f"unknown astral event ({event})!")
+
+            seconds = numpy.trunc(minutes * 60.0 / seconds_resolution) * seconds_resolution
+            results[key] = day_seconds + numpy.floor(seconds / 60.0) * 60.0
+
+        return results
+
+    @classmethod
+    def _calc_range_per_day(cls, observer: astral.Observer, first_date: datetime.date, days: int, event: str,
+                            depression: Optional[float]) -> Sequence[float]:
+        if event == AstralEvent.DAWN:
+            def calc(date):
+                return astral.sun.dawn(observer, date, depression)
+        elif event == AstralEvent.DUSK:
+            def calc(date):
+                return astral.sun.dusk(observer, date, depression)
+        elif event in cls.EVENT_FUNCTIONS:
+            def calc(date):
+                return cls.EVENT_FUNCTIONS[event](observer, date)
+        else:
+            raise ValueError(f"unknown astral event ({event})!")
+
+        values = array.array("d")
+        for day in range(days):
+            try:
+                time = calc(first_date + datetime.timedelta(days=day))
+                values.append(math.floor(time.timestamp() / 60.0) * 60.0)
+            except ValueError:  # the sun doesn't reach the depression
+                values.append(math.nan)
+        return values
+
+    @classmethod
+    def _julian_days(cls, first_date: datetime.date, days: int):
+        """Julian day numbers (at 0:00 UTC) of the dates; identical to `astral.julianday`."""
+        ordinals = numpy.arange(days) + first_date.toordinal()
+        return ordinals.astype(numpy.float64) + 1721424.5
+
+    @classmethod
+    def _solar_parameters(cls, jc) -> tuple:
+        """Returns (declination, equation of time) in degrees/minutes for julian centuries."""
+        l0 = (280.46646 + jc * (36000.76983 + 0.0003032 * jc)) % 360.0
+        m = 357.52911 + jc * (35999.05029 - 0.0001537 * jc)
+        e = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+
+        m_rad = numpy.radians(m)
+        c = (numpy.sin(m_rad) * (1.914602 - jc * (0.004817 + 0.000014 * jc)) +
+             numpy.sin(2.0 * m_rad) * (0.019993 - 0.000101 * jc) +
+             numpy.sin(3.0 * m_rad) * 0.000289)
+
+        omega = numpy.radians(125.04 - 1934.136 * jc)
+        apparent_long = l0 + c - 0.00569 - 0.00478 * numpy.sin(omega)
+
+        seconds = 21.448 - jc * (46.815 + jc * (0.00059 - jc * 0.001813))
+        obliquity = 23.0 + (26.0 + (seconds / 60.0)) / 60.0 + 0.00256 * numpy.cos(omega)
+
+        declination = numpy.degrees(numpy.arcsin(numpy.sin(numpy.radians(obliquity)) * numpy.sin(numpy.radians(apparent_long))))
+
+        y = numpy.tan(numpy.radians(obliquity) / 2.0) ** 2
+        l0_rad = numpy.radians(l0)
+        eq_time = (y * numpy.sin(2.0 * l0_rad) -
+                   2.0 * e * numpy.sin(m_rad) +
+                   4.0 * e * y * numpy.sin(m_rad) * numpy.cos(2.0 * l0_rad) -
+                   0.5 * y * y * numpy.sin(4.0 * l0_rad) -
+                   1.25 * e * e * numpy.sin(2.0 * m_rad))
+        eq_time = numpy.degrees(eq_time) * 4.0
+
+        return declination, eq_time
+
+    @classmethod
+    def _jcentury(cls, jd):
+        return (jd - 2451545.0) / 36525.0
+
+    @classmethod
+    def _noon_minutes(cls, observer: astral.Observer, jd):
+        """Minutes after 0:00 UTC."""
+        _, eq_time = cls._solar_parameters(cls._jcentury(jd))
+        return 720.0 - 4.0 * observer.longitude - eq_time
+
+    @classmethod
+    def _midnight_minutes(cls, observer: astral.Observer, jd):
+        """Minutes after 0:00 UTC (mostly negative, the solar midnight closest to 0:00)."""
+        _, eq_time = cls._solar_parameters(cls._jcentury(jd + 0.5 - observer.longitude / 360.0))
+        return -4.0 * observer.longitude - eq_time
+
+    @classmethod
+    def _hour_angle(cls, latitude: float, declination, zenith: float, rising: bool):
+        latitude_rad = math.radians(latitude)
+        declination_rad = numpy.radians(declination)
+        h = ((math.cos(math.radians(zenith)) - math.sin(latitude_rad) * numpy.sin(declination_rad)) /
+             (math.cos(latitude_rad) * numpy.cos(declination_rad)))
+        with numpy.errstate(invalid="ignore"):
+            hour_angle = numpy.arccos(h)  # NaN: the sun doesn't reach the zenith
+        return hour_angle if rising else -hour_angle
+
+    @classmethod
+    def _transit_minutes(cls, observer: astral.Observer, jd, zenith: float, rising: bool):
+        """Minutes after 0:00 UTC; follows `astral.sun.time_of_transit` (two iterations)."""
+        latitude = max(-89.8, min(89.8, observer.latitude))
+
+        adjustment_for_elevation = 0.0
+        if isinstance(observer.elevation, float) and observer.elevation > 0.0:
+            adjustment_for_elevation = astral.sun.adjust_to_horizon(observer.elevation)
+        elif isinstance(observer.elevation, tuple):
+            adjustment_for_elevation = astral.sun.adjust_to_obscuring_feature(observer.elevation)
+
+        adjustment_for_refraction = astral.sun.refraction_at_zenith(zenith + adjustment_for_elevation)
+
+        jc = cls._jcentury(jd)
+        declination, eq_time = cls._solar_parameters(jc)
+        hour_angle = cls._hour_angle(latitude, declination, zenith + adjustment_for_elevation - adjustment_for_refraction,
+                                     rising)
+        minutes = 720.0 + 4.0 * (-observer.longitude - numpy.degrees(hour_angle)) - eq_time
+
+        jc = cls._jcentury(jd + minutes / 1440.0)
+        declination, eq_time = cls._solar_parameters(jc)
+        hour_angle = cls._hour_angle(latitude, declination, zenith + adjustment_for_elevation + adjustment_for_refraction,
+                                     rising)
+        return 720.0 + 4.0 * (-observer.longitude - numpy.degrees(hour_angle)) - eq_time
@@ -61,6 +61,8 @@ class AstralTimesConfKey:
     LONGITUDE = "longitude"
     ELEVATION = "elevation"
 
+    CALENDAR_DAYS = "calendar_days"
+
 
 ASTRAL_TIMES_JSONSCHEMA = {
     "additionalProperties": False,
@@ -75,6 +77,13 @@ ASTRAL_TIMES_JSONSCHEMA = {
             "maximum": 9000,
             "description": "in meters",
         },
+        AstralTimesConfKey.CALENDAR_DAYS: {
+            "type": "integer",
+            "minimum": 1,
+            "maximum": 31,
+            "description": "Number of days (beginning with the current day) the astral times are precalculated for. "
+                           "Default: 2",
+        },
     },
     "description": "A concrete location is necessary to use the astral time service. You don't need to configured it, "
                    "but this will lead to errors in case you use it.",
@@ -1,13 +1,14 @@
-import copy
 import datetime
 import logging
+import threading
 from collections import namedtuple
-from typing import List, Optional, Dict
+from typing import Optional, Dict, Tuple, List, Sequence
 
 import astral
 import astral.sun
 import attr
 
+from worker_bunch.astral_times.astral_calculator import AstralCalculator, AstralEvent
 from worker_bunch.astral_times.astral_times_config import AstralTime, AstralTimesConfKey
 from worker_bunch.service_config import ConfigException
 from worker_bunch.utils.time_utils import TimeUtils
@@ -47,6 +48,12 @@ class AstralParsed:
 
         return True
 
+    def get_key(self) -> str:
+        """Normalized astral key, e.g. "dawn06" and "dawn6" are the same."""
+        if self.predefined is not None:
+            return self.predefined.value
+        return f"{'dawn' if self.is_dawn else 'dusk'}{self.depression}"
+
 
 Location = namedtuple("Location", ["latitude", "longitude", "elevation"])
 
@@ -55,21 +62,43 @@ class AstralTimesManager:
     """
     Provides astral times for the configured location (latitude, longitude, altitude).
 
+    All used astral keys are precalculated at once for whole days (local dates; the current day plus a configurable
+    horizon), so `hits` and `get_astral_time` are simple lookups. The calendar moves on with the first lookup of a new
+    day, which is usually at local midnight; other days are calculated directly. Missing astral times (polar days/nights)
+    are stored as None.
+
     API: https://astral.readthedocs.io/en/stable/index.html
     """
 
+    DEFAULT_CALENDAR_DAYS = 2
+
+    NEXT_ASTRAL_TIME_SEARCH_DAYS = 366  # polar regions: some astral times don't happen for months
+
     def __init__(self, config):
         self._observer: Optional[astral.Observer] = None
+        self._calendar_days = self.DEFAULT_CALENDAR_DAYS
         if config:
             latitude = config[AstralTimesConfKey.LATITUDE]
             longitude = config[AstralTimesConfKey.LONGITUDE]
             altitude = config[AstralTimesConfKey.ELEVATION]
             self._observer = astral.Observer(latitude=latitude, longitude=longitude, elevation=altitude)
+            self._calendar_days = config.get(AstralTimesConfKey.CALENDAR_DAYS, self.DEFAULT_CALENDAR_DAYS)
+
+        self._lock = threading.Lock()  # used by the dispatcher and by workers
+        self._normalized_keys: Dict[str, str] = {}  # astral key (as configured) => normalized key
+        self._calendar_keys: Dict[str, AstralParsed] = {}  # normalized key => parsed
+        self._calendar: Dict[Tuple[datetime.date, Optional[datetime.tzinfo]], Dict[str, Optional[datetime.datetime]]] = {}
+        self._calendar_date: Optional[datetime.date] = None  # latest refresh
 
-        self._cache_time = TimeUtils.now()
-        self._cached_values: Dict[str, datetime.datetime] = {}
+    def __getstate__(self):
+        """Pickled for worker processes."""
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
 
-        self._reset_cache(self._cache_time)
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
 
     def get_location(self) -> Optional[Location]:
         """Returns configured location"""
@@ -77,38 +106,121 @@ class AstralTimesManager:
             return None
         return Location(latitude=self._observer.latitude, longitude=self._observer.longitude, elevation=self._observer.elevation)
 
-    def _reset_cache(self, cache_time):
-        self._cached_values = {}
-        self._cache_time = self.round_time_to_hour(cache_time)
-
-    def _get_or_calc_astral_time(self, astral_key: str, pivot_time: datetime.datetime):
-        if self._cache_time != self.round_time_to_hour(pivot_time):
-            self._reset_cache(pivot_time)
-        astral_time = self._cached_values.get(astral_key)
-        if astral_time is None:
-            if not self._observer:
-                raise ConfigException("Astral times are not configured - missing location!")
+    def register_astral_key(self, astral_key: str):
+        """Adds an astral key to the calendar (all registered keys are precalculated together). Raises `ValueError`."""
+        with self._lock:
+            self._register_astral_key(astral_key)
 
+    def _register_astral_key(self, astral_key: str) -> str:
+        normalized_key = self._normalized_keys.get(astral_key)
+        if normalized_key is None:
             parsed = self.parse_astral_time_key(astral_key)
-            astral_time = self.calc_astral_time(parsed, pivot_time, self._observer)
-            self._cached_values[astral_key] = astral_time
+            normalized_key = parsed.get_key()
+            self._normalized_keys[astral_key] = normalized_key
+
+            if normalized_key not in self._calendar_keys:
+                self._calendar_keys[normalized_key] = parsed
+                for (date, tzinfo), day_values in self._calendar.items():
+                    day_values[normalized_key] = self._calc_astral_time(parsed, date, tzinfo, self._observer)
+
+        return normalized_key
+
+    def _get_calendar_day(self, date: datetime.date, tzinfo) -> Optional[Dict[str, Optional[datetime.datetime]]]:
+        """Returns None for dates outside the calendar, they have to be calculated directly."""
+        self._move_calendar(date, tzinfo)
+        day_values = self._calendar.get((date, tzinfo))
+        if day_values is None and self._is_calendar_date(date):  # e.g. another tzinfo
+            day_values = self._calc_calendar_day(date, tzinfo)
+            self._calendar[(date, tzinfo)] = day_values
+        return day_values
+
+    def _move_calendar(self, date: datetime.date, tzinfo):
+        """
+        The calendar only moves forward (new day). Lookups of past days or of days far ahead (beyond the calendar and
+        beyond today) don't re-base it, otherwise the calendar would be rebuilt again with the next lookup of today.
+        """
+        if self._calendar_date is not None:
+            if date <= self._calendar_date:
+                return
+            if date >= self._calendar_date + datetime.timedelta(days=self._calendar_days) and date > TimeUtils.now().date():
+                return
+        self._refresh_calendar(date, tzinfo)
+
+    def _is_calendar_date(self, date: datetime.date) -> bool:
+        first_date = self._calendar_date - datetime.timedelta(days=1)  # missed ticks may be caught up after midnight
+        return first_date <= date < self._calendar_date + datetime.timedelta(days=self._calendar_days)
+
+    def _refresh_calendar(self, date: datetime.date, tzinfo):
+        """Drops outdated days and precalculates all registered keys for `date` and the following days."""
+        first_date = date - datetime.timedelta(days=1)  # missed ticks may be caught up after midnight
+        last_date = date + datetime.timedelta(days=self._calendar_days - 1)
+        self._calendar = {k: v for k, v in self._calendar.items() if first_date <= k[0] <= last_date}
+        self._calendar_date = date
+
+        for day in range(self._calendar_days):
+            calc_date = date + datetime.timedelta(days=day)
+            if (calc_date, tzinfo) not in self._calendar:
+                self._calendar[(calc_date, tzinfo)] = self._calc_calendar_day(calc_date, tzinfo)
+
+    def _calc_calendar_day(self, date: datetime.date, tzinfo) -> Dict[str, Optional[datetime.datetime]]:
+        return {key: self._calc_astral_time(parsed, date, tzinfo, self._observer) for key, parsed in self._calendar_keys.items()}
+
+    def _lookup_astral_time(self, astral_key: str, pivot_time: datetime.datetime) -> Optional[datetime.datetime]:
+        if not self._observer:
+            raise ConfigException("Astral times are not configured - missing location!")
 
-        return astral_time
+        with self._lock:
+            normalized_key = self._normalized_keys.get(astral_key) or self._register_astral_key(astral_key)
+            day_values = self._get_calendar_day(pivot_time.date(), pivot_time.tzinfo)
+            if day_values is None:
+                parsed = self._calendar_keys[normalized_key]
+                return self._calc_astral_time(parsed, pivot_time.date(), pivot_time.tzinfo, self._observer)
+            return day_values[normalized_key]
 
-    def hits(self, astral_key: str, pivot_time: Optional[datetime.datetime] = None) -> List[str]:
+    def hits(self, astral_key: str, pivot_time: Optional[datetime.datetime] = None) -> bool:
         if pivot_time is None:
             pivot_time = TimeUtils.now()
         pivot_time = self.cast_time_to_minute(pivot_time)
 
-        astral_time = self._get_or_calc_astral_time(astral_key, pivot_time)
+        astral_time = self._lookup_astral_time(astral_key, pivot_time)
         return astral_time == pivot_time
 
-    def get_astral_time(self, astral_key: str, pivot_time: Optional[datetime.datetime] = None) -> datetime.datetime:
+    def get_astral_time(self, astral_key: str, pivot_time: Optional[datetime.datetime] = None) -> Optional[datetime.datetime]:
         if pivot_time is None:
             pivot_time = TimeUtils.now()
-        pivot_time = self.cast_time_to_minute(pivot_time)
 
-        astral_time = self._get_or_calc_astral_time(astral_key, pivot_time)
+        return self._lookup_astral_time(astral_key, pivot_time)
+
+    def get_next_astral_time(self, astral_key: str, after: datetime.datetime) -> Optional[datetime.datetime]:
+        """Returns the first astral time strictly after `after` (timezone aware) or None if there is none within a year."""
+        if not self._observer:
+            raise ConfigException("Astral times are not configured - missing location!")
+
+        with self._lock:
+            normalized_key = self._normalized_keys.get(astral_key) or self._register_astral_key(astral_key)
+            parsed = self._calendar_keys[normalized_key]
+            tzinfo = after.tzinfo
+            self._move_calendar(after.date(), tzinfo)
+
+            # e.g. "midnight" may happen on the previous (local) day
+            first_date = after.date() - datetime.timedelta(days=1)
+            missing_days = 0
+            astral_time = None
+            for day in range(self.NEXT_ASTRAL_TIME_SEARCH_DAYS + 1):
+                date = first_date + datetime.timedelta(days=day)
+                day_values = self._calendar.get((date, tzinfo))
+                if day_values is not None:
+                    day_time = day_values[normalized_key]
+                else:
+                    day_time = self._calc_astral_time(parsed, date, tzinfo, self._observer, warn=False)
+                    missing_days += day_time is None
+
+                if day_time is not None and day_time > after:
+                    astral_time = day_time
+                    break
+
+        if missing_days:  # polar regions: once per search, not per day
+            _logger.warning("astral time (%s) doesn't happen on %d days after %s!", parsed, missing_days, first_date)
         return astral_time
 
     def get_astral_times(self, time: Optional[datetime.datetime] = None) -> Dict[str, any]:
@@ -118,15 +230,26 @@ class AstralTimesManager:
         data = {"timestamp": time}
 
         for astral_time in AstralTime:
-            recipe = AstralParsed(predefined=astral_time)
-            try:
-                data[astral_time.value] = self.calc_astral_time(recipe, time, self._observer)
-            except ValueError:
-                # ValueError: Sun never reaches 18 degrees below the horizon, at this location.
-                data[astral_time.value] = None
+            data[astral_time.value] = self._lookup_astral_time(astral_time.value, time)
 
         return data
 
+    def get_astral_times_range(self, first_date: datetime.date, days: int,
+                               astral_keys: Optional[List[str]] = None) -> Dict[str, Sequence[float]]:
+        """
+        Calculates astral times for `days` dates in one go (vectorized, if NumPy is available). Bypasses the calendar.
+
+        :param astral_keys: defaults to all predefined astral times
+        :return: astral key => epoch seconds per date (index 0 == `first_date`; NaN: no astral time on this date)
+        """
+        if not self._observer:
+            raise ConfigException("Astral times are not configured - missing location!")
+        if astral_keys is None:
+            astral_keys = AstralTime.values()
+
+        events = {key: self.get_astral_event(self.parse_astral_time_key(key)) for key in astral_keys}
+        return AstralCalculator.calc_range(self._observer, first_date, days, events)
+
     @classmethod
     def is_valid_astral_time_key(cls, value: str):
         try:
@@ -164,54 +287,48 @@ class AstralTimesManager:
         return time.replace(second=0, microsecond=0)
 
     @classmethod
-    def round_time_to_hour(cls, time: datetime.datetime) -> datetime.datetime:
-        time = cls.cast_time_to_minute(time)
-        time = time.replace(minute=0)
-        return time
-
-    @classmethod
-    def calc_astral_time(cls, parsed: AstralParsed, pivot_time: datetime.datetime, observer) -> datetime.datetime:
+    def calc_astral_time(cls, parsed: AstralParsed, pivot_time: datetime.datetime, observer) -> Optional[datetime.datetime]:
         if not parsed.is_valid():
             raise ValueError("invalid AstralParsed!")
 
-        parsed = copy.deepcopy(parsed)
+        return cls._calc_astral_time(parsed, pivot_time.date(), pivot_time.tzinfo, observer)
 
-        date = pivot_time.date()
-        astral_time = None
+    @classmethod
+    def get_astral_event(cls, parsed: AstralParsed) -> Tuple[str, Optional[float]]:
+        """Returns the `AstralEvent` and the depression (dawn/dusk only)."""
+        if parsed.predefined in [AstralTime.SUNRISE, AstralTime.NOON, AstralTime.SUNSET, AstralTime.MIDNIGHT]:
+            return parsed.predefined.value, None
+
+        depression = parsed.depression
+        if depression is None:
+            if parsed.predefined in [AstralTime.DAWN_CIVIL, AstralTime.DUSK_CIVIL]:
+                depression = 6
+            elif parsed.predefined in [AstralTime.DAWN_ASTRO, AstralTime.DUSK_ASTRO]:
+                depression = 12
+            elif parsed.predefined in [AstralTime.DAWN_NAUTICAL, AstralTime.DUSK_NAUTICAL]:
+                depression = 18
+
+        if parsed.is_dawn or parsed.predefined in [AstralTime.DAWN_CIVIL, AstralTime.DAWN_ASTRO, AstralTime.DAWN_NAUTICAL]:
+            return AstralEvent.DAWN, depression
+        return AstralEvent.DUSK, depression
 
-        try:
-            if parsed.predefined == AstralTime.SUNRISE:
-                astral_time = astral.sun.sunrise(observer, date, pivot_time.tzinfo)
-            elif parsed.predefined == AstralTime.NOON:
-                astral_time = astral.sun.noon(observer, date, pivot_time.tzinfo)
-            elif parsed.predefined == AstralTime.SUNSET:
-                astral_time = astral.sun.sunset(observer, date, pivot_time.tzinfo)
-            elif parsed.predefined == AstralTime.MIDNIGHT:
-                astral_time = astral.sun.midnight(observer, date, pivot_time.tzinfo)
-
-            if astral_time is None and parsed.depression is None:
-                if parsed.predefined in [AstralTime.DAWN_CIVIL, AstralTime.DUSK_CIVIL]:
-                    parsed.depression = 6
-                elif parsed.predefined in [AstralTime.DAWN_ASTRO, AstralTime.DUSK_ASTRO]:
-                    parsed.depression = 12
-                elif parsed.predefined in [AstralTime.DAWN_NAUTICAL, AstralTime.DUSK_NAUTICAL]:
-                    parsed.depression = 18
-
-            if parsed.predefined in [AstralTime.DAWN_CIVIL, AstralTime.DAWN_ASTRO, AstralTime.DAWN_NAUTICAL]:
-                parsed.is_dawn = True
-            elif parsed.predefined in [AstralTime.DUSK_CIVIL, AstralTime.DUSK_ASTRO, AstralTime.DUSK_NAUTICAL]:
-                parsed.is_dusk = True
-
-            if astral_time is None and parsed.is_dawn and parsed.depression is not None:
-                astral_time = astral.sun.dawn(observer, date, parsed.depression, pivot_time.tzinfo)
-
-            if astral_time is None and parsed.is_dusk and parsed.depression is not None:
-                astral_time = astral.sun.dusk(observer, date, parsed.depression, pivot_time.tzinfo)
+    @classmethod
+    def _calc_astral_time(cls, parsed: AstralParsed, date: datetime.date, tzinfo, observer,
+                          warn: bool = True) -> Optional[datetime.datetime]:
+        """Calculates the astral time of the local date. Returns None if the sun doesn't reach the depression."""
+        event, depression = cls.get_astral_event(parsed)
 
+        try:
+            if event == AstralEvent.DAWN:
+                astral_time = astral.sun.dawn(observer, date, depression, tzinfo)
+            elif event == AstralEvent.DUSK:
+                astral_time = astral.sun.dusk(observer, date, depression, tzinfo)
+            else:
+                astral_time = AstralCalculator.EVENT_FUNCTIONS[event](observer, date, tzinfo)
         except ValueError as ex:
-            _logger.warning(f"cannot get astral time ({parsed})! {ex}")
+            if warn:
+                _logger.warning(f"cannot get astral time ({parsed}; {date})! {ex}")
             return None
 
-        # if astral_time is None, then parsed.is_valid() has failed
         astral_time = cls.cast_time_to_minute(astral_time)
         return astral_time
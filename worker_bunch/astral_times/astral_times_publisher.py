@@ -54,7 +54,7 @@ class AstralTimesPublisher(Worker):
     def set_last_will(self):
         """Set the last will at mqtt client. Explicitly triggered before the mqtt client connects."""
         if self._mqtt_topic_out and self._mqtt_last_will:
-            self._mqtt_proxy.set_last_will(self._mqtt_topic_out, self._mqtt_last_will)
+            self._mqtt_proxy.set_last_will(self._mqtt_topic_out, self._mqtt_last_will, qos=self._mqtt_qos)
 
     def subscribe_notifications(self, dispatcher: Dispatcher):
         dispatcher.subscribe_cron(self, "0 * * * *", "cron-every-hour")
@@ -66,11 +66,12 @@ class AstralTimesPublisher(Worker):
             if self._astral_time_manager:
                 astral_times = self._astral_time_manager.get_astral_times()
                 astral_times["status"] = "ok"
-                self._mqtt_proxy.queue(topic=self._mqtt_topic_out, payload=astral_times, retain=self._mqtt_retain)
+                self._mqtt_proxy.queue(topic=self._mqtt_topic_out, payload=astral_times, retain=self._mqtt_retain,
+                                       qos=self._mqtt_qos)
             else:
                 self._final_work()
 
     def _final_work(self):
         """sends the last will"""
         if self._mqtt_topic_out and self._mqtt_last_will:
-            self._mqtt_proxy.queue(self._mqtt_topic_out, self._mqtt_last_will, retain=self._mqtt_retain)
+            self._mqtt_proxy.queue(self._mqtt_topic_out, self._mqtt_last_will, retain=self._mqtt_retain, qos=self._mqtt_qos)
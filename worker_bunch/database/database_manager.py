@@ -12,6 +12,14 @@ class DatabaseManager:
         self._config = copy.deepcopy(config)
         self._lock = threading.Lock()
 
+    def __getstate__(self):
+        """Pickled for worker processes."""
+        return {"_config": self._config}
+
+    def __setstate__(self, state):
+        self._config = state["_config"]
+        self._lock = threading.Lock()
+
     def create(self, context_name: str, connection_key: str) -> DatabaseConnector:
         with self._lock:
             connection_config = self._config.get(connection_key)
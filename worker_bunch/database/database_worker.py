@@ -80,7 +80,7 @@ class DatabaseWorker(Worker):
     def set_last_will(self):
         for step in self._steps:
             if step.mqtt_topic and step.mqtt_last_will:
-                self._mqtt_proxy.set_last_will(step.mqtt_topic, step.mqtt_last_will, step.mqtt_retain)
+                self._mqtt_proxy.set_last_will(step.mqtt_topic, step.mqtt_last_will, step.mqtt_retain, qos=self._mqtt_qos)
 
     def subscribe_notifications(self, dispatcher: Dispatcher):
         dispatcher.subscribe_cron(self, self._cron, self.CRON_TOPIC)
@@ -126,14 +126,14 @@ class DatabaseWorker(Worker):
     def _final_work(self):
         for step in self._steps:
             if step.mqtt_topic and step.mqtt_last_will:
-                self._mqtt_proxy.queue(step.mqtt_topic, step.mqtt_last_will, step.mqtt_retain)
+                self._mqtt_proxy.queue(step.mqtt_topic, step.mqtt_last_will, step.mqtt_retain, qos=self._mqtt_qos)
 
     def _query_json(self, database: DatabaseConnector, step: Step):
         with database.connection.cursor(row_factory=dict_row) as cursor:
             cursor.execute(step.statement)
             fetched = cursor.fetchone()
 
-            self._mqtt_proxy.queue(step.mqtt_topic, fetched, step.mqtt_retain)
+            self._mqtt_proxy.queue(step.mqtt_topic, fetched, step.mqtt_retain, qos=self._mqtt_qos)
 
     def _query_scalar(self, database: DatabaseConnector, step: Step):
         with database.connection.cursor(row_factory=dict_row) as cursor:
@@ -144,7 +144,7 @@ class DatabaseWorker(Worker):
                 raise ConfigException("Scalar statement must return exactly 1 result column!")
 
             payload = str(list(fetched.values())[0])
-            self._mqtt_proxy.queue(step.mqtt_topic, payload, step.mqtt_retain)
+            self._mqtt_proxy.queue(step.mqtt_topic, payload, step.mqtt_retain, qos=self._mqtt_qos)
 
     @classmethod
     def _execute(cls, database: DatabaseConnector, step: Step):
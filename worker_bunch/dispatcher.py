@@ -1,24 +1,36 @@
 import abc
+import datetime
+import heapq
 import logging
-from typing import Dict, List, Optional, Set
+from typing import Collection, Dict, Iterable, List, Optional, Set, Tuple
 
-import rx
 import attr
 import schedule
-from rx import operators as rx_ops
 from paho.mqtt.client import MQTTMessage
-from rx.core import Observer
-from rx.disposable import Disposable
 
 from worker_bunch.astral_times.astral_times_manager import AstralTimesManager
+from worker_bunch.dispatcher_config import CatchUpPolicy, DeliveryMode, DeliveryPolicy, Priority
+from worker_bunch.mqtt.topic_trie import TopicTrie
 from worker_bunch.notification import Notification, NotificationType, NotificationBucket
 from worker_bunch.service_config import ConfigException
+from worker_bunch.utils.cron_expression import CronExpression
+from worker_bunch.utils.debounce_engine import DebounceEngine, DebounceMode
 from worker_bunch.utils.time_utils import TimeUtils
 
 
 _logger = logging.getLogger(__name__)
 
 
+@attr.frozen
+class ListenerLag:
+    """Backlog of a listener (worker)."""
+
+    pending: int  # number of pending notifications
+    pending_age: float  # seconds since the oldest pending notification arrived
+    busy_time: float  # seconds the current work (`_work`) is running, 0 if idle
+    dropped: int  # total number of notifications dropped due to overflow
+
+
 class DispatcherListener:
 
     @abc.abstractmethod
@@ -29,13 +41,21 @@ class DispatcherListener:
     def name(self) -> str:
         raise NotImplementedError()
 
+    def get_priority(self, notifications: Collection[Notification]) -> Priority:
+        """Priority of the pending notifications; decides the delivery order when several listeners are due at once."""
+        return Priority.NORMAL
+
+    def get_lag(self) -> Optional[ListenerLag]:
+        """None if not supported."""
+        return None
+
 
 @attr.frozen
 class TopicMatch:
 
     topic: str
-    search_pattern: str = None
     listeners: Set[DispatcherListener] = attr.Factory(set)
+    policies: Dict[DispatcherListener, DeliveryPolicy] = attr.Factory(dict)  # per listener
 
 
 @attr.frozen
@@ -43,6 +63,7 @@ class AstralSubscription:
     astral_key: str
     topic: str
     listener: DispatcherListener = attr.Factory(None)
+    catch_up_policy: Optional[CatchUpPolicy] = None  # None: dispatcher default
 
 
 @attr.frozen
@@ -50,6 +71,7 @@ class CronSubscription:
     cron: str
     topic: str
     listener: DispatcherListener = attr.Factory(None)
+    catch_up_policy: Optional[CatchUpPolicy] = None  # None: dispatcher default
 
 
 class Dispatcher:
@@ -59,120 +81,128 @@ class Dispatcher:
 
     DEFAULT_DEBOUNCE_TIME = 0.1
 
-    def __init__(self, astral_time_manager: AstralTimesManager):
+    MAX_CATCH_UP_TICKS = 1000  # per cron/astral key and evaluation; limits the work after a long stall
+
+    ASTRAL_RESOLUTION = datetime.timedelta(minutes=1)
+
+    def __init__(self, astral_time_manager: AstralTimesManager, catch_up_policy: CatchUpPolicy = CatchUpPolicy.FIRE_ONCE):
 
         self._astral_time_manager = astral_time_manager
+        self._catch_up_policy = catch_up_policy
 
         self._shutdown = False
 
-        self._last_timer_execution = TimeUtils.now().replace(second=0, microsecond=0)
+        self._last_timer_execution = TimeUtils.now().replace(microsecond=0)
 
-        self._max_debounce_time = 0
+        # one debounce deadline per listener and (timed) delivery policy; flushed with `trigger_timers`
+        self._debounce_engine: DebounceEngine[Tuple[DispatcherListener, DeliveryPolicy]] = DebounceEngine()
+        self._delivery_policies: Dict[DispatcherListener, Set[DeliveryPolicy]] = {}  # timed policies per listener
 
         # separation of notifications and trigger, notifications are overwritten by newer ones
         self._notifications: Dict[DispatcherListener, NotificationBucket] = {}
 
-        self._exact_topic_matches: Dict[str, TopicMatch] = {}
-        self._wildcard_topic_matches: List[TopicMatch] = []
+        self._topic_matches: TopicTrie[TopicMatch] = TopicTrie()
 
         self._astral_subscriptions: Dict[str, List[AstralSubscription]] = {}
         self._timer_subscriptions: Set[DispatcherListener] = set()  # only to send SINGLE notifications
         self._cron_subscriptions: Dict[str, List[CronSubscription]] = {}
-        self._observers: Dict[DispatcherListener, Optional[Observer]] = {}
-
-        # only simple values can be pushed through pipelines. So an "listener-id" instead if the listener reference gets pushed.
-        self._observer_listener: Dict[int, DispatcherListener] = {}
-
-        self._disposables: List[Disposable] = []
+        self._cron_expressions: Dict[str, CronExpression] = {}
+        # min-heap of the next fire times (wall clock, without tzinfo) per cron and astral key:
+        # (fire time, NotificationType.value, cron or astral key)
+        self._timer_deadlines: List[Tuple[datetime.datetime, str, str]] = []
 
     def close(self):
+        self.flush_notifications()
         self._shutdown = True
 
-        for observable in self._observers.values():
-            observable.on_completed()
-        self._observers = {}
-
-        wait_for_emptied_queues = min(self._max_debounce_time + 0.05, 1.0)
-        TimeUtils.sleep(wait_for_emptied_queues)
-
-        for disposable in self._disposables:
-            disposable.dispose()
-        self._disposables = []
-
     def get_mqtt_topics(self) -> List[str]:
-        topics = [m.topic for m in self._wildcard_topic_matches]
-        topics.extend([m.topic for m in self._exact_topic_matches.values()])
-        return topics
-
-    @classmethod
-    def check_and_extract_wildcard_topic(cls, topic):
-        if topic.endswith("#"):
-            return topic.strip("#")
+        return [m.topic for m in self._topic_matches.values()]
+
+    def _register_mqtt_topic(self, listener: DispatcherListener, topic: str, policy: DeliveryPolicy):
+        topic_match = self._topic_matches.get(topic)
+        if topic_match is None:
+            topic_match = TopicMatch(topic=topic)
+            self._topic_matches.insert(topic, topic_match)
+        topic_match.listeners.add(listener)
+        topic_match.policies[listener] = policy
+
+    def _register_delivery_policy(self, listener: DispatcherListener, policy: DeliveryPolicy):
+        if policy.mode == DeliveryMode.IMMEDIATE:
+            return
+        if policy.mode == DeliveryMode.KEEP_LATEST:
+            if policy.max_wait is None:
+                return
+            debounce_mode, delay, max_wait = DebounceMode.THROTTLE_TRAILING, policy.max_wait, None
         else:
-            return None
+            debounce_mode, delay, max_wait = DebounceMode(policy.mode.value), policy.delay, policy.max_wait
 
-    def _register_mqtt_topic(self, listener: DispatcherListener, topic: str):
-        wildcard_search_pattern = self.check_and_extract_wildcard_topic(topic)
-        if wildcard_search_pattern:
-            topic_match = next((m for m in self._wildcard_topic_matches if m.topic == topic), None)
-            if topic_match is None:
-                topic_match = TopicMatch(topic=topic, search_pattern=wildcard_search_pattern)
-                self._wildcard_topic_matches.append(topic_match)
-            topic_match.listeners.add(listener)
-
-        else:
-            topic_match = self._exact_topic_matches.get(topic)
-            if topic_match is None:
-                topic_match = TopicMatch(topic=topic)
-                self._exact_topic_matches[topic] = topic_match
-            topic_match.listeners.add(listener)
+        try:
+            self._debounce_engine.register((listener, policy), delay, max_wait, debounce_mode)
+        except ValueError as ex:
+            raise ConfigException(f"wrong delivery policy ({policy}; worker: {listener.name}): {ex}")
+        self._delivery_policies[listener].add(policy)
 
     def subscribe_mqtt_topics(self, listener: DispatcherListener, topics: List[str],
-                              debounce_time: float = DEFAULT_DEBOUNCE_TIME) -> None:
-        if listener in self._observer_listener:
-            raise RuntimeError(f"Listener ({listener.name}) has already subscribed (only one pipeline per listener)!")
-        self._observer_listener[id(listener)] = listener
-
-        self._max_debounce_time = max(self._max_debounce_time, debounce_time)
+                              debounce_time: float = DEFAULT_DEBOUNCE_TIME, max_wait: Optional[float] = None,
+                              debounce_mode: DebounceMode = DebounceMode.DEBOUNCE,
+                              topic_policies: Optional[Dict[str, DeliveryPolicy]] = None) -> None:
+        """
+        :param debounce_time: (DEBOUNCE) notifications are sent after this quiet period, (THROTTLE_*) at most once per period
+        :param max_wait: (DEBOUNCE) pending notifications are sent at the latest `max_wait` seconds after the first one;
+            otherwise continuous messages (faster than `debounce_time`) would postpone them forever
+        :param debounce_mode: see `DebounceMode`
+        :param topic_policies: individual delivery policies per topic (filter), e.g. immediate delivery of door contacts;
+            these topics are subscribed too. Any delivery contains all pending notifications of the listener.
+        """
+        if listener in self._delivery_policies:
+            raise RuntimeError(f"Listener ({listener.name}) has already subscribed (only one subscription per listener)!")
 
+        topic_policies = dict(topic_policies or {})
         for topic in topics:
-            self._register_mqtt_topic(listener, topic)
+            topic_policies.setdefault(topic, DeliveryPolicy(DeliveryMode(debounce_mode.value), debounce_time, max_wait))
 
-        def creating_observer_callback(observer, _):
-            self._observers[listener] = observer
+        for topic in topic_policies.keys():
+            try:
+                TopicTrie.validate_filter(topic)
+            except ValueError as ex:
+                raise ConfigException(f"wrong MQTT topic ('{topic}'; worker: {listener.name}): {ex}")
 
-        observable = rx.create(creating_observer_callback)
+        self._delivery_policies[listener] = set()
+        for topic, policy in topic_policies.items():
+            self._register_delivery_policy(listener, policy)
+            self._register_mqtt_topic(listener, topic, policy)
 
-        instance = self
-        disposable = observable.pipe(
-            rx_ops.debounce(debounce_time)
-        ).subscribe(lambda listener_id: instance._send_notifications_by_id(listener_id))
-
-        self._disposables.append(disposable)
-
-    def subscribe_astral_or_cron(self, listener: DispatcherListener, astral_or_cron: str, topic: str):
+    def subscribe_astral_or_cron(self, listener: DispatcherListener, astral_or_cron: str, topic: str,
+                                 catch_up_policy: Optional[CatchUpPolicy] = None):
         if self._astral_time_manager.is_valid_astral_time_key(astral_or_cron):
-            self.subscribe_astral_time(listener, astral_or_cron, topic)
+            self.subscribe_astral_time(listener, astral_or_cron, topic, catch_up_policy)
         elif TimeUtils.is_cron_time_syntax(astral_or_cron):
-            self.subscribe_cron(listener, astral_or_cron, topic)
+            self.subscribe_cron(listener, astral_or_cron, topic, catch_up_policy)
         else:
             raise ConfigException(f"No astral nor cron format ('{astral_or_cron}'; worker: {listener.name})!")
 
-    def subscribe_astral_time(self, listener: DispatcherListener, astral_key: str, topic: str):
+    def subscribe_astral_time(self, listener: DispatcherListener, astral_key: str, topic: str,
+                              catch_up_policy: Optional[CatchUpPolicy] = None):
         if not self._astral_time_manager.is_valid_astral_time_key(astral_key):
             raise ConfigException(f"wrong astral format ('{astral_key}'; worker: {listener.name})!")
+        self._astral_time_manager.register_astral_key(astral_key)
 
         subscriptions = self._astral_subscriptions.get(astral_key)
         if subscriptions is None:
             subscriptions = []
             self._astral_subscriptions[astral_key] = subscriptions
+            self._schedule_timer(NotificationType.ASTRAL, astral_key, self._last_timer_execution)
 
-        subscription = AstralSubscription(astral_key, topic, listener)
+        subscription = AstralSubscription(astral_key, topic, listener, catch_up_policy)
         subscriptions.append(subscription)
 
-    def subscribe_cron(self, listener: DispatcherListener, cron: str, topic: str):
+    def subscribe_cron(self, listener: DispatcherListener, cron: str, topic: str, catch_up_policy: Optional[CatchUpPolicy] = None):
+        """
+        :param cron: 5-field cron expression or 6-field expression with leading seconds
+        :param catch_up_policy: overwrites the dispatcher default for ticks missed by a stalled service
+        """
         try:
-            TimeUtils.hits_cron_time(cron)  # result down not matter here, just fail immediately
+            expression = CronExpression.compile(cron)
         except ValueError as ex:
             raise ConfigException(f"wrong cron format (cron: '{cron}'; worker: {listener.name}): {str(ex)}!")
 
@@ -180,8 +210,10 @@ class Dispatcher:
         if subscriptions is None:
             subscriptions = []
             self._cron_subscriptions[cron] = subscriptions
+            self._cron_expressions[cron] = expression
+            self._schedule_timer(NotificationType.CRON, cron, self._last_timer_execution)
 
-        subscription = CronSubscription(cron, topic, listener)
+        subscription = CronSubscription(cron, topic, listener, catch_up_policy)
         subscriptions.append(subscription)
 
     def subscribe_timer(self, listener: DispatcherListener, timer_job: schedule.Job, topic: str):
@@ -206,35 +238,125 @@ class Dispatcher:
 
         self._timer_subscriptions.add(listener)
 
+    def _get_next_tick(self, notification_type: NotificationType, key: str, after: datetime.datetime,
+                       tzinfo) -> Optional[datetime.datetime]:
+        """Next fire time (wall clock, without tzinfo) of a cron or astral key after `after` (wall clock)."""
+        if notification_type == NotificationType.CRON:
+            return self._cron_expressions[key].next_fire_time(after)
+
+        astral_time = self._astral_time_manager.get_next_astral_time(key, after.replace(tzinfo=tzinfo))
+        if astral_time is None:
+            return None
+        return astral_time.astimezone(tzinfo).replace(tzinfo=None)
+
+    def _schedule_timer(self, notification_type: NotificationType, key: str, after: datetime.datetime):
+        fire_time = self._get_next_tick(notification_type, key, after.replace(tzinfo=None), after.tzinfo)
+        if fire_time is not None:
+            heapq.heappush(self._timer_deadlines, (fire_time, notification_type.value, key))
+        else:
+            _logger.warning("%s '%s' will never fire!", notification_type.value.lower(), key)
+
+    def _pop_due_timers(self, now: datetime.datetime) -> List[Tuple[NotificationType, str, List[datetime.datetime]]]:
+        """
+        Pops all crons and astral keys which are due at `now` and schedules their next fire time. Returns all (missed)
+        ticks per key up to `now` (wall clock times).
+        """
+        due_timers = []
+        wall_time = now.replace(tzinfo=None)
+
+        while self._timer_deadlines and self._timer_deadlines[0][0] <= wall_time:
+            tick, type_value, key = heapq.heappop(self._timer_deadlines)
+            notification_type = NotificationType(type_value)
+
+            ticks = [tick]
+            next_tick = self._get_next_tick(notification_type, key, tick, now.tzinfo)
+            while next_tick is not None and next_tick <= wall_time:
+                if len(ticks) >= self.MAX_CATCH_UP_TICKS:
+                    _logger.warning("%s '%s': too many missed ticks, only %d are handled!", type_value.lower(), key, len(ticks))
+                    next_tick = self._get_next_tick(notification_type, key, wall_time, now.tzinfo)
+                    break
+                ticks.append(next_tick)
+                next_tick = self._get_next_tick(notification_type, key, next_tick, now.tzinfo)
+
+            if next_tick is not None:
+                heapq.heappush(self._timer_deadlines, (next_tick, type_value, key))
+
+            due_timers.append((notification_type, key, ticks))
+
+        return due_timers
+
+    def _select_ticks(self, ticks: List[datetime.datetime], now: datetime.datetime, resolution: datetime.timedelta,
+                      catch_up_policy: Optional[CatchUpPolicy]) -> List[datetime.datetime]:
+        """Applies the catch-up policy. A tick is missed, if it's (at least) one resolution step (second/minute) old."""
+        catch_up_policy = catch_up_policy or self._catch_up_policy
+        last_tick = ticks[-1]
+
+        if len(ticks) > 1 or now.replace(tzinfo=None) - last_tick >= resolution:
+            _logger.debug("%d missed tick(s) (last: %s) => %s", len(ticks), last_tick, catch_up_policy.value)
+
+        if catch_up_policy == CatchUpPolicy.FIRE_ALL:
+            return ticks
+        if catch_up_policy == CatchUpPolicy.SKIP and now.replace(tzinfo=None) - last_tick >= resolution:
+            return []
+        return [last_tick]
+
+    def get_seconds_to_next_timer(self) -> float:
+        """Time (in seconds) until `trigger_timers` has to be called next (timer jobs, next cron or astral time)."""
+        now = TimeUtils.now()
+        seconds = float("inf")
+
+        if self._timer_deadlines:
+            next_tick = self._timer_deadlines[0][0].replace(tzinfo=now.tzinfo)
+            seconds = (next_tick - now).total_seconds()
+
+        debounce_seconds = self._debounce_engine.get_seconds_to_next_deadline()
+        if debounce_seconds is not None:
+            seconds = min(seconds, debounce_seconds)
+
+        idle_seconds = schedule.idle_seconds()
+        if idle_seconds is not None:
+            seconds = min(seconds, idle_seconds)
+
+        return max(seconds, 0.0)
+
     def trigger_timers(self):
-        """Triggers timer and cron notification,"""
+        """Triggers timer and cron notification and sends the debounced MQTT notifications."""
         if self._shutdown:
             return
 
+        self._send_notifications_by_priority(listener for listener, _ in self._debounce_engine.pop_due())
+
         schedule.run_pending()
 
-        now = TimeUtils.now().replace(second=0, microsecond=0)
+        now = TimeUtils.now().replace(microsecond=0)
 
-        if self._last_timer_execution < now:  # next minute
+        if self._last_timer_execution < now:  # next second
             self._last_timer_execution = now
-            send_to: Set[DispatcherListener] = set()
 
-            for cron, subscriptions in self._cron_subscriptions.items():
-                if TimeUtils.hits_cron_time(cron, now):
-                    for subscription in subscriptions:
-                        notification = Notification(type=NotificationType.CRON, topic=subscription.topic, payload=None)
-                        self._store_notification(subscription.listener, notification)
-                        send_to.add(subscription.listener)
+            fired: Dict[datetime.datetime, List[Tuple[DispatcherListener, Notification]]] = {}  # per tick
 
-            for astral_key, subscriptions in self._astral_subscriptions.items():
-                if self._astral_time_manager.hits(astral_key, now):
-                    for subscription in subscriptions:
-                        notification = Notification(type=NotificationType.ASTRAL, topic=subscription.topic, payload=None)
-                        self._store_notification(subscription.listener, notification)
-                        send_to.add(subscription.listener)
+            for notification_type, key, ticks in self._pop_due_timers(now):
+                if notification_type == NotificationType.CRON:
+                    subscriptions = self._cron_subscriptions[key]
+                    resolution = self._cron_expressions[key].resolution
+                else:
+                    subscriptions = self._astral_subscriptions[key]
+                    resolution = self.ASTRAL_RESOLUTION
 
-            for listener in send_to:
-                self._send_notifications(listener)
+                for subscription in subscriptions:
+                    for tick in self._select_ticks(ticks, now, resolution, subscription.catch_up_policy):
+                        # the tick is part of the notification key, so caught up ticks don't replace each other
+                        notification = Notification(type=notification_type, topic=subscription.topic,
+                                                    tick=tick.replace(tzinfo=now.tzinfo))
+                        fired.setdefault(tick, []).append((subscription.listener, notification))
+
+            for tick in sorted(fired.keys()):  # each tick gets delivered on its own
+                send_to: Set[DispatcherListener] = set()
+                for listener, notification in fired[tick]:
+                    self._store_notification(listener, notification)
+                    send_to.add(listener)
+
+                self._send_notifications_by_priority(send_to)
 
     def trigger_start_notification(self, listeners: List[DispatcherListener], notification_type: NotificationType = None):
         """Send a message to all workers/listeners, that we just started"""
@@ -242,34 +364,50 @@ class Dispatcher:
             notification_type = NotificationType.JUST_STARTED
         notification = Notification(type=notification_type, topic="", payload=None)
 
-        for listener in list(listeners):
+        listeners = list(listeners)
+        for listener in listeners:
             self._store_notification(listener, notification)
-            self._send_notifications(listener)
+        self._send_notifications_by_priority(listeners)
 
     def push_mqtt_messages(self, messages: List[MQTTMessage]):
         if self._shutdown:
             return
 
+        immediate_listeners: Set[DispatcherListener] = set()
+        timed_deliveries: Set[Tuple[DispatcherListener, DeliveryPolicy]] = set()
+
         for message in messages:
             notification = Notification.create_from_mqtt(message)
 
-            listeners: Set[DispatcherListener] = set()
-
-            match = self._exact_topic_matches.get(notification.topic)
-            if match:
-                listeners.update(match.listeners)
-
-            for match in self._wildcard_topic_matches:
-                if notification.topic.startswith(match.search_pattern):
-                    listeners.update(match.listeners)
-
-            for listener in list(listeners):
-                self._store_notification(listener, notification)
-                self._queue_notification(listener)
-
-    def _queue_notification(self, listener: DispatcherListener):
-        observer = self._observers[listener]  # must exists
-        observer.on_next(id(listener))
+            for match in self._topic_matches.match(notification.topic):
+                for listener, policy in match.policies.items():
+                    self._store_notification(listener, notification)
+                    if policy.mode == DeliveryMode.IMMEDIATE:
+                        immediate_listeners.add(listener)
+                    elif policy in self._delivery_policies[listener]:  # KEEP_LATEST without max. wait time: not timed
+                        timed_deliveries.add((listener, policy))
+
+        # once per batch, so a leading throttle sends the whole batch
+        for listener, policy in timed_deliveries:
+            if listener not in immediate_listeners and self._debounce_engine.trigger((listener, policy)):
+                immediate_listeners.add(listener)
+
+        self._send_notifications_by_priority(immediate_listeners)
+
+    def get_lags(self) -> Dict[DispatcherListener, ListenerLag]:
+        """The backlog of all listeners which got notifications so far (if supported by the listener)."""
+        lags = {}
+        for listener in list(self._notifications.keys()):
+            get_lag = getattr(listener, "get_lag", None)  # duck typed listeners
+            lag = get_lag() if get_lag is not None else None
+            if isinstance(lag, ListenerLag):
+                lags[listener] = lag
+        return lags
+
+    def flush_notifications(self):
+        """Sends all pending notifications right now."""
+        self._debounce_engine.pop_all()
+        self._send_notifications_by_priority(list(self._notifications.keys()))
 
     def _store_notification(self, listener: DispatcherListener, notification: Notification):
         bucket: Optional[NotificationBucket] = self._notifications.get(listener)
@@ -278,11 +416,26 @@ class Dispatcher:
             self._notifications[listener] = bucket
         bucket.add(notification)
 
-    def _send_notifications_by_id(self, listener_id: int):
-        listener = self._observer_listener.get(listener_id)
-        self._send_notifications(listener)
+    def _get_priority(self, listener: DispatcherListener) -> int:
+        get_priority = getattr(listener, "get_priority", None)  # duck typed listeners
+        if get_priority is None:
+            return Priority.NORMAL
+        bucket: Optional[NotificationBucket] = self._notifications.get(listener)
+        return int(get_priority(bucket.get_list() if bucket else []))
+
+    def _send_notifications_by_priority(self, listeners: Iterable[DispatcherListener]):
+        """High priority listeners first, so their work gets queued (pool, event loop) first."""
+        listeners = list(listeners)
+        if len(listeners) > 1:
+            listeners.sort(key=self._get_priority)  # stable
+        for listener in listeners:
+            self._send_notifications(listener)
 
     def _send_notifications(self, listener: DispatcherListener):
+        """Sends all pending notifications of the listener (no matter which delivery policy is pending)."""
+        for policy in self._delivery_policies.get(listener, ()):
+            self._debounce_engine.cancel((listener, policy))
+
         bucket: Optional[NotificationBucket] = self._notifications.get(listener)
         if bucket:
             listener.add_notifications(bucket.get_set())
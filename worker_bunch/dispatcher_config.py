@@ -0,0 +1,69 @@
+from enum import Enum, IntEnum
+from typing import Optional
+
+import attr
+
+
+class CatchUpPolicy(Enum):
+    """How cron and astral ticks are handled, which were missed because the main loop stalled (GC, suspended VM...)"""
+
+    FIRE_ALL = "fire_all"  # every missed tick gets delivered separately
+    FIRE_ONCE = "fire_once"  # missed ticks are delivered once
+    SKIP = "skip"  # missed ticks are dropped, only timely ticks get delivered
+
+    @classmethod
+    def values(cls):
+        return [policy.value for policy in CatchUpPolicy]
+
+
+class Priority(IntEnum):
+    """Priority of listeners (workers) and their work; lower values get delivered and executed first."""
+
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+    @classmethod
+    def values(cls):
+        """as used in the config file"""
+        return [priority.name.lower() for priority in Priority]
+
+    @classmethod
+    def from_value(cls, value: str) -> "Priority":
+        return cls[value.upper()]
+
+
+class DeliveryMode(Enum):
+    """How MQTT notifications of a topic (filter) are delivered to a listener."""
+
+    IMMEDIATE = "immediate"  # sent right away
+    DEBOUNCE = "debounce"  # see `DebounceMode`
+    THROTTLE_LEADING = "throttle_leading"
+    THROTTLE_TRAILING = "throttle_trailing"
+    KEEP_LATEST = "keep_latest"  # only the latest value is kept and sent along with the next delivery to the listener
+
+    @classmethod
+    def values(cls):
+        return [mode.value for mode in DeliveryMode]
+
+
+@attr.frozen(cache_hash=True)  # hashed for each delivered MQTT message
+class DeliveryPolicy:
+    """
+    Delivery of MQTT notifications per topic filter.
+
+    Any delivery to a listener contains all its pending notifications, so the most urgent pending policy determines
+    the delivery time.
+    """
+
+    mode: DeliveryMode = DeliveryMode.DEBOUNCE
+    delay: float = 0.1  # debounce time or throttle period (seconds)
+    max_wait: Optional[float] = None  # DEBOUNCE and KEEP_LATEST: maximal latency (seconds)
+
+    @classmethod
+    def immediate(cls) -> "DeliveryPolicy":
+        return cls(mode=DeliveryMode.IMMEDIATE, delay=0)
+
+    @classmethod
+    def keep_latest(cls, max_wait: Optional[float] = None) -> "DeliveryPolicy":
+        return cls(mode=DeliveryMode.KEEP_LATEST, delay=0, max_wait=max_wait)
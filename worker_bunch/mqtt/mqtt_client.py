@@ -1,10 +1,14 @@
 import logging
 import threading
-from typing import List, Optional
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set
 
+import attr
 import paho.mqtt.client as mqtt
 
-from worker_bunch.mqtt.mqtt_config import MqttConfKey
+from worker_bunch.mqtt.mqtt_config import InboundOverflowPolicy, MqttConfKey, PublishMode
+from worker_bunch.mqtt.retained_cache import RetainedValueCache
 
 
 _logger = logging.getLogger(__name__)
@@ -14,6 +18,22 @@ class MqttException(Exception):
     pass
 
 
+@attr.frozen
+class InflightStats:
+    inflight: int  # sent, but not yet acknowledged QoS 1/2 messages
+    acknowledged: int  # total number of acknowledged messages (QoS 0: handed over to paho)
+
+
+@attr.frozen
+class InboundStats:
+    """Received messages (totals since start)."""
+
+    received: int
+    dropped: int  # inbound queue overflow
+    depth: int  # currently queued
+    max_depth: int
+
+
 class MqttClient:
 
     DEFAULT_KEEPALIVE = 60
@@ -22,8 +42,13 @@ class MqttClient:
     DEFAULT_PROTOCOL = 4  # 5==MQTTv5, default: 4==MQTTv311, 3==MQTTv31
     DEFAULT_QOS = 2
     DEFAULT_RETAIN = True
+    DEFAULT_MAX_INFLIGHT = 20  # as paho
+    DEFAULT_INBOUND_MAX_SIZE = 10000
+    DEFAULT_INBOUND_OVERFLOW = InboundOverflowPolicy.KEEP_LATEST_PER_TOPIC
+    INBOUND_HEADROOM = 0.1  # share of the inbound queue, which gets freed if compacting doesn't help (amortizes)
 
     TIME_WAIT_FOR_CONNECTION = 10  # seconds
+    TIME_LIMIT_INFLIGHT_WAIT = 10  # seconds; then messages are passed to paho anyway (it queues them)
 
     def __init__(self, config):
 
@@ -38,8 +63,24 @@ class MqttClient:
         self._shutdown = False
 
         self._lock = threading.Lock()
+        self._inflight_condition = threading.Condition(self._lock)  # signals acknowledged messages
 
-        self._messages = []  # type: List[mqtt.MQTTMessage]
+        self._wakeup_callback = None  # type: Optional[Callable[[], None]]
+
+        # inbound queue: received messages, until the main loop fetches them. Single producer (paho network thread),
+        # single consumer (main loop): `deque.append` and `popleft` are atomic, so the per-message path needs no lock.
+        # The inbound lock is taken only by the consumer (once per fetch) and on overflow (exclusive access).
+        self._messages: Deque[mqtt.MQTTMessage] = deque()
+        self._inbound_lock = threading.Lock()
+        self._received = 0
+        self._dropped = 0
+        self._max_depth = 0
+
+        # publish pipeline: message IDs of sent, not yet acknowledged QoS 1/2 messages
+        self._inflight: Set[int] = set()
+        self._acknowledged_early: Set[int] = set()  # `_on_publish` may be faster than `publish` returns
+        self._pending_qos0: Set[int] = set()  # QoS 0, counted as acknowledged, `_on_publish` still to come
+        self._acknowledged = 0
 
         self._host = config[MqttConfKey.HOST]
         self._port = config.get(MqttConfKey.PORT)
@@ -47,6 +88,11 @@ class MqttClient:
 
         self._default_qos = config.get(MqttConfKey.DEFAULT_QOS, self.DEFAULT_QOS)
         self._default_retain = config.get(MqttConfKey.DEFAULT_RETAIN, self.DEFAULT_RETAIN)
+        self._max_inflight = config.get(MqttConfKey.MAX_INFLIGHT, self.DEFAULT_MAX_INFLIGHT)
+        self._inbound_max_size = config.get(MqttConfKey.INBOUND_MAX_SIZE, self.DEFAULT_INBOUND_MAX_SIZE)
+        inbound_overflow = config.get(MqttConfKey.INBOUND_OVERFLOW)
+        self._inbound_overflow = InboundOverflowPolicy(inbound_overflow) if inbound_overflow \
+            else self.DEFAULT_INBOUND_OVERFLOW
 
         self._debug_simulate_sending = config.get(MqttConfKey.DEBUG_SIMULATE_SENDING, False)
         self._debug_topic_prefix = config.get(MqttConfKey.DEBUG_TOPIC_PREFIX)
@@ -81,10 +127,30 @@ class MqttClient:
         self._client.on_publish = self._on_publish
 
         self._client.reconnect_delay_set()
+        self._client.max_inflight_messages_set(self._max_inflight)
+
+    def set_wakeup_callback(self, callback: Optional[Callable[[], None]]):
+        """
+        The callback is triggered (within the MQTT network thread) when messages arrive in an empty queue or the connection
+        state changes. Kind of "go and fetch".
+        """
+        self._wakeup_callback = callback
+
+    def _wakeup(self):
+        callback = self._wakeup_callback
+        if callback is not None:
+            callback()
+
+    @property
+    def default_retain(self) -> bool:
+        return self._default_retain
+
+    @property
+    def default_qos(self) -> int:
+        return self._default_qos
 
     def is_connected(self):
-        with self._lock:
-            return self._is_connected
+        return self._is_connected  # plain reads and writes of an attribute are atomic, no lock (polled by main loop)
 
     def connect(self):
         self._client.connect_async(self._host, port=self._port, keepalive=self._keepalive)
@@ -93,6 +159,8 @@ class MqttClient:
 
     def close(self):
         self._shutdown = True
+        with self._inflight_condition:
+            self._inflight_condition.notify_all()  # releases a waiting publisher
         if self._client is not None:
             self._client.loop_stop()
             self._client.disconnect()
@@ -105,9 +173,8 @@ class MqttClient:
         Check for rarely unexpected disconnects, but when happens, it's not clear how to heal. At least the loop has to be restarted.
         Best to restart the whole app. Recognise a stopped service in system log.
         """
-        with self._lock:
-            is_connected = self._is_connected
-            connection_error_info = self._connection_error_info
+        is_connected = self._is_connected
+        connection_error_info = self._connection_error_info
 
         if connection_error_info:
             raise MqttException(connection_error_info)  # leads to exit => restarted by systemd
@@ -131,10 +198,21 @@ class MqttClient:
         _logger.debug("set last will: topic='%s'; retain=%s; qos=%d; last_will='%s'", topic, retain, qos, last_will)
 
     def get_messages(self) -> List[mqtt.MQTTMessage]:
-        with self._lock:
-            messages = self._messages
-            self._messages = []
-            return messages
+        """Consumer side of the inbound queue, called by the main loop only."""
+        messages = []
+        popleft = self._messages.popleft
+        with self._inbound_lock:
+            try:
+                while True:  # until empty, messages appended meanwhile are fetched too (see `_on_message` wake up)
+                    messages.append(popleft())
+            except IndexError:
+                pass
+        return messages
+
+    def get_inbound_stats(self) -> InboundStats:
+        """Approximate (no lock)."""
+        return InboundStats(received=self._received, dropped=self._dropped, depth=len(self._messages),
+                            max_depth=self._max_depth)
 
     def publish(self, topic: str, payload: str, retain: Optional[bool] = None, qos: Optional[int] = None):
         if self._shutdown:
@@ -150,6 +228,9 @@ class MqttClient:
             _logger.info("simulated sent: topic='%s'; retain=%s; qos=%d; payload='%s'", topic, retain, qos, payload)
             return mqtt.MQTTMessageInfo(0)
 
+        if qos > 0:
+            self._wait_for_inflight_window()  # QoS 0 is fire-and-forget, there is nothing to wait for
+
         result = self._client.publish(
             topic=topic,
             payload=payload,
@@ -157,10 +238,42 @@ class MqttClient:
             retain=retain
         )
 
+        with self._lock:
+            if qos == 0:
+                if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                    self._acknowledged += 1
+                    if result.mid in self._acknowledged_early:
+                        self._acknowledged_early.remove(result.mid)
+                    else:
+                        self._pending_qos0.add(result.mid)
+            elif result.mid in self._acknowledged_early:
+                self._acknowledged_early.remove(result.mid)
+                self._acknowledged += 1
+            elif result.rc in (mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_NO_CONN):
+                self._inflight.add(result.mid)  # QoS 1/2 messages get queued by paho while disconnected
+
         _logger.debug("sent: topic='%s'; retain=%s; qos=%d; payload='%s'", topic, retain, qos, payload)
 
         return result
 
+    def _wait_for_inflight_window(self):
+        """Blocks the publisher while `max_inflight` messages are not acknowledged yet (backpressure)."""
+        with self._inflight_condition:
+            if len(self._inflight) < self._max_inflight:
+                return
+            time_limit = time.monotonic() + self.TIME_LIMIT_INFLIGHT_WAIT
+            while len(self._inflight) >= self._max_inflight and not self._shutdown:
+                timeout = time_limit - time.monotonic()
+                if timeout <= 0:
+                    _logger.warning("%d MQTT messages are not acknowledged (within %ds)!",
+                                    len(self._inflight), self.TIME_LIMIT_INFLIGHT_WAIT)
+                    return
+                self._inflight_condition.wait(timeout)
+
+    def get_inflight_stats(self) -> InflightStats:
+        with self._lock:
+            return InflightStats(inflight=len(self._inflight), acknowledged=self._acknowledged)
+
     def subscribe(self, topics: List[str]):
         subs_qos = 1  # qos for subscriptions, not used, but necessary
         subscriptions = [(t, subs_qos) for t in topics]
@@ -183,6 +296,8 @@ class MqttClient:
                 self._is_connected = False
                 self._connection_error_info = connection_error_info
 
+        self._wakeup()
+
     def _on_disconnect(self, _mqtt_client, _userdata, rc):
         """MQTT callback for when the client disconnects from the MQTT server."""
         class_name = self.__class__.__name__
@@ -194,20 +309,78 @@ class MqttClient:
             self._is_connected = False
             if connection_error_info and not self._connection_error_info:
                 self._connection_error_info = connection_error_info
+            self._pending_qos0.clear()  # unwritten QoS 0 messages get dropped by paho, no `_on_publish`
 
         if rc == 0:
             _logger.debug("%s was disconnected.", class_name)
         else:
             _logger.error("%s was unexpectedly disconnected: %s", class_name, connection_error_info or "???")
 
+        self._wakeup()
+
     def _on_message(self, _mqtt_client, _userdata, mqtt_message: mqtt.MQTTMessage):
         """MQTT callback when a message is received from MQTT server"""
-        with self._lock:
+        if _logger.isEnabledFor(logging.DEBUG):  # `topic` gets decoded on each access
             _logger.debug("on_message(%s): %s", mqtt_message.topic, mqtt_message.payload)
-            self._messages.append(mqtt_message)
 
-    def _on_publish(self, mqtt_client, userdata, mid):
-        """MQTT callback is invoked when message was successfully sent to the MQTT server."""
+        # producer side of the inbound queue (paho network thread); counters are written by this thread only
+        messages = self._messages
+        self._received += 1
+        if len(messages) >= self._inbound_max_size:
+            if self._inbound_overflow == InboundOverflowPolicy.DROP_NEWEST:
+                self._dropped += 1
+                return
+            with self._inbound_lock:
+                self._make_inbound_space()
+
+        messages.append(mqtt_message)
+        depth = len(messages)
+        if depth > self._max_depth:
+            self._max_depth = depth
+
+        # checked after appending: the consumer drains until empty, so either it gets this message or it's woken up
+        if depth == 1:
+            self._wakeup()
+
+    def _make_inbound_space(self):
+        """Drops at least one message (inbound lock is held, so the consumer doesn't interfere)."""
+        messages = self._messages
+        if self._inbound_overflow == InboundOverflowPolicy.KEEP_LATEST_PER_TOPIC:
+            latest = {}
+            for message in messages:  # insertion order is kept, `_topic` are the raw bytes (`topic` decodes)
+                topic = message._topic
+                latest.pop(topic, None)
+                latest[topic] = message  # moved to the end
+            self._dropped += len(messages) - len(latest)
+            messages.clear()  # the same deque instance, the producer is the caller
+            messages.extend(latest.values())
+
+            # compacting must free some headroom, otherwise each further message would lead to another compacting
+            target_size = self._inbound_max_size - max(1, int(self._inbound_max_size * self.INBOUND_HEADROOM))
+            if len(messages) <= target_size:
+                return
+        else:
+            target_size = self._inbound_max_size - 1
+
+        drop_count = len(messages) - target_size
+        for _ in range(drop_count):
+            messages.popleft()
+        self._dropped += drop_count
+
+    def _on_publish(self, _mqtt_client, _userdata, mid):
+        """
+        MQTT callback is invoked when message was successfully sent to the MQTT server: QoS 0 when written to the
+        socket, QoS 1 on PUBACK, QoS 2 on PUBCOMP.
+        """
+        with self._inflight_condition:
+            if mid in self._inflight:
+                self._inflight.remove(mid)
+                self._acknowledged += 1
+                self._inflight_condition.notify()
+            elif mid in self._pending_qos0:
+                self._pending_qos0.remove(mid)
+            else:
+                self._acknowledged_early.add(mid)  # `publish` has not returned yet
 
 
 class MqttClientFactory:
@@ -216,3 +389,13 @@ class MqttClientFactory:
     @classmethod
     def create(cls, config):
         return MqttClient(config)
+
+    @classmethod
+    def create_retained_cache(cls, config) -> Optional[RetainedValueCache]:
+        if not config.get(MqttConfKey.RETAINED_DEDUPE, False):
+            return None
+        return RetainedValueCache(config.get(MqttConfKey.RETAINED_REFRESH, RetainedValueCache.DEFAULT_REFRESH_INTERVAL))
+
+    @classmethod
+    def get_publish_modes(cls, config) -> Dict[str, PublishMode]:
+        return {prefix: PublishMode(mode) for prefix, mode in config.get(MqttConfKey.PUBLISH_MODES, {}).items()}
@@ -1,4 +1,32 @@
 
+from enum import Enum
+
+
+class PublishMode(Enum):
+    """How outgoing messages of a topic are queued (until the publisher sends them)."""
+
+    QUEUE = "queue"  # every message gets sent
+    COALESCE = "coalesce"  # only the latest payload per topic, sent at the position of the first queued message
+    COALESCE_ORDERED = "coalesce_ordered"  # only the latest payload per topic, the order of the latest updates is kept
+
+    @classmethod
+    def values(cls):
+        return [mode.value for mode in PublishMode]
+
+
+class InboundOverflowPolicy(Enum):
+    """What happens to received messages, which don't fit into the inbound queue anymore (main loop stalled)."""
+
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+    # the queue gets compacted to the latest message per topic (retained state), then the oldest messages get dropped
+    KEEP_LATEST_PER_TOPIC = "keep_latest_per_topic"
+
+    @classmethod
+    def values(cls):
+        return [policy.value for policy in InboundOverflowPolicy]
+
+
 class MqttConfKey:
     CLIENT_ID = "client_id"
     HOST = "host"
@@ -9,6 +37,12 @@ class MqttConfKey:
     PROTOCOL = "protocol"
     DEFAULT_QOS = "default_qos"
     DEFAULT_RETAIN = "default_retain"
+    INBOUND_MAX_SIZE = "inbound_max_size"
+    INBOUND_OVERFLOW = "inbound_overflow"
+    MAX_INFLIGHT = "max_inflight"
+    PUBLISH_MODES = "publish_modes"
+    RETAINED_DEDUPE = "retained_dedupe"
+    RETAINED_REFRESH = "retained_refresh"
 
     DEBUG_SIMULATE_SENDING = "debug_simulate_sending"
     DEBUG_TOPIC_PREFIX = "debug_topic_prefix"
@@ -27,6 +61,35 @@ MQTT_JSONSCHEMA = {
         MqttConfKey.DEFAULT_RETAIN: {
             "type": "boolean",
             "description": "Default: True. May be overwritten in your worker."},
+        MqttConfKey.PUBLISH_MODES: {
+            "type": "object",
+            "additionalProperties": {"type": "string", "enum": PublishMode.values()},
+            "description": "Publish mode per topic prefix (longest prefix wins). Default: queue"
+        },
+        MqttConfKey.RETAINED_DEDUPE: {
+            "type": "boolean",
+            "description": "Default: False. Skip retained messages with an unchanged payload (per topic)."
+        },
+        MqttConfKey.RETAINED_REFRESH: {
+            "type": "integer",
+            "minimum": 1,
+            "description": "Seconds after which unchanged retained messages are sent anyway. Default: 3600"
+        },
+        MqttConfKey.INBOUND_MAX_SIZE: {
+            "type": "integer",
+            "minimum": 1,
+            "description": "Max. number of received messages, which are not yet fetched by the main loop. Default: 10000"
+        },
+        MqttConfKey.INBOUND_OVERFLOW: {
+            "type": "string",
+            "enum": InboundOverflowPolicy.values(),
+            "description": "Default: keep_latest_per_topic"
+        },
+        MqttConfKey.MAX_INFLIGHT: {
+            "type": "integer",
+            "minimum": 1,
+            "description": "Max. number of sent, but not yet acknowledged QoS 1/2 messages (publish window). Default: 20"
+        },
         MqttConfKey.HOST: {"type": "string", "minLength": 1},
         MqttConfKey.KEEPALIVE: {
             "type": "integer",
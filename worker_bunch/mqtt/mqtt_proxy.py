@@ -1,29 +1,141 @@
+import logging
 import threading
+import time
 from collections import namedtuple
-from typing import Dict, List, Optional, Union
+from typing import Callable, Dict, List, Optional, Union
 
-from paho.mqtt.client import MQTTMessage
+import attr
+from paho.mqtt.client import MQTT_ERR_NO_CONN, MQTT_ERR_SUCCESS, MQTTMessage, MQTTMessageInfo
 
-from worker_bunch.mqtt.mqtt_client import MqttClient
+from worker_bunch.mqtt.mqtt_client import InboundStats, MqttClient
+from worker_bunch.mqtt.mqtt_config import PublishMode
+from worker_bunch.mqtt.retained_cache import RetainedValueCache
 from worker_bunch.service_config import ConfigException
 from worker_bunch.utils.json_utils import JsonUtils
 
-ProxyMessage = namedtuple("ProxyMessage", ["topic", "payload", "retain"])
+_logger = logging.getLogger(__name__)
+
+ProxyMessage = namedtuple("ProxyMessage", ["topic", "payload", "retain", "qos"])
+
+
+@attr.frozen
+class PublishStats:
+    """Outgoing messages since the previous `MqttProxy.get_publish_stats` call."""
+
+    published: int  # sent messages
+    publish_rate: float  # sent messages per second
+    queue_depth: int  # currently queued messages
+    max_queue_depth: int
+    coalesced: int = 0  # replaced by a newer payload of the same topic (`PublishMode.COALESCE*`)
+    acknowledged: int = 0  # acknowledged by the broker (QoS 1/2; QoS 0: handed over to paho)
+    acknowledge_rate: float = 0.0  # acknowledged messages per second
+    inflight: int = 0  # sent, but not yet acknowledged QoS 1/2 messages
 
 
 class MqttProxy:
 
-    def __init__(self, mqtt_client: Optional[MqttClient]):
+    PUBLISHER_THREAD_NAME = "mqtt-publisher"
+    TIME_LIMIT_PUBLISHER_STOP = 5  # seconds
+    PUBLISH_MODE_CACHE_SIZE = 10000  # topics
+
+    def __init__(self, mqtt_client: Optional[MqttClient], retained_cache: Optional[RetainedValueCache] = None,
+                 publish_modes: Optional[Dict[str, PublishMode]] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        :param retained_cache: skips retained messages with unchanged payloads (opt-in)
+        :param publish_modes: per topic prefix (longest prefix wins); default: `PublishMode.QUEUE`
+        """
 
         self._mqtt_client = mqtt_client
+        self._retained_cache = retained_cache
         self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)  # wakes up the publisher thread
+        self._publish_lock = threading.Lock()  # serializes sending, keeps the order of swapped out batches
 
-        self._messages: List[ProxyMessage] = []
+        # coalesced messages get replaced by None (O(1)), so the list may contain gaps
+        self._messages: List[Optional[ProxyMessage]] = []
+        self._queued = 0  # messages in `_messages` (without gaps)
+        self._coalesce_index: Dict[str, int] = {}  # topic => position of a coalescable message in `_messages`
+        self._wakeup_callback: Optional[Callable[[], None]] = None
+
+        self._publish_modes = sorted((publish_modes or {}).items(), key=lambda i: len(i[0]), reverse=True)
+        self._publish_mode_cache: Dict[str, PublishMode] = {}
+
+        self._publisher_thread: Optional[threading.Thread] = None
+        self._publisher_stopping = False
+        self._publisher_error: Optional[Exception] = None  # ends the service, see `ensure_connection`
+
+        self._clock = clock
+        self._published = 0
+        self._max_queue_depth = 0
+        self._coalesced = 0
+        self._acknowledged = 0  # total of the MQTT client at the last stats call
+        self._stats_time = clock()
 
     def close(self):
+        self.stop_publisher()
         self.publish()
         self._mqtt_client = None
 
+    @property
+    def retained_cache(self) -> Optional[RetainedValueCache]:
+        return self._retained_cache
+
+    def start_publisher(self):
+        """
+        Messages get sent by a dedicated thread as soon as they are queued (otherwise by calling `publish`), so the
+        caller (the `Runner` loop) is not blocked by network I/O.
+        """
+        with self._lock:
+            if self._publisher_thread is not None or not self._mqtt_client:
+                return
+            self._publisher_stopping = False
+            self._publisher_thread = threading.Thread(target=self._run_publisher, name=self.PUBLISHER_THREAD_NAME,
+                                                      daemon=True)
+            self._publisher_thread.start()
+
+    def stop_publisher(self):
+        """Already queued messages are still sent."""
+        with self._lock:
+            thread = self._publisher_thread
+            if thread is None:
+                return
+            self._publisher_stopping = True
+            self._condition.notify()
+
+        thread.join(self.TIME_LIMIT_PUBLISHER_STOP)
+        if thread.is_alive():
+            _logger.warning("MQTT publisher thread doesn't stop (hangs in sending)!")
+        with self._lock:
+            self._publisher_thread = None
+
+    def _run_publisher(self):
+        while True:
+            with self._condition:
+                while not self._queued and not self._publisher_stopping:
+                    self._condition.wait()
+                if not self._queued:
+                    return  # stopped
+
+            try:
+                self.publish()
+            except Exception as ex:
+                # unsent messages are queued again; the runner fails loudly (`ensure_connection`), `close` retries
+                _logger.exception(ex)
+                self._publisher_error = ex
+                callback = self._wakeup_callback
+                if callback is not None:
+                    callback()
+                return
+
+    def set_wakeup_callback(self, callback: Optional[Callable[[], None]]):
+        """
+        The callback is triggered when the publisher thread fails, incoming messages arrive or the MQTT connection state
+        changes. It's called from foreign threads (workers, MQTT network thread), so it must be thread-safe.
+        """
+        self._wakeup_callback = callback
+        if self._mqtt_client:
+            self._mqtt_client.set_wakeup_callback(callback)
+
     def connect(self):
         with self._lock:
             if self._mqtt_client:
@@ -37,10 +149,14 @@ class MqttProxy:
                 return True  # hide missing mqtt client
 
     def ensure_connection(self):
+        publisher_error = self._publisher_error
+        if publisher_error is not None:
+            raise publisher_error
         if self._mqtt_client:
             self._mqtt_client.ensure_connection()
 
-    def set_last_will(self, topic: str, last_will: Union[str, Dict], retain: Optional[bool] = None):
+    def set_last_will(self, topic: str, last_will: Union[str, Dict], retain: Optional[bool] = None,
+                      qos: Optional[int] = None):
         if not self._mqtt_client:
             raise ConfigException("no mqtt client configured!")
 
@@ -49,7 +165,7 @@ class MqttProxy:
 
         with self._lock:
             if self._mqtt_client and topic and last_will:
-                self._mqtt_client.set_last_will(topic=topic, last_will=last_will, retain=retain)
+                self._mqtt_client.set_last_will(topic=topic, last_will=last_will, retain=retain, qos=qos)
 
     def subscribe(self, topics: List[str]):
         if topics:
@@ -59,28 +175,149 @@ class MqttProxy:
             with self._lock:
                 self._mqtt_client.subscribe(topics)
 
+    def get_inbound_stats(self) -> Optional[InboundStats]:
+        mqtt_client = self._mqtt_client
+        return mqtt_client.get_inbound_stats() if mqtt_client else None
+
     def get_messages(self) -> List[MQTTMessage]:
-        with self._lock:
-            if self._mqtt_client:
-                return self._mqtt_client.get_messages()
-            else:
-                return []
+        mqtt_client = self._mqtt_client  # no lock, `MqttClient.get_messages` is the consumer side of its inbound queue
+        return mqtt_client.get_messages() if mqtt_client else []
+
+    def queue(self, topic: str, payload: Union[str, Dict], retain: Optional[bool] = None,
+              mode: Optional[PublishMode] = None, qos: Optional[int] = None):
+        """
+        Queues a message, which is sent by the publisher thread (without publisher thread by the next `publish` call,
+        e.g. `close`). Never waits for network I/O, so it may be called from async workers (on the event loop) as well as
+        from worker threads.
 
-    def queue(self, topic: str, payload: Union[str, Dict], retain: Optional[bool] = None):
+        :param mode: overrides the configured publish mode of the topic
+        :param qos: None: default QoS of the MQTT client (config `default_qos`); QoS 0 suits high-rate telemetry
+        """
         if not self._mqtt_client:
             raise ConfigException("no mqtt client configured!")
 
         if isinstance(payload, dict):
             payload = JsonUtils.dumps(payload)
 
+        if mode is None:
+            mode = self._get_publish_mode(topic)
+        message = ProxyMessage(topic=topic, payload=payload, retain=retain, qos=qos)
+
         with self._lock:
-            self._messages.append(ProxyMessage(topic=topic, payload=payload, retain=retain))
+            was_empty = not self._queued
+            messages = self._messages
+
+            if mode == PublishMode.QUEUE:
+                self._coalesce_index.pop(topic, None)  # later messages must not overtake this one
+            else:
+                index = self._coalesce_index.get(topic)
+                if index is not None:
+                    self._coalesced += 1
+                    if mode == PublishMode.COALESCE:
+                        messages[index] = message
+                        return
+                    messages[index] = None
+                    self._queued -= 1
+                self._coalesce_index[topic] = len(messages)
+
+            messages.append(message)
+            self._queued += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queued)
+            if was_empty and self._publisher_thread is not None:
+                self._condition.notify()
+
+    def _get_publish_mode(self, topic: str) -> PublishMode:
+        if not self._publish_modes:
+            return PublishMode.QUEUE
+
+        mode = self._publish_mode_cache.get(topic)
+        if mode is None:
+            mode = next((m for prefix, m in self._publish_modes if topic.startswith(prefix)), PublishMode.QUEUE)
+            if len(self._publish_mode_cache) >= self.PUBLISH_MODE_CACHE_SIZE:
+                self._publish_mode_cache = {}
+            self._publish_mode_cache[topic] = mode
+        return mode
 
     def publish(self):
-        if self._mqtt_client:
+        """Sends the queued messages (synchronously)."""
+        with self._publish_lock:
             with self._lock:
-                if self._mqtt_client:
-                    messages = self._messages
-                    self._messages = []
-                    for m in messages:
-                        self._mqtt_client.publish(topic=m.topic, payload=m.payload, retain=m.retain)
+                mqtt_client = self._mqtt_client
+                if not mqtt_client or not self._queued:
+                    return
+                messages = self._messages  # swapped out, `queue` continues with a new list
+                self._messages = []
+                self._queued = 0
+                self._coalesce_index = {}
+
+            # outside the lock, `queue` must not be blocked by network I/O
+            published = 0
+            retained_cache = self._retained_cache
+            default_retain = mqtt_client.default_retain if retained_cache is not None else None
+            try:
+                for index, m in enumerate(messages):
+                    if m is None:
+                        continue  # coalesced
+                    retain = default_retain if m.retain is None else m.retain
+                    if retained_cache is not None and retain and not retained_cache.check(m.topic, m.payload):
+                        continue  # unchanged
+                    try:
+                        result = mqtt_client.publish(topic=m.topic, payload=m.payload, retain=m.retain, qos=m.qos)
+                        if retained_cache is not None and not self._is_accepted(result, m.qos, mqtt_client):
+                            retained_cache.discard(m.topic)  # dropped by paho, has to be sent again
+                    except Exception:
+                        if retained_cache is not None:
+                            retained_cache.discard(m.topic)
+                        self._requeue([u for u in messages[index:] if u is not None])
+                        raise
+                    published += 1
+            finally:
+                with self._lock:
+                    self._published += published
+
+    @staticmethod
+    def _is_accepted(result: Optional[MQTTMessageInfo], qos: Optional[int], mqtt_client: MqttClient) -> bool:
+        """paho drops QoS 0 messages while disconnected, QoS 1/2 messages get queued (and sent after reconnecting)."""
+        if result is None:
+            return False  # shut down
+        if result.rc == MQTT_ERR_SUCCESS:
+            return True
+        if result.rc == MQTT_ERR_NO_CONN:
+            return (mqtt_client.default_qos if qos is None else qos) > 0
+        return False
+
+    def _requeue(self, messages: List[ProxyMessage]):
+        """Puts unsent messages back in front of the queue (in front of the messages queued meanwhile)."""
+        with self._lock:
+            self._messages = messages + self._messages
+            self._queued += len(messages)
+            self._coalesce_index = {topic: index + len(messages) for topic, index in self._coalesce_index.items()}
+
+    def get_publish_stats(self) -> PublishStats:
+        """Resets the counters."""
+        mqtt_client = self._mqtt_client
+        inflight_stats = mqtt_client.get_inflight_stats() if mqtt_client else None
+
+        with self._lock:
+            now = self._clock()
+            seconds = now - self._stats_time
+            acknowledged, inflight = 0, 0
+            if inflight_stats is not None:
+                acknowledged = inflight_stats.acknowledged - self._acknowledged
+                inflight = inflight_stats.inflight
+                self._acknowledged = inflight_stats.acknowledged
+            stats = PublishStats(
+                published=self._published,
+                publish_rate=self._published / seconds if seconds > 0 else 0.0,
+                queue_depth=self._queued,
+                max_queue_depth=self._max_queue_depth,
+                coalesced=self._coalesced,
+                acknowledged=acknowledged,
+                acknowledge_rate=acknowledged / seconds if seconds > 0 else 0.0,
+                inflight=inflight,
+            )
+            self._stats_time = now
+            self._published = 0
+            self._max_queue_depth = self._queued
+            self._coalesced = 0
+        return stats
@@ -0,0 +1,60 @@
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, Union
+
+
+class RetainedValueCache:
+    """
+    Last sent payload per topic of retained messages. An unchanged payload doesn't need to be sent again, the broker
+    still holds it (saves traffic and writes of the broker persistence).
+
+    Unchanged payloads are sent anyway after `refresh_interval` (e.g. after a broker restart without persistence). The
+    service restarts when the MQTT connection gets lost (see `MqttClient.ensure_connection`), so last wills, which
+    replace a retained value on the broker, are not an issue.
+    """
+
+    DEFAULT_REFRESH_INTERVAL = 3600  # seconds
+
+    def __init__(self, refresh_interval: Optional[float] = DEFAULT_REFRESH_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        """:param refresh_interval: seconds; None: never send unchanged payloads again"""
+        self._refresh_interval = refresh_interval
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._sent: Dict[str, Tuple[Union[str, bytes], float]] = {}  # topic => (payload, send time)
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self) -> int:
+        """Number of skipped (unchanged) messages."""
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """Number of sent messages."""
+        return self._misses
+
+    def check(self, topic: str, payload: Union[str, bytes]) -> bool:
+        """Returns True if the retained message has to be sent (and takes it as sent)."""
+        now = self._clock()
+        with self._lock:
+            entry = self._sent.get(topic)
+            if entry is not None and entry[0] == payload and \
+                    (self._refresh_interval is None or now - entry[1] < self._refresh_interval):
+                self._hits += 1
+                return False
+
+            self._sent[topic] = (payload, now)
+            self._misses += 1
+            return True
+
+    def discard(self, topic: str):
+        """Forgets the last payload (e.g. sending failed)."""
+        with self._lock:
+            self._sent.pop(topic, None)
+
+    def clear(self):
+        with self._lock:
+            self._sent = {}
@@ -0,0 +1,120 @@
+from typing import Dict, Generic, List, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+
+class _TopicNode(Generic[T]):
+
+    __slots__ = ("children", "multi_level", "value")
+
+    def __init__(self):
+        self.children: Dict[str, _TopicNode[T]] = {}  # "+" is stored as a regular child
+        self.multi_level: Optional[T] = None  # value of the filter ending with "#" below this node
+        self.value: Optional[T] = None  # value of the filter ending exactly at this node
+
+
+class TopicTrie(Generic[T]):
+    """
+    Maps MQTT topic filters to values (one value per filter) and resolves all values matching a concrete topic.
+
+    The topic levels are stored as a tree, so matching costs are proportional to the topic depth and not to the number of
+    subscribed filters. Wildcards follow the MQTT spec: "+" matches exactly one level, "#" (only allowed as last level)
+    matches the parent level and any number of sub levels. Topics starting with "$" are not matched by wildcards on the
+    first level.
+    """
+
+    SEPARATOR = "/"
+    MULTI_LEVEL_WILDCARD = "#"
+    SINGLE_LEVEL_WILDCARD = "+"
+    SYSTEM_TOPIC_PREFIX = "$"
+
+    def __init__(self):
+        self._root: _TopicNode[T] = _TopicNode()
+        self._values: Dict[str, T] = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, topic_filter: str):
+        return topic_filter in self._values
+
+    def get(self, topic_filter: str) -> Optional[T]:
+        return self._values.get(topic_filter)
+
+    def values(self) -> List[T]:
+        return list(self._values.values())
+
+    @classmethod
+    def validate_filter(cls, topic_filter: str):
+        """Raises a `ValueError` if the topic filter violates the MQTT spec."""
+        if not topic_filter:
+            raise ValueError("Empty topic filter!")
+
+        segments = topic_filter.split(cls.SEPARATOR)
+        for index, segment in enumerate(segments):
+            if segment == cls.MULTI_LEVEL_WILDCARD:
+                if index != len(segments) - 1:
+                    raise ValueError(f"'#' is only allowed as last level ('{topic_filter}')!")
+            elif segment != cls.SINGLE_LEVEL_WILDCARD:
+                if cls.MULTI_LEVEL_WILDCARD in segment or cls.SINGLE_LEVEL_WILDCARD in segment:
+                    raise ValueError(f"Wildcards must occupy an entire topic level ('{topic_filter}')!")
+
+    def insert(self, topic_filter: str, value: T):
+        if value is None:
+            raise ValueError("None values cannot be stored!")
+        self.validate_filter(topic_filter)
+
+        segments = topic_filter.split(self.SEPARATOR)
+        is_multi_level = segments[-1] == self.MULTI_LEVEL_WILDCARD
+        if is_multi_level:
+            segments = segments[:-1]
+
+        node = self._root
+        for segment in segments:
+            child = node.children.get(segment)
+            if child is None:
+                child = _TopicNode()
+                node.children[segment] = child
+            node = child
+
+        if is_multi_level:
+            node.multi_level = value
+        else:
+            node.value = value
+
+        self._values[topic_filter] = value
+
+    def match(self, topic: str) -> List[T]:
+        """Returns the values of all filters matching the (concrete) topic."""
+        found = []
+
+        # wildcards on the first level must not match "$SYS/..." topics
+        wildcards_allowed = not topic.startswith(self.SYSTEM_TOPIC_PREFIX)
+
+        nodes = [self._root]
+        for segment in topic.split(self.SEPARATOR):
+            next_nodes = []
+            for node in nodes:
+                if wildcards_allowed:
+                    if node.multi_level is not None:
+                        found.append(node.multi_level)
+                    child = node.children.get(self.SINGLE_LEVEL_WILDCARD)
+                    if child is not None:
+                        next_nodes.append(child)
+                child = node.children.get(segment)
+                if child is not None:
+                    next_nodes.append(child)
+
+            if not next_nodes:
+                return found
+            nodes = next_nodes
+            wildcards_allowed = True
+
+        for node in nodes:
+            if node.value is not None:
+                found.append(node.value)
+            if node.multi_level is not None:  # "a/#" matches "a" too
+                found.append(node.multi_level)
+
+        return found
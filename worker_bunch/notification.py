@@ -1,7 +1,10 @@
+import datetime
+import json
+import sys
+import threading
 from enum import Enum
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, Optional, Union
 
-from attr import frozen
 from paho.mqtt.client import MQTTMessage
 
 
@@ -19,26 +22,109 @@ class NotificationType(Enum):
 NT = NotificationType
 
 
-@frozen
+_UNPARSED = object()
+
+
+class _ParseError:
+    """Cached parse failure."""
+
+    __slots__ = ("exception",)
+
+    def __init__(self, exception: Exception):
+        self.exception = exception
+
+
 class Notification:
+    """
+    Immutable notification; equality and hash depend only on type, topic and tick (payloads of the same topic replace
+    each other, but cron and astral notifications of different ticks don't, e.g. ticks caught up by `FIRE_ALL`).
+
+    It's created for each incoming MQTT message, so it's kept compact: `__slots__`, the hash is calculated once, topics
+    are interned (equal topics share one string, comparisons are mostly identity checks) and a `bytes` payload is kept
+    (without copy) until the text is requested.
+
+    An MQTT notification is delivered as the same instance to all matching listeners, so the decoded text and the
+    parsed values (`payload_json`, `payload_float`) are calculated once and shared. Don't modify parsed JSON data!
+    """
 
-    type: NotificationType
+    __slots__ = ("type", "topic", "tick", "_payload", "_hash", "_json", "_float")
 
-    # contains the MQTT topic or timer key
-    topic: str
+    _parse_lock = threading.Lock()  # parses only once; json/float parsing holds the GIL anyway
 
-    # payload is not part of key. it will be skipped if new notification for the same type a topic arrive.
-    payload: str = None
+    # decoded and interned MQTT topics; cleared when full (guards against unbounded topic spaces)
+    _topic_cache: Dict[bytes, str] = {}
+    TOPIC_CACHE_SIZE = 10000
 
-    def __key(self):
-        return self.type, self.topic
+    def __init__(self, type: NotificationType, topic: str, payload: Union[str, bytes, None] = None,
+                 tick: Optional[datetime.datetime] = None):
+        # contains the MQTT topic or timer key
+        object.__setattr__(self, "type", type)
+        object.__setattr__(self, "topic", sys.intern(topic) if isinstance(topic, str) else topic)
+        # scheduled fire time of cron and astral notifications (may be in the past, if caught up)
+        object.__setattr__(self, "tick", tick)
+        # payload is not part of key. it will be skipped if new notification for the same type a topic arrive.
+        object.__setattr__(self, "_payload", bytes(payload) if isinstance(payload, bytearray) else payload)
+        object.__setattr__(self, "_hash", hash((type, topic, tick)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable!")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{self.__class__.__name__} is immutable!")
+
+    def __reduce__(self):
+        """pickle/copy; the hash gets recalculated (string hashes differ between processes)"""
+        return self.__class__, (self.type, self.topic, self._payload, self.tick)
+
+    def __repr__(self) -> str:
+        tick = f", tick={self.tick!r}" if self.tick is not None else ""
+        return f"{self.__class__.__name__}(type={self.type!r}, topic={self.topic!r}, payload={self.payload!r}{tick})"
+
+    @property
+    def payload(self) -> Optional[str]:
+        payload = self._payload
+        if isinstance(payload, bytes):
+            payload = payload.decode("utf-8")
+            object.__setattr__(self, "_payload", payload)  # decoded once
+        return payload
+
+    @property
+    def payload_json(self) -> Any:
+        """
+        Parsed JSON payload (once per notification, shared by all listeners; treat it as read-only).
+        Raises `ValueError` for invalid JSON (the failure is cached too).
+        """
+        return self._get_parsed("_json", json.loads)
+
+    @property
+    def payload_float(self) -> Optional[float]:
+        """Payload as float (parsed once). Raises `ValueError` for non-numeric payloads."""
+        return self._get_parsed("_float", float)
+
+    def _get_parsed(self, slot: str, parse: Callable[[str], Any]) -> Any:
+        parsed = getattr(self, slot, _UNPARSED)  # slot is unset until parsed
+        if parsed is _UNPARSED:
+            with self._parse_lock:
+                parsed = getattr(self, slot, _UNPARSED)
+                if parsed is _UNPARSED:
+                    payload = self._payload  # `json.loads` and `float` take bytes too, no need to keep the text
+                    try:
+                        parsed = parse(payload) if payload is not None else None
+                    except (TypeError, ValueError) as ex:
+                        parsed = _ParseError(ex)
+                    object.__setattr__(self, slot, parsed)
+
+        if isinstance(parsed, _ParseError):
+            raise ValueError(f"invalid payload ({self.topic}): {parsed.exception}") from parsed.exception
+        return parsed
 
     def __hash__(self):
-        return hash(self.__key())
+        return self._hash
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return self.__key() == other.__key()
+            return (self._hash == other._hash and self.type is other.type and self.topic == other.topic and
+                    self.tick == other.tick)
         return NotImplemented
 
     @classmethod
@@ -48,29 +134,41 @@ class Notification:
 
         return value_in
 
+    @classmethod
+    def decode_topic(cls, topic: Union[str, bytes]) -> str:
+        """Decoded and interned (cached)."""
+        if not isinstance(topic, bytes):
+            return topic
+        decoded = cls._topic_cache.get(topic)
+        if decoded is None:
+            if len(cls._topic_cache) >= cls.TOPIC_CACHE_SIZE:
+                cls._topic_cache.clear()
+            decoded = sys.intern(topic.decode("utf-8"))
+            cls._topic_cache[topic] = decoded
+        return decoded
+
     @classmethod
     def create_from_mqtt(cls, mqtt_message: MQTTMessage):
-        return Notification(
-            type=NotificationType.MQTT_MESSAGE,
-            topic=cls.ensure_string(mqtt_message.topic),
-            payload=cls.ensure_string(mqtt_message.payload),
-        )
+        # `MQTTMessage.topic` decodes on each access, `_topic` holds the raw bytes
+        raw_topic = getattr(mqtt_message, "_topic", None)
+        topic = cls.decode_topic(raw_topic if raw_topic is not None else mqtt_message.topic)
+        return Notification(NotificationType.MQTT_MESSAGE, topic, mqtt_message.payload)
 
     @classmethod
-    def create_mqtt(cls, topic: str, payload: str):
-        return Notification(type=NotificationType.MQTT_MESSAGE, topic=topic, payload=cls.ensure_string(payload))
+    def create_mqtt(cls, topic: str, payload: Union[str, bytes]):
+        return Notification(NotificationType.MQTT_MESSAGE, topic, payload)
 
     @classmethod
-    def create_astral(cls, topic: str):
-        return Notification(type=NotificationType.ASTRAL, topic=topic)
+    def create_astral(cls, topic: str, tick: Optional[datetime.datetime] = None):
+        return Notification(type=NotificationType.ASTRAL, topic=topic, tick=tick)
 
     @classmethod
     def create_timer(cls, topic: str):
         return Notification(type=NotificationType.TIMER, topic=topic)
 
     @classmethod
-    def create_cron(cls, topic: str):
-        return Notification(type=NotificationType.CRON, topic=topic)
+    def create_cron(cls, topic: str, tick: Optional[datetime.datetime] = None):
+        return Notification(type=NotificationType.CRON, topic=topic, tick=tick)
 
     @classmethod
     def find(cls, notifications: List[any], ntype: NotificationType, topic: str = None):
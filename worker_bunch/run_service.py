@@ -18,7 +18,9 @@ from worker_bunch.mqtt.mqtt_proxy import MqttProxy
 from worker_bunch.runner import Runner
 from worker_bunch.utils.time_utils import TimeUtils
 from worker_bunch.worker.worker import Worker, WorkerSetup
+from worker_bunch.worker.worker_config import WorkerExecution
 from worker_bunch.worker.worker_factory import WorkerFactory
+from worker_bunch.worker.worker_pool import WorkerPool
 
 _logger = logging.getLogger(__name__)
 
@@ -112,6 +114,7 @@ def run_service(config_file, log_file, log_level, print_log_console, skip_log_ti
     dispatcher: Optional[Dispatcher] = None
     mqtt_client: Optional[MqttClient] = None
     mqtt_proxy: Optional[MqttProxy] = None
+    worker_pool: Optional[WorkerPool] = None
     workers: List[Worker] = []
 
     try:
@@ -144,23 +147,39 @@ def run_service(config_file, log_file, log_level, print_log_console, skip_log_ti
 
         # bootstrapping
         astral_time_manager = AstralTimesManager(service_config.get_astral_config())
-        dispatcher = Dispatcher(astral_time_manager)
+        dispatcher = Dispatcher(astral_time_manager, service_config.get_timer_catch_up_policy())
         database_manager = DatabaseManager(service_config.get_database_config())
 
         mqtt_config = service_config.get_mqtt_config()
         mqtt_client = MqttClientFactory.create(mqtt_config) if mqtt_config else None
-        mqtt_proxy = MqttProxy(mqtt_client)
+        retained_cache = MqttClientFactory.create_retained_cache(mqtt_config) if mqtt_config else None
+        publish_modes = MqttClientFactory.get_publish_modes(mqtt_config) if mqtt_config else None
+        mqtt_proxy = MqttProxy(mqtt_client, retained_cache, publish_modes)
+
+        # single runs stay in the main thread
+        worker_executions = {
+            w.name: WorkerExecution.THREAD if test_single else service_config.get_worker_execution(w.name) for w in workers
+        }
+        if WorkerExecution.POOL in worker_executions.values():
+            worker_pool = WorkerPool(service_config.get_worker_pool_size())
 
         workers_settings = service_config.get_worker_settings()
 
         data_dir = service_config.get_data_dir()
         for worker in workers:
+            worker_execution = worker_executions[worker.name]
             worker.setup({
                 WorkerSetup.ASTRAL_TIME_MANAGER: astral_time_manager,
                 WorkerSetup.BASE_DATA_DIR: data_dir,
                 WorkerSetup.DATABASE_MANAGER: database_manager,
                 WorkerSetup.MQTT_PROXY: mqtt_proxy,
                 WorkerSetup.WORKER_SETTINGS: workers_settings.get(worker.name),
+                WorkerSetup.WORKER_EXECUTION: worker_execution,
+                WorkerSetup.WORKER_PRIORITY: service_config.get_worker_priority(worker.name),
+                WorkerSetup.MAX_PENDING: service_config.get_worker_max_pending(worker.name),
+                WorkerSetup.OVERFLOW_POLICY: service_config.get_worker_overflow_policy(worker.name),
+                WorkerSetup.MQTT_QOS: service_config.get_worker_mqtt_qos(worker.name),
+                WorkerSetup.WORKER_POOL: worker_pool if worker_execution == WorkerExecution.POOL else None,
             })
             worker.set_last_will()  # before set_mqtt_proxy ("last will" depends on config)!
 
@@ -184,6 +203,12 @@ def run_service(config_file, log_file, log_level, print_log_console, skip_log_ti
 
         _shutdown_workers(workers)
 
+        if worker_pool is not None:
+            try:
+                worker_pool.shutdown(wait=False)  # hanging workers were already reported
+            except Exception as ex:
+                _logger.exception(ex)
+
         if mqtt_proxy is not None:
             try:
                 mqtt_proxy.close()
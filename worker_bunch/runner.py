@@ -3,20 +3,29 @@ import logging
 import signal
 import threading
 from asyncio import Task
-from typing import List
+from typing import Dict, List
 
-from worker_bunch.dispatcher import Dispatcher
+from worker_bunch.dispatcher import Dispatcher, DispatcherListener
 from worker_bunch.mqtt.mqtt_proxy import MqttProxy
 from worker_bunch.notification import NotificationType
 from worker_bunch.utils.time_utils import TimeUtils
+from worker_bunch.worker.async_worker import AsyncWorker
 from worker_bunch.worker.worker import Worker
 
 _logger = logging.getLogger(__name__)
 
 
 class Runner:
+    """
+    Event-driven main loop: it sleeps until MQTT messages arrive, outgoing messages get queued, the MQTT connection state
+    changes or the next timer is due.
+    """
 
     TIME_LIMIT_MQTT_CONNECTION = 10  # seconds
+    TIME_WORKER_CHECK = 20  # seconds
+    MIN_LOOP_WAIT = 0.01  # seconds; prevents busy looping around timer deadlines
+    TIME_LIMIT_ASYNC_WORKER_STOP = 10  # seconds
+    TIME_LAG_WARNING = 60  # seconds; workers which are busy or have pending notifications for longer get reported
 
     def __init__(self, dispatcher: Dispatcher, mqtt_proxy: MqttProxy, workers: List[Worker]):
 
@@ -27,6 +36,9 @@ class Runner:
 
         self._loop = asyncio.get_event_loop()
         self._main_task: Task = None
+        self._wakeup_event = asyncio.Event()
+        self._dropped_notifications: Dict[DispatcherListener, int] = {}  # last reported
+        self._dropped_messages = 0  # last reported, MQTT inbound queue
 
         if threading.current_thread() is threading.main_thread():
             # integration tests may run the service in a thread...
@@ -36,13 +48,20 @@ class Runner:
     def _shutdown_signaled(self, sig, _frame):
         _logger.info("shutdown signaled (%s)", sig)
         if self._main_task:
-            self._main_task.cancel()
+            # the loop may sleep until the next timer, `call_soon_threadsafe` wakes it up
+            self._loop.call_soon_threadsafe(self._main_task.cancel)
+
+    def _wakeup_threadsafe(self):
+        """Called from foreign threads (MQTT network thread, workers)."""
+        self._loop.call_soon_threadsafe(self._wakeup_event.set)
 
     def run(self):
         """endless loop"""
 
         # connect mqtt - part 1 - trigger
+        self._mqtt_proxy.set_wakeup_callback(self._wakeup_threadsafe)
         self._mqtt_proxy.connect()
+        self._mqtt_proxy.start_publisher()  # runs until the proxy gets closed (final work of the workers)
 
         self._main_task = self._loop.create_task(self._main_loop())
 
@@ -50,14 +69,40 @@ class Runner:
             self._loop.run_until_complete(self._main_task)
         except asyncio.CancelledError:
             _logger.debug("canceling...")
+        finally:
+            self._loop.run_until_complete(self._stop_async_workers())  # they need the loop to finish
+            self._mqtt_proxy.set_wakeup_callback(None)
 
     def run_single(self):
         # connect mqtt - part 1 - trigger
+        self._mqtt_proxy.set_wakeup_callback(self._wakeup_threadsafe)
         self._mqtt_proxy.connect()
 
         self._main_task = self._loop.create_task(self._main_single())
 
-        self._loop.run_until_complete(self._main_task)
+        try:
+            self._loop.run_until_complete(self._main_task)
+        finally:
+            self._mqtt_proxy.set_wakeup_callback(None)
+
+    async def _stop_async_workers(self):
+        async_workers = [w for w in self._workers if isinstance(w, AsyncWorker) and w.is_alive()]
+        if not async_workers:
+            return
+
+        for worker in async_workers:
+            worker.stop()
+
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*[w.wait_stopped() for w in async_workers], return_exceptions=True),
+                self.TIME_LIMIT_ASYNC_WORKER_STOP
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    _logger.error("stopping async worker failed: %s", result)
+        except asyncio.exceptions.TimeoutError:
+            _logger.warning("async workers doesn't closing properly (cancelled)")
 
     async def _wait_for_mqtt_connection_timeout(self):
         timeout = self.TIME_LIMIT_MQTT_CONNECTION
@@ -69,6 +114,8 @@ class Runner:
     async def _wait_for_mqtt_connection(self):
         """connect mqtt - part 2 - wait for connection and subscribe for topics"""
         while True:
+            self._wakeup_event.clear()
+
             if self._mqtt_proxy.is_connected():
                 for worker in self._workers:
                     worker.subscribe_notifications(self._dispatcher)
@@ -77,7 +124,13 @@ class Runner:
                 self._mqtt_proxy.subscribe(topics)
                 break
 
-            await asyncio.sleep(0.05)
+            await self._wakeup_event.wait()
+
+    async def _wait_for_wakeup(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._wakeup_event.wait(), max(timeout, self.MIN_LOOP_WAIT))
+        except asyncio.exceptions.TimeoutError:
+            pass
 
     async def _main_loop(self):
         await self._wait_for_mqtt_connection_timeout()
@@ -90,7 +143,7 @@ class Runner:
         self._dispatcher.trigger_start_notification(self._workers)
 
         while True:
-            self._mqtt_proxy.publish()
+            self._wakeup_event.clear()  # events from now on lead to another loop
 
             self._mqtt_proxy.ensure_connection()
             messages = self._mqtt_proxy.get_messages()
@@ -98,13 +151,54 @@ class Runner:
 
             self._dispatcher.trigger_timers()
 
-            if (TimeUtils.now() - last_worker_check_time).total_seconds() > 20:
+            seconds_since_worker_check = (TimeUtils.now() - last_worker_check_time).total_seconds()
+            if seconds_since_worker_check > self.TIME_WORKER_CHECK:
                 last_worker_check_time = TimeUtils.now()
+                seconds_since_worker_check = 0
                 dead_workers = [w.name for w in self._workers if not w.is_alive()]
                 if dead_workers:
                     raise RuntimeError("Dead workers found: {}".format(", ".join(dead_workers)))
-
-            await asyncio.sleep(0.05)
+                self._check_worker_lags()
+                self._check_inbound_stats()
+                self._log_publish_stats()
+
+            timeout = min(self._dispatcher.get_seconds_to_next_timer(), self.TIME_WORKER_CHECK - seconds_since_worker_check)
+            await self._wait_for_wakeup(timeout)
+
+    def _check_worker_lags(self):
+        for listener, lag in self._dispatcher.get_lags().items():
+            dropped = lag.dropped - self._dropped_notifications.get(listener, 0)
+            self._dropped_notifications[listener] = lag.dropped
+            if dropped > 0:
+                _logger.warning("%s: %d notifications dropped (too many pending notifications)", listener, dropped)
+
+            if lag.busy_time > self.TIME_LAG_WARNING or lag.pending_age > self.TIME_LAG_WARNING:
+                _logger.warning("%s lags behind: busy for %.0fs, %d pending notifications (oldest: %.0fs)",
+                                listener, lag.busy_time, lag.pending, lag.pending_age)
+
+    def _check_inbound_stats(self):
+        stats = self._mqtt_proxy.get_inbound_stats()
+        if stats is None:
+            return
+
+        dropped = stats.dropped - self._dropped_messages
+        self._dropped_messages = stats.dropped
+        if dropped > 0:
+            _logger.warning("%d received MQTT messages dropped (inbound queue overflow; max. depth %d)",
+                            dropped, stats.max_depth)
+        _logger.debug("MQTT inbound: %d received, %d dropped, queue depth %d (max. %d)",
+                      stats.received, stats.dropped, stats.depth, stats.max_depth)
+
+    def _log_publish_stats(self):
+        stats = self._mqtt_proxy.get_publish_stats()
+        _logger.debug("MQTT publish: %d messages (%.1f/s), %d acknowledged (%.1f/s), %d in flight, queue depth %d "
+                      "(max. %d), %d coalesced", stats.published, stats.publish_rate, stats.acknowledged,
+                      stats.acknowledge_rate, stats.inflight, stats.queue_depth, stats.max_queue_depth, stats.coalesced)
+
+        retained_cache = self._mqtt_proxy.retained_cache
+        if retained_cache is not None:
+            _logger.debug("MQTT retained messages: %d unchanged (skipped), %d sent",
+                          retained_cache.hits, retained_cache.misses)
 
     async def _main_single(self):
         await self._wait_for_mqtt_connection_timeout()
@@ -115,7 +209,10 @@ class Runner:
         self._dispatcher.push_mqtt_messages(messages)
         self._dispatcher.trigger_start_notification(self._workers, NotificationType.SINGLE_STARTED)
 
-        await asyncio.sleep(0.2)  # wait for debounce pipelines to finish
+        self._dispatcher.flush_notifications()
 
         for worker in self._workers:
-            worker.run_single()
+            if isinstance(worker, AsyncWorker):
+                await worker.run_single_async()
+            else:
+                worker.run_single()
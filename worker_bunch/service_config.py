@@ -1,8 +1,9 @@
 from worker_bunch.astral_times.astral_times_config import ASTRAL_TIMES_JSONSCHEMA
+from worker_bunch.dispatcher_config import CatchUpPolicy
 from worker_bunch.service_logging import LOGGING_JSONSCHEMA
 from worker_bunch.database.database_config import DATABASE_CONNECTIONS_JSONSCHEMA
 from worker_bunch.mqtt.mqtt_config import MQTT_JSONSCHEMA
-from worker_bunch.worker.worker_config import WORKER_INSTANCES_JSONSCHEMA
+from worker_bunch.worker.worker_config import WORKER_INSTANCES_JSONSCHEMA, WorkerExecution
 
 
 class ConfigException(Exception):
@@ -12,6 +13,9 @@ class ConfigException(Exception):
 class ServiceConfKey:
     LOCALE = "locale"
     DATA_DIR = "data_directory"
+    TIMER_CATCH_UP = "timer_catch_up"
+    WORKER_EXECUTION = "worker_execution"
+    WORKER_POOL_SIZE = "worker_pool_size"
 
 
 SERVICE_JSONSCHEMA = {
@@ -28,6 +32,25 @@ SERVICE_JSONSCHEMA = {
             "description": "Promoted to workers, so they store their data there. Make sure it's writable. "
                            "Relative paths refer to config file.",
         },
+        ServiceConfKey.TIMER_CATCH_UP: {
+            "type": "string",
+            "enum": CatchUpPolicy.values(),
+            "description": "How cron/astral ticks get handled, which were missed due to a stalled service. "
+                           f"Default: '{CatchUpPolicy.FIRE_ONCE.value}'",
+        },
+        ServiceConfKey.WORKER_EXECUTION: {
+            "type": "string",
+            "enum": WorkerExecution.values(),
+            "description": f"'{WorkerExecution.THREAD.value}': each worker runs its own thread; "
+                           f"'{WorkerExecution.POOL.value}': workers share a bounded thread pool (many workers, mostly idle); "
+                           f"'{WorkerExecution.PROCESS.value}': each worker runs in a separate process (CPU heavy workers). "
+                           f"May be overridden per worker instance. Default: '{WorkerExecution.THREAD.value}'",
+        },
+        ServiceConfKey.WORKER_POOL_SIZE: {
+            "type": "integer",
+            "minimum": 1,
+            "description": f"Max. number of threads in '{WorkerExecution.POOL.value}' mode. Default: min(32, CPUs + 4)",
+        },
     },
     "additionalProperties": False,
     "required": [],
@@ -9,8 +9,9 @@ from typing import Dict, Optional
 import yaml
 from jsonschema import validate
 
+from worker_bunch.dispatcher_config import CatchUpPolicy, Priority
 from worker_bunch.service_config import MainConfKey, CONFIG_JSONSCHEMA, ServiceConfKey, ConfigException
-from worker_bunch.worker.worker_config import WorkerSettingsDeclaration
+from worker_bunch.worker.worker_config import OverflowPolicy, WorkerExecution, WorkerInstanceConfKey, WorkerSettingsDeclaration
 
 _logger = logging.getLogger(__name__)
 
@@ -128,6 +129,42 @@ class ServiceConfigurator:
     def get_service_config(self):
         return self._config_data[MainConfKey.SERVICE]
 
+    def get_timer_catch_up_policy(self) -> CatchUpPolicy:
+        value = self.get_service_config().get(ServiceConfKey.TIMER_CATCH_UP)
+        return CatchUpPolicy(value) if value else CatchUpPolicy.FIRE_ONCE
+
+    def _get_worker_instance_value(self, worker_name: Optional[str], key: str):
+        instance_config = self.get_worker_instances_config().get(worker_name) if worker_name else None
+        return instance_config.get(key) if isinstance(instance_config, dict) else None
+
+    def get_worker_execution(self, worker_name: Optional[str] = None) -> WorkerExecution:
+        """The execution mode of a worker instance (if configured) or the service wide default."""
+        value = self._get_worker_instance_value(worker_name, WorkerInstanceConfKey.EXECUTION)
+        if not value:
+            value = self.get_service_config().get(ServiceConfKey.WORKER_EXECUTION)
+        return WorkerExecution(value) if value else WorkerExecution.THREAD
+
+    def get_worker_priority(self, worker_name: str) -> Optional[Priority]:
+        """None: the worker class decides"""
+        value = self._get_worker_instance_value(worker_name, WorkerInstanceConfKey.PRIORITY)
+        return Priority.from_value(value) if value else None
+
+    def get_worker_max_pending(self, worker_name: str) -> Optional[int]:
+        """None: the worker class decides"""
+        return self._get_worker_instance_value(worker_name, WorkerInstanceConfKey.MAX_PENDING)
+
+    def get_worker_overflow_policy(self, worker_name: str) -> Optional[OverflowPolicy]:
+        """None: the worker class decides"""
+        value = self._get_worker_instance_value(worker_name, WorkerInstanceConfKey.OVERFLOW)
+        return OverflowPolicy(value) if value else None
+
+    def get_worker_mqtt_qos(self, worker_name: str) -> Optional[int]:
+        """None: the worker class decides"""
+        return self._get_worker_instance_value(worker_name, WorkerInstanceConfKey.QOS)
+
+    def get_worker_pool_size(self) -> Optional[int]:
+        return self.get_service_config().get(ServiceConfKey.WORKER_POOL_SIZE)
+
     def get_data_dir(self) -> str:
         service_settings = self.get_service_config()
         return service_settings.get(ServiceConfKey.DATA_DIR)
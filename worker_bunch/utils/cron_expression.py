@@ -0,0 +1,184 @@
+import calendar
+import datetime
+import functools
+from typing import FrozenSet, List, Optional
+
+
+class CronExpression:
+    """
+    Compiled cron expression ("minute hour day-of-month month day-of-week"), parsed only once. An optional leading sixth
+    field defines seconds ("second minute hour day-of-month month day-of-week").
+
+    Compatible to the former `pycron` evaluation: all fields must match (day of month AND day of week), "*/n" hits all
+    values divisible by n, days of week may be given by (abbreviated) names, Sunday is 0 (or 7). Times are evaluated on
+    wall clock time of the given datetime (timezone aware or not).
+    """
+
+    FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]  # minute, hour, day of month, month, day of week
+    SECOND_RANGE = (0, 59)
+
+    DAY_NAMES = [d.lower() for d in calendar.day_name[6:] + calendar.day_name[:6]]  # starts with sunday
+    DAY_ABBRS = [d.lower() for d in calendar.day_abbr[6:] + calendar.day_abbr[:6]]
+
+    # "0 0 30 2 *" never hits; limits the search for the next fire time
+    SEARCH_LIMIT_YEARS = 5
+
+    def __init__(self, expression: str):
+        self._expression = expression
+
+        fields = expression.split()
+        if len(fields) == len(self.FIELD_RANGES) + 1:
+            self._seconds = self._parse_field(fields[0], *self.SECOND_RANGE)
+            self._has_seconds = True
+            fields = fields[1:]
+        elif len(fields) == len(self.FIELD_RANGES):
+            self._seconds = frozenset([0])
+            self._has_seconds = False
+        else:
+            raise ValueError(f"cron expression needs {len(self.FIELD_RANGES)} or {len(self.FIELD_RANGES) + 1} fields "
+                             f"('{expression}')!")
+
+        self._minutes = self._parse_field(fields[0], *self.FIELD_RANGES[0])
+        self._hours = self._parse_field(fields[1], *self.FIELD_RANGES[1])
+        self._days = self._parse_field(fields[2], *self.FIELD_RANGES[2])
+        self._months = self._parse_field(fields[3], *self.FIELD_RANGES[3])
+        self._weekdays = self._parse_field(fields[4], *self.FIELD_RANGES[4], allow_day_names=True)
+
+        self._sorted_seconds = sorted(self._seconds)
+        self._sorted_minutes = sorted(self._minutes)
+        self._sorted_hours = sorted(self._hours)
+
+    def __str__(self):
+        return self._expression
+
+    def __repr__(self) -> str:
+        return '{}({})'.format(self.__class__.__name__, self._expression)
+
+    @property
+    def expression(self) -> str:
+        return self._expression
+
+    @property
+    def has_seconds(self) -> bool:
+        """True for 6-field expressions (with seconds)."""
+        return self._has_seconds
+
+    @property
+    def resolution(self) -> datetime.timedelta:
+        """The granularity of the hits: a second or a minute."""
+        return datetime.timedelta(seconds=1) if self._has_seconds else datetime.timedelta(minutes=1)
+
+    @classmethod
+    @functools.lru_cache(maxsize=512)
+    def compile(cls, expression: str) -> "CronExpression":
+        """Returns a cached, compiled instance. Raises `ValueError` for an invalid expression."""
+        return cls(expression)
+
+    @classmethod
+    def _to_int(cls, value: str, allow_day_names: bool) -> int:
+        value = value.strip().lower()
+        if value.isdigit():
+            return int(value)
+        if allow_day_names:
+            if value in cls.DAY_NAMES:
+                return cls.DAY_NAMES.index(value)
+            if value in cls.DAY_ABBRS:
+                return cls.DAY_ABBRS.index(value)
+        raise ValueError(f"invalid cron value ('{value}')!")
+
+    @classmethod
+    def _parse_field(cls, field: str, min_value: int, max_value: int, allow_day_names=False) -> FrozenSet[int]:
+        values = set()
+        upper_limit = 7 if allow_day_names else max_value  # 7 == sunday
+
+        for item in field.split(","):
+            step = None
+            if "/" in item:
+                item, step_text = item.split("/", 1)
+                step = cls._to_int(step_text, False)
+                if step < 1:
+                    raise ValueError(f"invalid cron step ('{field}')!")
+
+            if item == "*":
+                if step is None:
+                    values.update(range(min_value, max_value + 1))
+                else:  # pycron compatible: all values divisible by step
+                    values.update(v for v in range(min_value, max_value + 1) if v % step == 0)
+                continue
+
+            if "-" in item:
+                start_text, end_text = item.split("-", 1)
+                start = cls._to_int(start_text, allow_day_names)
+                end = cls._to_int(end_text, allow_day_names)
+            else:
+                start = cls._to_int(item, allow_day_names)
+                end = max_value if step is not None else start
+
+            if not (min_value <= start <= upper_limit and min_value <= end <= upper_limit):
+                raise ValueError(f"cron value out of range ('{field}'; {min_value}-{max_value})!")
+            if start > end:
+                if not allow_day_names:
+                    raise ValueError(f"invalid cron range ('{field}')!")
+                end += 7  # wraps around the week, e.g. "fri-mon"
+
+            values.update(range(start, end + 1, step or 1))
+
+        if allow_day_names:
+            values = {v % 7 for v in values}
+        return frozenset(values)
+
+    def _matches_day(self, time: datetime.datetime) -> bool:
+        weekday = time.isoweekday() % 7  # sunday == 0
+        return time.month in self._months and time.day in self._days and weekday in self._weekdays
+
+    def matches(self, time: datetime.datetime) -> bool:
+        """Returns True if the cron hits the minute (or the second for 6-field expressions) of `time`."""
+        if self._has_seconds and time.second not in self._seconds:
+            return False
+        return time.minute in self._minutes and time.hour in self._hours and self._matches_day(time)
+
+    @classmethod
+    def _next_value(cls, values: List[int], current: int) -> Optional[int]:
+        """First value >= current of sorted `values`."""
+        for value in values:
+            if value >= current:
+                return value
+        return None
+
+    def next_fire_time(self, after: datetime.datetime) -> Optional[datetime.datetime]:
+        """
+        Returns the first hit strictly after `after` (on wall clock time; `tzinfo` is kept) or None, if the cron never hits.
+        """
+        tzinfo = after.tzinfo
+        time = after.replace(tzinfo=None, microsecond=0) + datetime.timedelta(seconds=1)
+        if not self._has_seconds and time.second > 0:
+            time = time.replace(second=0) + datetime.timedelta(minutes=1)
+        time_limit = time + datetime.timedelta(days=366 * self.SEARCH_LIMIT_YEARS)
+
+        while time < time_limit:
+            if not self._matches_day(time):
+                time = time.replace(hour=0, minute=0, second=0) + datetime.timedelta(days=1)
+                continue
+
+            hour = self._next_value(self._sorted_hours, time.hour)
+            if hour is None:
+                time = time.replace(hour=0, minute=0, second=0) + datetime.timedelta(days=1)
+                continue
+            if hour != time.hour:
+                time = time.replace(hour=hour, minute=0, second=0)
+
+            minute = self._next_value(self._sorted_minutes, time.minute)
+            if minute is None:
+                time = time.replace(minute=0, second=0) + datetime.timedelta(hours=1)
+                continue
+            if minute != time.minute:
+                time = time.replace(minute=minute, second=0)
+
+            second = self._next_value(self._sorted_seconds, time.second)
+            if second is None:
+                time = time.replace(second=0) + datetime.timedelta(minutes=1)
+                continue
+
+            return time.replace(second=second, tzinfo=tzinfo)
+
+        return None
@@ -0,0 +1,136 @@
+import heapq
+import itertools
+import time
+from enum import Enum
+from typing import Callable, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+import attr
+
+
+K = TypeVar("K", bound=Hashable)
+
+
+class DebounceMode(Enum):
+
+    # due after `delay` without further events (or `max_wait` after the first pending event)
+    DEBOUNCE = "debounce"
+    # the first event (after a quiet period of `delay`) is due immediately, later events at most once per `delay`
+    THROTTLE_LEADING = "throttle_leading"
+    # due `delay` after the first pending event
+    THROTTLE_TRAILING = "throttle_trailing"
+
+    @classmethod
+    def values(cls):
+        return [m.value for m in DebounceMode]
+
+
+@attr.frozen
+class DebounceSettings:
+    delay: float
+    max_wait: Optional[float] = None  # DEBOUNCE only: limits the latency under continuous load
+    mode: DebounceMode = DebounceMode.DEBOUNCE
+
+
+class DebounceEngine(Generic[K]):
+    """
+    Debounces (or throttles) events per key: a key gets due depending on its `DebounceSettings`.
+
+    All pending deadlines are kept in one min-heap (usually one entry per key; a postponed deadline is moved lazily when
+    its outdated entry surfaces, cancelled entries are skipped). No timers or threads are involved: the owner has to call
+    `pop_due` in time, see `get_seconds_to_next_deadline`. Not thread safe.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._settings: Dict[K, DebounceSettings] = {}
+        self._first_events: Dict[K, float] = {}  # pending keys => time of the first pending event
+        self._deadlines: Dict[K, float] = {}  # pending keys => current deadline
+        self._last_due: Dict[K, float] = {}  # for THROTTLE_LEADING
+        self._heap: List[Tuple[float, int, K]] = []  # (deadline, sequence, key); keys don't need to be comparable
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        """Number of pending keys."""
+        return len(self._deadlines)
+
+    def __contains__(self, key: K):
+        """True for registered keys."""
+        return key in self._settings
+
+    def register(self, key: K, delay: float, max_wait: Optional[float] = None, mode: DebounceMode = DebounceMode.DEBOUNCE):
+        if delay < 0:
+            raise ValueError(f"invalid debounce delay ({delay})!")
+        if max_wait is not None and max_wait <= 0:
+            raise ValueError(f"invalid max. wait time ({max_wait})!")
+        self._settings[key] = DebounceSettings(delay=delay, max_wait=max_wait, mode=mode)
+
+    def trigger(self, key: K) -> bool:
+        """
+        Registers an event. Returns True if the key is due immediately (leading throttle); it doesn't get pending then.
+        """
+        settings = self._settings[key]
+        now = self._clock()
+        first_event = self._first_events.get(key)
+
+        if settings.mode == DebounceMode.DEBOUNCE:
+            deadline = now + settings.delay
+            if settings.max_wait is not None:
+                deadline = min(deadline, (first_event if first_event is not None else now) + settings.max_wait)
+        elif first_event is not None:
+            return False  # throttled, the deadline is fixed
+        elif settings.mode == DebounceMode.THROTTLE_TRAILING:
+            deadline = now + settings.delay
+        else:  # THROTTLE_LEADING
+            last_due = self._last_due.get(key)
+            if last_due is None or now - last_due >= settings.delay:
+                self._last_due[key] = now
+                return True
+            deadline = last_due + settings.delay
+
+        if first_event is None:
+            self._first_events[key] = now
+            heapq.heappush(self._heap, (deadline, next(self._sequence), key))
+        self._deadlines[key] = deadline
+        return False
+
+    def pop_due(self) -> List[K]:
+        """Returns (and removes) all keys which deadline has passed."""
+        now = self._clock()
+        due_keys = []
+
+        while self._heap and self._heap[0][0] <= now:
+            _, _, key = heapq.heappop(self._heap)
+            deadline = self._deadlines.get(key)
+            if deadline is None:  # cancelled
+                continue
+            if deadline <= now:
+                self._remove_pending(key)
+                self._last_due[key] = now
+                due_keys.append(key)
+            else:  # postponed in the meantime
+                heapq.heappush(self._heap, (deadline, next(self._sequence), key))
+
+        return due_keys
+
+    def _remove_pending(self, key: K):
+        del self._deadlines[key]
+        del self._first_events[key]
+
+    def cancel(self, key: K):
+        """Drops a pending key (its heap entry is skipped later)."""
+        if key in self._deadlines:
+            self._remove_pending(key)
+
+    def pop_all(self) -> List[K]:
+        """Returns (and removes) all pending keys, due or not."""
+        keys = list(self._deadlines.keys())
+        self._deadlines = {}
+        self._first_events = {}
+        self._heap = []
+        return keys
+
+    def get_seconds_to_next_deadline(self) -> Optional[float]:
+        """None if nothing is pending. May be a little early (postponed deadlines), but never late."""
+        if not self._heap:
+            return None
+        return max(self._heap[0][0] - self._clock(), 0.0)
@@ -1,9 +1,10 @@
 import datetime
 import time
 
-import pycron
 from tzlocal import get_localzone
 
+from worker_bunch.utils.cron_expression import CronExpression
+
 
 class TimeUtils:
 
@@ -30,7 +31,7 @@ class TimeUtils:
         Returns True is the cron is triggering right `now`
         """
         now = now if now is not None else cls.now()
-        return pycron.is_now(cron, now)
+        return CronExpression.compile(cron).matches(now)
 
     @classmethod
     def is_cron_time_syntax(cls, cron: str):
@@ -38,7 +39,7 @@ class TimeUtils:
         Checks if the string is a proper cron syntax
         """
         try:
-            cls.hits_cron_time(cron)  # result down not matter here
+            CronExpression.compile(cron)
             return True
         except ValueError:
             return False
@@ -0,0 +1,139 @@
+import abc
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from worker_bunch.notification import Notification
+from worker_bunch.service_config import ConfigException
+from worker_bunch.worker.worker import ShutdownException, Worker, WorkerSetup
+from worker_bunch.worker.worker_config import OverflowPolicy, WorkerExecution
+
+
+class AsyncWorker(Worker):
+    """
+    Worker variant without an own thread: `_work` is a coroutine, which runs as task on the `Runner` event loop. So it
+    must not block (no `time.sleep`, no blocking I/O), but it may `await`. Outgoing MQTT messages go via
+    `self._mqtt_proxy.queue(...)` (non-blocking).
+
+    Notifications are kept in the notification buffer as for threaded workers (`MAX_PENDING`, `OVERFLOW_POLICY`), an
+    `asyncio.Event` just wakes the task; all notifications buffered meanwhile are handled in one `_work` call. `_work`
+    never runs concurrently and an exception ends the worker. `OverflowPolicy.BLOCK` doesn't wait on the event loop
+    thread (the worker couldn't catch up), there it behaves like `DROP_OLDEST`.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._wakeup: Optional[asyncio.Event] = None  # set on new notifications and `stop`
+        self._task: Optional[asyncio.Task] = None
+        self._finished = threading.Event()
+
+    def setup(self, props: Dict[WorkerSetup, any]):
+        if props.get(WorkerSetup.WORKER_EXECUTION) == WorkerExecution.PROCESS:
+            raise ConfigException(f"Async worker '{self.name}' cannot run in a separate process!")
+        props = {k: v for k, v in props.items() if k != WorkerSetup.WORKER_POOL}  # runs on the event loop anyway
+        super().setup(props)
+
+    def start(self):
+        """Called by the `Runner` within its event loop."""
+        if self._task is not None:
+            raise RuntimeError(f"Start only once ('{self.name}')!")
+
+        self._loop = asyncio.get_running_loop()  # raises a RuntimeError outside a running loop
+        self._loop_thread_id = threading.get_ident()
+        self._wakeup = asyncio.Event()
+
+        with self._lock:
+            if self._notifications or self._closing:  # delivered or stopped before `start`
+                self._wakeup.set()
+
+        self._task = self._loop.create_task(self._run_async(), name=self.name)
+
+    def is_alive(self) -> bool:
+        return self._task is not None and not self._finished.is_set()
+
+    def join(self, timeout: Optional[float] = None):
+        """Don't call within the event loop, use `wait_stopped` there."""
+        if self._task is not None:
+            self._finished.wait(timeout)
+
+    async def wait_stopped(self):
+        if self._task is not None:
+            await self._task
+
+    def stop(self):
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+        self._wakeup_threadsafe()
+
+    def add_notifications(self, notifications: Set[Notification]):
+        with self._condition:
+            if self._notifications.overflow_policy == OverflowPolicy.BLOCK and self._task is not None \
+                    and self._loop_thread_id != threading.get_ident():
+                self._wait_for_space(notifications)
+            self._notifications.add(notifications)
+        self._wakeup_threadsafe()
+
+    def _wakeup_threadsafe(self):
+        if self._wakeup is None or self._finished.is_set():
+            return  # not started (`start` checks the buffer) or finished
+        if self._loop_thread_id == threading.get_ident():
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run_async(self):
+        try:
+            while self.proceed():
+                await self._wakeup.wait()
+                self._wakeup.clear()
+
+                self.proceed()  # stopped meanwhile
+                notifications = self._get_and_reset_notifications()  # the latest notification per type and topic
+                if not notifications:
+                    continue
+
+                with self._lock:
+                    self._work_started = time.monotonic()
+                try:
+                    await self._work(notifications)
+                finally:
+                    with self._lock:
+                        self._work_started = None
+
+        except (ShutdownException, asyncio.CancelledError):
+            pass
+        except Exception as ex:
+            self._logger.exception(ex)
+        finally:
+            try:
+                self._final_work()
+            finally:
+                self._finished.set()
+
+    async def run_single_async(self):
+        """Counterpart of `run_single`, awaited by the `Runner`."""
+        try:
+            notifications = self._get_and_reset_notifications()
+            if notifications:
+                await self._work(notifications)
+        except Exception as ex:
+            self._logger.exception(ex)
+        finally:
+            self._final_work()
+
+    def run(self):
+        raise RuntimeError(f"'{self.name}' is an async worker and doesn't run as thread!")
+
+    def run_single(self):
+        raise RuntimeError(f"'{self.name}' is an async worker, use `run_single_async`!")
+
+    @abc.abstractmethod
+    async def _work(self, notifications: List[Notification]):
+        """the task "main" coroutine."""
+        raise NotImplementedError()
@@ -0,0 +1,79 @@
+import time
+from typing import Callable, Dict, Iterable, KeysView, List, Optional, Tuple
+
+from worker_bunch.notification import Notification
+from worker_bunch.worker.worker_config import OverflowPolicy
+
+
+class NotificationBuffer:
+    """
+    Pending notifications of a worker: the latest notification per type and topic, in arrival order of the topics.
+
+    The number of pending topics may be limited; see `OverflowPolicy` for what happens on overflow (`BLOCK` has to be
+    handled by the caller via `get_missing_space`, otherwise it behaves like `DROP_OLDEST`). Not thread safe.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_size is not None and max_size < 1:
+            raise ValueError(f"invalid notification buffer size ({max_size})!")
+        self._max_size = max_size
+        self._overflow_policy = overflow_policy
+        self._clock = clock
+
+        self._pending: Dict[Notification, Tuple[Notification, float]] = {}  # => (latest notification, first arrival)
+        self._dropped = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __bool__(self):
+        return bool(self._pending)
+
+    @property
+    def overflow_policy(self) -> OverflowPolicy:
+        return self._overflow_policy
+
+    @property
+    def dropped(self) -> int:
+        """Total number of dropped notifications."""
+        return self._dropped
+
+    def keys(self) -> KeysView[Notification]:
+        """The pending notifications (not necessarily the latest payloads), e.g. for `Notification.find`."""
+        return self._pending.keys()
+
+    def get_pending_age(self) -> float:
+        """Seconds since the oldest pending notification arrived."""
+        if not self._pending:
+            return 0.0
+        _, first_arrival = next(iter(self._pending.values()))
+        return self._clock() - first_arrival
+
+    def get_missing_space(self, notifications: Iterable[Notification]) -> int:
+        """Number of new topics, which don't fit into the buffer anymore."""
+        if self._max_size is None:
+            return 0
+        new_topics = sum(1 for n in notifications if n not in self._pending)
+        return max(len(self._pending) + new_topics - self._max_size, 0)
+
+    def add(self, notifications: Iterable[Notification]):
+        now = self._clock()
+        for notification in notifications:
+            entry = self._pending.get(notification)
+            if entry is not None:
+                self._pending[notification] = (notification, entry[1])  # keeps position and first arrival
+                continue
+
+            if self._max_size is not None and len(self._pending) >= self._max_size:
+                self._dropped += 1
+                if self._overflow_policy == OverflowPolicy.KEEP_LATEST:
+                    continue
+                del self._pending[next(iter(self._pending))]
+
+            self._pending[notification] = (notification, now)
+
+    def take_all(self) -> List[Notification]:
+        notifications = [n for n, _ in self._pending.values()]
+        self._pending = {}
+        return notifications
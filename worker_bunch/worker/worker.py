@@ -1,18 +1,26 @@
 import abc
 import copy
+import functools
 import logging
+import multiprocessing
 import os
+import signal
 import threading
+import time
 from enum import Enum
 from logging import Logger
-from typing import Dict, List, Optional, Set
+from typing import Collection, Dict, List, Optional, Set
 
-from worker_bunch.dispatcher import Dispatcher, DispatcherListener
+from worker_bunch.dispatcher import Dispatcher, DispatcherListener, ListenerLag
+from worker_bunch.dispatcher_config import Priority
 from worker_bunch.mqtt.mqtt_proxy import MqttProxy
 from worker_bunch.notification import Notification
 from worker_bunch.service_config import ConfigException
 from worker_bunch.service_logging import ServiceLogging
-from worker_bunch.utils.time_utils import TimeUtils
+from worker_bunch.worker.notification_buffer import NotificationBuffer
+from worker_bunch.worker.worker_config import OverflowPolicy, WorkerExecution
+from worker_bunch.worker.worker_pool import WorkerPool
+from worker_bunch.worker.worker_process import ProcessMqttProxy, WorkerProcess
 
 
 class ShutdownException(Exception):
@@ -26,25 +34,60 @@ class WorkerSetup(Enum):
     DATABASE_MANAGER = "database_manager"
     MQTT_PROXY = "mqtt_proxy"
     WORKER_SETTINGS = "worker_settings"
+    WORKER_POOL = "worker_pool"  # optional, switches to `WorkerExecution.POOL` mode
+    WORKER_EXECUTION = "worker_execution"  # optional, `WorkerExecution.PROCESS` starts a separate process
+    WORKER_PRIORITY = "worker_priority"  # optional, overrides `Worker.PRIORITY`
+    MAX_PENDING = "max_pending"  # optional, overrides `Worker.MAX_PENDING`
+    OVERFLOW_POLICY = "overflow_policy"  # optional, overrides `Worker.OVERFLOW_POLICY`
+    MQTT_QOS = "mqtt_qos"  # optional, overrides `Worker.MQTT_QOS`
 
 
 class Worker(threading.Thread, DispatcherListener):
 
+    # The worker thread sleeps until notifications arrive or `stop` is called. A value (seconds) limits the idle wait.
+    # Not applicable in pool mode.
+    MAX_IDLE_WAIT: Optional[float] = None
+
+    # Delivery order of notifications and execution order in pool mode (e.g. alarms before logging).
+    PRIORITY = Priority.NORMAL
+
+    # Limits the pending notifications (distinct topics) while `_work` is busy. None: unlimited
+    MAX_PENDING: Optional[int] = 10000
+    OVERFLOW_POLICY = OverflowPolicy.DROP_OLDEST
+    # `OverflowPolicy.BLOCK`: max. seconds the dispatcher waits for space, then the oldest notifications are dropped
+    MAX_BLOCK_TIME = 5.0
+
+    # QoS of sent MQTT messages, pass `self.mqtt_qos` to `MqttProxy.queue`. None: MQTT client default (`default_qos`)
+    MQTT_QOS: Optional[int] = None
+
     def __init__(self, name: str):
         threading.Thread.__init__(self, name=name)
 
         self._setup_done = False
 
         self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)  # signals new notifications and closing
         self._closing = False  # shutdown in process
         self._base_data_dir: Optional[str] = None
 
         self.__logger: Optional[Logger] = None
 
-        self._notifications: Set[Notification] = set()
+        self._notifications = NotificationBuffer(self.MAX_PENDING, self.OVERFLOW_POLICY)
+        self._work_started: Optional[float] = None  # monotonic time, while `_work` is running
 
         self._worker_settings: Dict[str, any] = {}
         self._mqtt_proxy: Optional[MqttProxy] = None
+        self._priority = self.PRIORITY
+        self._mqtt_qos = self.MQTT_QOS
+
+        # pool mode: no own thread, `_work` runs as pool task
+        self._worker_pool: Optional[WorkerPool] = None
+        self._pool_started = False
+        self._pool_scheduled = False  # a task is queued or running; prevents concurrent `_work` calls
+        self._pool_finished = threading.Event()
+
+        # process mode: this instance is just the parent side, a twin does the work in a separate process
+        self._worker_process: Optional[WorkerProcess] = None
 
     def __str__(self):
         return '{}({})'.format(self.__class__.__name__, self.name)
@@ -62,6 +105,54 @@ class Worker(threading.Thread, DispatcherListener):
             worker_settings = props.get(WorkerSetup.WORKER_SETTINGS)
             self._worker_settings = copy.deepcopy(worker_settings) if worker_settings else {}
             self._mqtt_proxy = props.get(WorkerSetup.MQTT_PROXY)
+            self._worker_pool = props.get(WorkerSetup.WORKER_POOL)
+            priority = props.get(WorkerSetup.WORKER_PRIORITY)
+            self._priority = self.PRIORITY if priority is None else priority  # HIGH == 0
+            mqtt_qos = props.get(WorkerSetup.MQTT_QOS)
+            self._mqtt_qos = self.MQTT_QOS if mqtt_qos is None else mqtt_qos  # QoS 0
+
+            max_pending = props.get(WorkerSetup.MAX_PENDING)
+            overflow_policy = props.get(WorkerSetup.OVERFLOW_POLICY)
+            if max_pending is not None or overflow_policy is not None:
+                self._notifications = NotificationBuffer(
+                    self.MAX_PENDING if max_pending is None else max_pending,
+                    overflow_policy or self.OVERFLOW_POLICY,
+                )
+
+            if props.get(WorkerSetup.WORKER_EXECUTION) == WorkerExecution.PROCESS:
+                parent_only = (WorkerSetup.MQTT_PROXY, WorkerSetup.WORKER_POOL, WorkerSetup.WORKER_EXECUTION)
+                child_props = {k: v for k, v in props.items() if k not in parent_only}
+                target = functools.partial(self.__class__._run_process, self.name, child_props)
+                self._worker_process = WorkerProcess(self.name, target, self._mqtt_proxy)
+
+    @property
+    def priority(self) -> Priority:
+        return self._priority
+
+    @property
+    def mqtt_qos(self) -> Optional[int]:
+        return self._mqtt_qos
+
+    def get_priority(self, notifications: Collection[Notification]) -> Priority:
+        """
+        Priority of pending notifications, by default the worker priority. Overwrite to prioritize specific
+        notifications, e.g.: `Priority.HIGH if Notification.find(notifications, NT.MQTT_MESSAGE, "alarm") else ...`
+        Don't acquire the worker lock, it's held already in pool mode.
+        """
+        return self._priority
+
+    def get_lag(self) -> Optional[ListenerLag]:
+        if self._worker_process is not None:
+            return None  # the backlog is located in the worker process
+
+        with self._lock:
+            work_started = self._work_started
+            return ListenerLag(
+                pending=len(self._notifications),
+                pending_age=self._notifications.get_pending_age(),
+                busy_time=time.monotonic() - work_started if work_started is not None else 0.0,
+                dropped=self._notifications.dropped,
+            )
 
     def ensure_data_path(self, file_name: Optional[str] = None) -> str:
         if not self._base_data_dir:
@@ -88,12 +179,49 @@ class Worker(threading.Thread, DispatcherListener):
         ```
         """
 
+    def start(self):
+        if self._worker_process is not None:
+            self._worker_process.start()
+            return
+        if self._worker_pool is None:
+            super().start()
+            return
+
+        with self._lock:
+            if self._pool_started:
+                raise RuntimeError(f"Start only once ('{self.name}')!")
+            self._pool_started = True
+            priority = self._mark_pool_task_scheduled()
+        if priority is not None:
+            self._worker_pool.submit(self._run_pool_task, priority)
+
+    def is_alive(self) -> bool:
+        if self._worker_process is not None:
+            return self._worker_process.is_alive()
+        if self._worker_pool is None:
+            return super().is_alive()
+        return self._pool_started and not self._pool_finished.is_set()
+
+    def join(self, timeout: Optional[float] = None):
+        if self._worker_process is not None:
+            self._worker_process.join(timeout)
+        elif self._worker_pool is None:
+            super().join(timeout)
+        else:
+            self._pool_finished.wait(timeout)
+
     def stop(self):
         """
         Just the notification to finish and stop the thread. A last will may be better send within `_final_work`.
         """
-        with self._lock:
+        with self._condition:
             self._closing = True
+            self._condition.notify_all()
+            priority = self._mark_pool_task_scheduled()
+        if priority is not None:
+            self._worker_pool.submit(self._run_pool_task, priority)
+        if self._worker_process is not None:
+            self._worker_process.stop()
 
     def proceed(self) -> bool:
         with self._lock:
@@ -108,9 +236,18 @@ class Worker(threading.Thread, DispatcherListener):
             self.__logger = logging.getLogger(log_name)
         return self.__logger
 
-    # noinspection PyMethodMayBeStatic
+    def _wait_for_notifications(self):
+        """Blocks until notifications are pending, `stop` was called or `MAX_IDLE_WAIT` has passed."""
+        with self._condition:
+            if not self._notifications and not self._closing:
+                self._condition.wait(self.MAX_IDLE_WAIT)
+
     def _sleep(self):
-        TimeUtils.sleep(0.5)
+        """
+        Deprecated hook, use `MAX_IDLE_WAIT` to limit the idle wait. Overrides are still called between the work turns
+        (instead of `_wait_for_notifications`), but they delay notifications like the former polling did.
+        """
+        self._wait_for_notifications()
 
     @abc.abstractmethod
     def subscribe_notifications(self, dispatcher: Dispatcher):
@@ -123,17 +260,45 @@ class Worker(threading.Thread, DispatcherListener):
         self._dispatcher.subscribe_cron("* * * * *", self, "cron-every-minute")
 
         self._dispatcher.subscribe_topics(self, ["mqtt/topic"],
+
+        # bounded latency for continuously reporting sensors
+        dispatcher.subscribe_mqtt_topics(self, ["sensor/#"], debounce_time=0.1, max_wait=1.0)
+
+        # individual policies per topic (filter)
+        dispatcher.subscribe_mqtt_topics(self, ["power/#"], debounce_time=5,
+                                         topic_policies={"door/+": DeliveryPolicy.immediate()})
         """
         raise NotImplementedError()
 
     def add_notifications(self, notifications: Set[Notification]):
-        with self._lock:
-            self._notifications |= notifications
+        if self._worker_process is not None:
+            self._worker_process.add_notifications(notifications)
+            return
+
+        with self._condition:
+            if self._notifications.overflow_policy == OverflowPolicy.BLOCK:
+                self._wait_for_space(notifications)
+            self._notifications.add(notifications)
+            self._condition.notify_all()  # the worker thread (or blocked dispatcher threads)
+            priority = self._mark_pool_task_scheduled()
+        if priority is not None:
+            self._worker_pool.submit(self._run_pool_task, priority)
+
+    def _wait_for_space(self, notifications: Set[Notification]):
+        """Backpressure (`OverflowPolicy.BLOCK`), call with lock. Gives up after `MAX_BLOCK_TIME`."""
+        time_limit = time.monotonic() + self.MAX_BLOCK_TIME
+        while self._notifications.get_missing_space(notifications) and not self._closing:
+            time_left = time_limit - time.monotonic()
+            if time_left <= 0:
+                self._logger.warning("notification buffer still full after %.1fs, oldest notifications get dropped!",
+                                     self.MAX_BLOCK_TIME)
+                break
+            self._condition.wait(time_left)
 
     def _get_and_reset_notifications(self) -> List[Notification]:
-        with self._lock:
-            notifications = list(self._notifications)
-            self._notifications.clear()
+        with self._condition:
+            notifications = self._notifications.take_all()
+            self._condition.notify_all()  # blocked dispatcher (`OverflowPolicy.BLOCK`)
             return notifications
 
     def _should_handle_pending_notifications(self) -> bool:
@@ -141,6 +306,10 @@ class Worker(threading.Thread, DispatcherListener):
             return bool(self._notifications)
 
     def run(self):
+        if type(self)._sleep is not Worker._sleep:
+            self._logger.warning("overriding `Worker._sleep` is deprecated (notifications are delayed), "
+                                 "use `MAX_IDLE_WAIT` instead!")
+
         try:
             while self.proceed():
                 self._process_notifications()
@@ -153,6 +322,61 @@ class Worker(threading.Thread, DispatcherListener):
         finally:
             self._final_work()
 
+    def _mark_pool_task_scheduled(self) -> Optional[Priority]:
+        """Pool mode only, call with lock. Returns the task priority if a new task has to be submitted."""
+        if self._worker_pool is None or not self._pool_started or self._pool_scheduled or self._pool_finished.is_set():
+            return None
+        if not self._notifications and not self._closing:
+            return None
+        self._pool_scheduled = True
+        return self.get_priority(self._notifications.keys())
+
+    def _run_pool_task(self):
+        """Pool mode counterpart of `run`: one turn of work. A new task is submitted for further notifications."""
+        try:
+            if self.proceed():
+                self._process_notifications()
+        except ShutdownException:
+            self._finish_pool_task()
+            return
+        except Exception as ex:
+            self._logger.exception(ex)
+            self._finish_pool_task()  # dies like a thread
+            return
+
+        with self._lock:
+            self._pool_scheduled = False
+            priority = self._mark_pool_task_scheduled()
+        if priority is not None:
+            self._worker_pool.submit(self._run_pool_task, priority)  # resubmitted, so other workers get their turn
+
+    def _finish_pool_task(self):
+        try:
+            self._final_work()
+        except Exception as ex:
+            self._logger.exception(ex)
+        finally:
+            self._pool_finished.set()
+
+    @classmethod
+    def _run_process(cls, name: str, props: Dict[WorkerSetup, any], inbound: multiprocessing.Queue,
+                     outbound: multiprocessing.Queue):
+        """Main function of a worker process (`WorkerExecution.PROCESS`); the worker runs in the main thread."""
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent stops the worker (and sends `_final_work` messages)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        try:
+            props = dict(props)
+            props[WorkerSetup.MQTT_PROXY] = ProcessMqttProxy(outbound)
+            worker = cls(name)
+            worker.setup(props)
+
+            forwarder = threading.Thread(target=WorkerProcess.forward_notifications, name=f"{name}-forwarder", daemon=True,
+                                         args=(inbound, worker.add_notifications, worker.stop))
+            forwarder.start()
+            worker.run()
+        finally:
+            outbound.put(None)
+
     def run_single(self):
         try:
             if self.proceed():
@@ -169,7 +393,11 @@ class Worker(threading.Thread, DispatcherListener):
         if self._should_handle_pending_notifications():
             notifications = self._get_and_reset_notifications()
             if notifications:
-                self._work(notifications)
+                self._work_started = time.monotonic()
+                try:
+                    self._work(notifications)
+                finally:
+                    self._work_started = None
 
     @abc.abstractmethod
     def _work(self, notifications: List[Notification]):
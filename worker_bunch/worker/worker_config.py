@@ -1,12 +1,93 @@
+from enum import Enum
 from typing import Dict
 
 import attr
 
+from worker_bunch.dispatcher_config import Priority
+
+
+class WorkerExecution(Enum):
+
+    # each worker runs its own thread
+    THREAD = "thread"
+    # workers are tasks, scheduled onto a bounded thread pool when notifications are delivered
+    POOL = "pool"
+    # the worker runs in a separate process (CPU heavy workers, no GIL contention)
+    PROCESS = "process"
+
+    @classmethod
+    def values(cls):
+        return [e.value for e in WorkerExecution]
+
+
+class OverflowPolicy(Enum):
+    """What happens when the pending notifications of a worker reach their limit (distinct topics)."""
+
+    # pending topics still get updated (latest notification), notifications of new topics are dropped
+    KEEP_LATEST = "keep_latest"
+    # the oldest pending notifications are dropped in favour of the new ones
+    DROP_OLDEST = "drop_oldest"
+    # the dispatcher waits until the worker takes the pending notifications (limited by `Worker.MAX_BLOCK_TIME`)
+    BLOCK = "block"
+
+    @classmethod
+    def values(cls):
+        return [p.value for p in OverflowPolicy]
+
+
+class WorkerInstanceConfKey:
+    CLASS = "class"
+    EXECUTION = "execution"
+    PRIORITY = "priority"
+    MAX_PENDING = "max_pending"
+    OVERFLOW = "overflow"
+    QOS = "qos"
+
 
 WORKER_INSTANCES_JSONSCHEMA = {
     "type": "object",
-    "additionalProperties": {"type": "string"},
-    "description": "Dictionary of <worker name>:<worker class path>"
+    "additionalProperties": {
+        "oneOf": [
+            {"type": "string", "minLength": 1},
+            {
+                "type": "object",
+                "properties": {
+                    WorkerInstanceConfKey.CLASS: {"type": "string", "minLength": 1, "description": "Worker class path"},
+                    WorkerInstanceConfKey.EXECUTION: {
+                        "type": "string",
+                        "enum": WorkerExecution.values(),
+                        "description": "Overrides the service wide worker execution mode.",
+                    },
+                    WorkerInstanceConfKey.PRIORITY: {
+                        "type": "string",
+                        "enum": Priority.values(),
+                        "description": "Overrides the worker class priority: delivery order of notifications, "
+                                       "execution order in pool mode.",
+                    },
+                    WorkerInstanceConfKey.MAX_PENDING: {
+                        "type": "integer",
+                        "minimum": 1,
+                        "description": "Max. number of pending notifications (distinct topics) of the worker.",
+                    },
+                    WorkerInstanceConfKey.OVERFLOW: {
+                        "type": "string",
+                        "enum": OverflowPolicy.values(),
+                        "description": "Overflow policy, when the pending notifications reach their limit.",
+                    },
+                    WorkerInstanceConfKey.QOS: {
+                        "type": "integer",
+                        "enum": [0, 1, 2],
+                        "description": "QoS of the MQTT messages sent by the worker. Default: MQTT default_qos",
+                    },
+                },
+                "additionalProperties": False,
+                "required": [WorkerInstanceConfKey.CLASS],
+            },
+        ]
+    },
+    "description": "Dictionary of <worker name>:<worker class path> or <worker name>:{class: <worker class path>, "
+                   "execution: <thread|pool|process>, priority: <high|normal|low>, max_pending: ..., overflow: ..., "
+                   "qos: <0|1|2>}"
 }
 
 
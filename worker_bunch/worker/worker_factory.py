@@ -1,7 +1,7 @@
 from typing import Dict
 
 from worker_bunch.worker.worker import Worker
-from worker_bunch.worker.worker_config import WorkerSettingsDeclaration
+from worker_bunch.worker.worker_config import WorkerInstanceConfKey, WorkerSettingsDeclaration
 
 
 class WorkerFactory:
@@ -43,6 +43,8 @@ class WorkerFactory:
     def create_workers(cls, config) -> Dict[str, Worker]:
         workers = {}
         for worker_name, class_path in config.items():
+            if isinstance(class_path, dict):
+                class_path = class_path[WorkerInstanceConfKey.CLASS]
 
             predefined_class_paths = cls.PREDEFINED_WORKERS.get(class_path)
             if predefined_class_paths:
@@ -0,0 +1,85 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from worker_bunch.dispatcher_config import Priority
+
+_logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """
+    Bounded thread pool for workers in `WorkerExecution.POOL` mode. Such workers don't run their own thread, but submit a
+    task (a turn of `_work`) when notifications are delivered. So the number of threads depends on the pool size, not on
+    the number of workers.
+
+    Pending tasks are kept in a heap: higher prioritized tasks run first, tasks of the same priority in submit order.
+    Threads are started on demand.
+    """
+
+    THREAD_NAME_PREFIX = "worker-pool"
+
+    def __init__(self, size: Optional[int] = None):
+        """:param size: max. number of threads; None: min(32, CPUs + 4) (as `ThreadPoolExecutor`)"""
+        if size is not None and size < 1:
+            raise ValueError(f"invalid worker pool size ({size})!")
+        self._size = size or min(32, (os.cpu_count() or 1) + 4)
+
+        self._condition = threading.Condition()
+        self._tasks: List[Tuple[int, int, Callable[[], None]]] = []  # heap of (priority, sequence, task)
+        self._sequence = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._idle_threads = 0
+        self._shutdown = False
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def submit(self, task: Callable[[], None], priority: Priority = Priority.NORMAL):
+        """The task is supposed to handle its exceptions."""
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("worker pool is shut down!")
+
+            heapq.heappush(self._tasks, (int(priority), next(self._sequence), task))
+
+            if self._idle_threads < len(self._tasks) and len(self._threads) < self._size:
+                thread = threading.Thread(target=self._run, name=f"{self.THREAD_NAME_PREFIX}-{len(self._threads)}",
+                                          daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            else:
+                self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._idle_threads += 1
+                while not self._tasks and not self._shutdown:
+                    self._condition.wait()
+                self._idle_threads -= 1
+
+                if not self._tasks:
+                    return  # shut down
+                _, _, task = heapq.heappop(self._tasks)
+
+            try:
+                task()
+            except Exception as ex:
+                _logger.exception(ex)
+
+    def shutdown(self, wait: bool = True):
+        """Pending tasks still get executed."""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+            threads = list(self._threads)
+
+        if wait:
+            for thread in threads:
+                thread.join()
+        _logger.debug("worker pool shut down")
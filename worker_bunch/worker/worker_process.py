@@ -0,0 +1,110 @@
+import logging
+import multiprocessing
+import queue
+import threading
+from typing import Callable, Dict, Optional, Set, Union
+
+from worker_bunch.mqtt.mqtt_config import PublishMode
+from worker_bunch.mqtt.mqtt_proxy import MqttProxy
+from worker_bunch.notification import Notification
+from worker_bunch.utils.json_utils import JsonUtils
+
+_logger = logging.getLogger(__name__)
+
+
+class ProcessMqttProxy(MqttProxy):
+    """Used within a worker process: forwards `queue` calls to the parent process, which publishes the messages."""
+
+    def __init__(self, outbound: multiprocessing.Queue):
+        super().__init__(None)
+        self._outbound = outbound
+
+    def queue(self, topic: str, payload: Union[str, Dict], retain: Optional[bool] = None,
+              mode: Optional[PublishMode] = None, qos: Optional[int] = None):
+        if isinstance(payload, dict):
+            payload = JsonUtils.dumps(payload)
+        self._outbound.put((topic, payload, retain, mode, qos))
+
+
+class WorkerProcess:
+    """
+    Parent side of a worker running in a separate process (`WorkerExecution.PROCESS`), which escapes the GIL of the
+    service process. Notifications are passed via a `multiprocessing.Queue` (None signals `stop`); the other way round the
+    child sends its MQTT messages, which a reader thread hands over to the real `MqttProxy`.
+
+    The child process is started via "spawn" (no forked MQTT/database connections or locks), so the worker class and its
+    setup (settings, astral times manager, database manager) must be picklable.
+    """
+
+    POLL_TIMEOUT = 1.0  # seconds; checks the other process being alive
+
+    def __init__(self, name: str, target: Callable, mqtt_proxy: Optional[MqttProxy]):
+        """:param target: the child main function, called with (inbound, outbound) queues"""
+        self._name = name
+        self._mqtt_proxy = mqtt_proxy
+
+        context = multiprocessing.get_context("spawn")
+        self._inbound = context.Queue()  # notifications to the child
+        self._outbound = context.Queue()  # MQTT messages from the child
+        self._process = context.Process(target=target, args=(self._inbound, self._outbound), name=name, daemon=True)
+        self._reader = threading.Thread(target=self._forward_messages, name=f"{name}-reader", daemon=True)
+
+    def start(self):
+        self._process.start()
+        self._reader.start()
+
+    def is_alive(self) -> bool:
+        """The reader thread may still forward the last messages (e.g. a last will sent by `_final_work`)."""
+        return self._process.is_alive() or self._reader.is_alive()
+
+    def join(self, timeout: Optional[float] = None):
+        self._process.join(timeout)
+        self._reader.join(timeout)
+
+    def add_notifications(self, notifications: Set[Notification]):
+        if self._process.is_alive():
+            self._inbound.put(notifications)
+
+    def stop(self):
+        if self._process.is_alive():
+            self._inbound.put(None)
+
+    def _forward_messages(self):
+        while True:
+            try:
+                message = self._outbound.get(timeout=self.POLL_TIMEOUT)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    break  # died without saying goodbye
+                continue
+
+            if message is None:
+                break
+
+            try:
+                topic, payload, retain, mode, qos = message
+                if self._mqtt_proxy:
+                    self._mqtt_proxy.queue(topic, payload, retain, mode=mode, qos=qos)
+                else:
+                    _logger.warning("no MQTT configured, message dropped (%s: %s)", self._name, topic)
+            except Exception as ex:
+                _logger.exception(ex)
+
+    @classmethod
+    def forward_notifications(cls, inbound: multiprocessing.Queue, add_notifications: Callable[[Set[Notification]], None],
+                              stop: Callable[[], None]):
+        """Child side: passes the notifications to the worker, until stopped or the parent is gone."""
+        while True:
+            try:
+                notifications = inbound.get(timeout=cls.POLL_TIMEOUT)
+            except queue.Empty:
+                parent = multiprocessing.parent_process()
+                if parent is not None and not parent.is_alive():
+                    stop()
+                    break
+                continue
+
+            if notifications is None:
+                stop()
+                break
+            add_notifications(notifications)